@@ -1,10 +1,52 @@
 from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
 from django.contrib import messages
 from django.http import JsonResponse
 from django.shortcuts import redirect
 from django.urls import reverse
 
 
+def _check_access(request, user, profile):
+    """
+    Общая проверка доступа для sync и async обёрток.
+    Возвращает ответ с отказом или None, если доступ разрешён.
+    """
+    if not user.is_authenticated:
+        if request.path.startswith("/api/"):
+            return JsonResponse({"error": "Authentication required"}, status=401)
+        messages.warning(request, "Войдите в систему для доступа к скринеру.")
+        return redirect(reverse("accounts:login") + "?next=" + request.path)
+
+    if profile is None:
+        if request.path.startswith("/api/"):
+            return JsonResponse({"error": "Profile not found"}, status=403)
+        messages.error(request, "Профиль не найден. Обратитесь к администратору.")
+        return redirect("accounts:profile")
+
+    if not profile.email_verified:
+        if request.path.startswith("/api/"):
+            return JsonResponse({"error": "Email verification required"}, status=403)
+        messages.warning(
+            request,
+            "Пожалуйста, подтвердите ваш email адрес для доступа к скринеру. "
+            "Проверьте вашу почту."
+        )
+        return redirect("accounts:profile")
+
+    if not profile.admin_approved:
+        if request.path.startswith("/api/"):
+            return JsonResponse({"error": "Admin approval required"}, status=403)
+        messages.info(
+            request,
+            "Ваш аккаунт ожидает одобрения администратором. "
+            "Вы получите уведомление после одобрения."
+        )
+        return redirect("accounts:profile")
+
+    return None
+
+
 def access_required(view_func):
     """
     Декоратор для проверки доступа к скринеру.
@@ -12,44 +54,33 @@ def access_required(view_func):
     1. Авторизован
     2. Подтвердил email
     3. Одобрен администратором
+
+    Работает и с async-представлениями: пользователь и профиль загружаются
+    через async ORM, поэтому обёртка не блокирует event loop под ASGI.
     """
+    if iscoroutinefunction(view_func):
+        from .models import Profile
+
+        @wraps(view_func)
+        async def _async_wrapped_view(request, *args, **kwargs):
+            user = await request.auser()
+            profile = None
+            if user.is_authenticated:
+                profile = await Profile.objects.filter(user_id=user.pk).afirst()
+            denied = _check_access(request, user, profile)
+            if denied is not None:
+                return denied
+            return await view_func(request, *args, **kwargs)
+
+        return _async_wrapped_view
+
     @wraps(view_func)
     def _wrapped_view(request, *args, **kwargs):
-        if not request.user.is_authenticated:
-            if request.path.startswith("/api/"):
-                return JsonResponse({"error": "Authentication required"}, status=401)
-            messages.warning(request, "Войдите в систему для доступа к скринеру.")
-            return redirect(reverse("accounts:login") + "?next=" + request.path)
-        
-        if not hasattr(request.user, "profile"):
-            if request.path.startswith("/api/"):
-                return JsonResponse({"error": "Profile not found"}, status=403)
-            messages.error(request, "Профиль не найден. Обратитесь к администратору.")
-            return redirect("accounts:profile")
-        
-        profile = request.user.profile
-        
-        if not profile.email_verified:
-            if request.path.startswith("/api/"):
-                return JsonResponse({"error": "Email verification required"}, status=403)
-            messages.warning(
-                request,
-                "Пожалуйста, подтвердите ваш email адрес для доступа к скринеру. "
-                "Проверьте вашу почту."
-            )
-            return redirect("accounts:profile")
-        
-        if not profile.admin_approved:
-            if request.path.startswith("/api/"):
-                return JsonResponse({"error": "Admin approval required"}, status=403)
-            messages.info(
-                request,
-                "Ваш аккаунт ожидает одобрения администратором. "
-                "Вы получите уведомление после одобрения."
-            )
-            return redirect("accounts:profile")
-        
+        user = request.user
+        profile = getattr(user, "profile", None) if user.is_authenticated else None
+        denied = _check_access(request, user, profile)
+        if denied is not None:
+            return denied
         return view_func(request, *args, **kwargs)
-    
-    return _wrapped_view
 
+    return _wrapped_view
@@ -1,6 +1,8 @@
 from django.contrib import admin
+from django.utils import timezone
 
-from .models import AlertRule
+from .models import AlertRule, ChatSettings, Notification, ScanRule
+from .outbox import requeue
 
 
 @admin.register(AlertRule)
@@ -18,3 +20,48 @@ class AlertRuleAdmin(admin.ModelAdmin):
     search_fields = ("symbol__symbol", "telegram_chat_id")
 
 
+@admin.register(ScanRule)
+class ScanRuleAdmin(admin.ModelAdmin):
+    list_display = (
+        "market_type",
+        "metric",
+        "operator",
+        "threshold",
+        "min_volume_15m",
+        "cooldown_minutes",
+        "telegram_chat_id",
+        "active",
+        "last_triggered_at",
+    )
+    list_filter = ("active", "market_type", "metric")
+    search_fields = ("telegram_chat_id",)
+
+
+@admin.register(Notification)
+class NotificationAdmin(admin.ModelAdmin):
+    list_display = (
+        "created_at",
+        "chat_id",
+        "rule",
+        "scan_rule",
+        "status",
+        "attempts",
+        "next_attempt_at",
+        "sent_at",
+        "last_error",
+    )
+    list_filter = ("status",)
+    search_fields = ("chat_id", "idempotency_key")
+    raw_id_fields = ("rule", "scan_rule")
+    actions = ("requeue_notifications",)
+
+    @admin.action(description="Send again")
+    def requeue_notifications(self, request, queryset):
+        count = requeue(queryset, timezone.now())
+        self.message_user(request, f"{count} notifications queued again.")
+
+
+@admin.register(ChatSettings)
+class ChatSettingsAdmin(admin.ModelAdmin):
+    list_display = ("chat_id", "digest_window")
+    search_fields = ("chat_id",)
@@ -0,0 +1,152 @@
+"""
+Backtest of an alert condition against a symbol's stored history.
+
+:func:`load_history` reads one metric of one symbol as two float arrays (epoch
+seconds, value) — on PostgreSQL with a single binary ``COPY ... TO STDOUT``
+read by NumPy as fixed-size records, without a Python object per row.
+:func:`backtest` then finds the firing points with the same semantics as the
+live checker (alerts/evaluation.py): edge-triggered, re-armed once the value
+is back across the threshold by ``hysteresis``, at least ``cooldown`` between
+two firings.
+
+The Schmitt-trigger part is vectorized: every sample is "set" (condition
+true), "reset" (back across the band) or "hold", and a crossing is a set
+whose previous non-hold sample was a reset. Only the cooldown is sequential,
+and the loop runs once per firing, not per sample.
+"""
+import io
+from datetime import datetime, timezone
+
+import numpy as np
+from django.db import connection
+
+from screener.models import ScreenerSnapshot
+
+from .evaluation import DEFAULT_COOLDOWN
+
+
+OPS = {
+    ">": np.greater,
+    "<": np.less,
+    ">=": np.greater_equal,
+    "<=": np.less_equal,
+}
+
+# Firing times returned to the client (the most recent ones).
+MAX_TIMESTAMPS = 500
+
+# Binary COPY tuple of two non-null float8 columns (big-endian): field count,
+# then length and value of each field.
+_COPY_ROW = np.dtype([
+    ("fields", ">i2"), ("ts_len", ">i4"), ("ts", ">f8"), ("value_len", ">i4"), ("value", ">f8"),
+])
+_COPY_SIGNATURE = b"PGCOPY\n\xff\r\n\0"
+
+
+def load_history(symbol_id, metric, start, end=None):
+    """``(ts, values)`` float64 arrays of ``metric`` for a symbol, ts ascending."""
+    opts = ScreenerSnapshot._meta
+    column = connection.ops.quote_name(opts.get_field(metric).column)
+    if connection.vendor != "postgresql":
+        qs = ScreenerSnapshot.objects.filter(symbol_id=symbol_id, ts__gte=start)
+        if end is not None:
+            qs = qs.filter(ts__lte=end)
+        rows = list(qs.order_by("ts").values_list("ts", metric))
+        ts = np.array([row[0].timestamp() for row in rows], dtype=np.float64)
+        values = np.array([float(row[1]) for row in rows], dtype=np.float64)
+        return ts, values
+
+    # COPY cannot take parameters: the values are inlined, as numbers only.
+    where = f"symbol_id = {int(symbol_id)} AND ts >= to_timestamp({start.timestamp():f})"
+    if end is not None:
+        where += f" AND ts <= to_timestamp({end.timestamp():f})"
+    sql = (
+        f"COPY (SELECT extract(epoch FROM ts)::float8, coalesce({column}::float8, 'NaN') "
+        f"FROM {connection.ops.quote_name(opts.db_table)} WHERE {where} ORDER BY ts) "
+        f"TO STDOUT WITH (FORMAT binary)"
+    )
+    buffer = io.BytesIO()
+    with connection.cursor() as cursor:
+        cursor.cursor.copy_expert(sql, buffer)
+    data = buffer.getbuffer()
+    if bytes(data[:11]) != _COPY_SIGNATURE:
+        raise ValueError("Unexpected COPY output")
+    # Signature, flags, header extension length and the extension itself;
+    # the file ends with a -1 field count.
+    offset = 19 + int.from_bytes(data[15:19], "big")
+    count = (len(data) - offset - 2) // _COPY_ROW.itemsize
+    rows = np.frombuffer(data, dtype=_COPY_ROW, count=count, offset=offset)
+    return rows["ts"].astype(np.float64), rows["value"].astype(np.float64)
+
+
+def backtest(ts, values, operator, threshold, hysteresis=0.0, cooldown=DEFAULT_COOLDOWN) -> dict:
+    """
+    Firing points of ``values op threshold`` over ``ts`` (epoch seconds).
+    Returns ``{"fired": [indices], "crossings": N, "true_share": x}``.
+    """
+    op_func = OPS[operator]
+    count = len(values)
+    if not count:
+        return {"fired": [], "crossings": 0, "true_share": 0.0}
+
+    threshold = float(threshold)
+    band = float(hysteresis)
+    shifted = threshold - band if operator in (">", ">=") else threshold + band
+    cond = op_func(values, threshold)
+    # Missing values (NaN) neither fire nor re-arm.
+    reset = ~op_func(values, shifted) & ~np.isnan(values)
+
+    # Set / reset samples in order; the rule starts armed (as after a reset).
+    events = np.flatnonzero(cond | reset)
+    is_set = cond[events]
+    previous = np.concatenate(([False], is_set[:-1]))
+    starts = events[is_set & ~previous]
+
+    # Episode number of every sample: the rule fires at most once per episode.
+    start_mask = np.zeros(count, dtype=bool)
+    start_mask[starts] = True
+    episode = np.cumsum(start_mask) - 1
+
+    cond_idx = np.flatnonzero(cond)
+    gap = cooldown.total_seconds()
+    fired = []
+    pos = 0
+    while True:
+        k = np.searchsorted(cond_idx, pos)
+        if k == len(cond_idx):
+            break
+        i = int(cond_idx[k])
+        fired.append(i)
+        following = episode[i] + 1
+        if following >= len(starts):
+            break
+        # Armed again from the next episode, firing no earlier than the cooldown.
+        pos = max(int(starts[following]), int(np.searchsorted(ts, ts[i] + gap)))
+
+    return {
+        "fired": fired,
+        "crossings": len(starts),
+        "true_share": float(cond.mean()),
+    }
+
+
+def backtest_rule(symbol_id, metric, operator, threshold, hysteresis, start, end=None,
+                  cooldown=DEFAULT_COOLDOWN) -> dict:
+    """Load the history and backtest; the JSON the backtest view returns."""
+    ts, values = load_history(symbol_id, metric, start, end)
+    result = backtest(ts, values, operator, threshold, hysteresis, cooldown)
+    fired_ts = ts[result["fired"]]
+
+    def iso(seconds):
+        return datetime.fromtimestamp(float(seconds), tz=timezone.utc).isoformat()
+
+    return {
+        "points": len(ts),
+        "from": iso(ts[0]) if len(ts) else None,
+        "to": iso(ts[-1]) if len(ts) else None,
+        "fired": len(fired_ts),
+        "crossings": result["crossings"],
+        "true_share": round(result["true_share"], 4),
+        "fired_at": [iso(t) for t in fired_ts[-MAX_TIMESTAMPS:]],
+        "truncated": len(fired_ts) > MAX_TIMESTAMPS,
+    }
@@ -0,0 +1,87 @@
+"""
+Per-chat digests: alerts of one chat that fire close together go out as one
+message.
+
+When a notification is queued its send time is pushed back by the chat's
+digest window (ChatSettings.digest_window, default ALERT_DIGEST_WINDOW). When
+the first one is due, the sender claims every pending notification of that
+chat (alerts/outbox.py) and :func:`build_digests` joins their texts — the
+usual per-alert HTML from alerts/messages.py — under a header, split at
+Telegram's message length limit. A burst of dozens of alerts for a chat is one
+or two messages instead of dozens of sends against its 1 message/s limit.
+"""
+import time
+from datetime import timedelta
+from typing import NamedTuple
+
+from django.conf import settings
+
+from .models import ChatSettings
+
+
+# Telegram limit, in characters of the text after HTML parsing; the raw HTML
+# is longer, so counting it keeps a safe margin.
+MAX_MESSAGE_LENGTH = 4096
+SEPARATOR = "\n\n➖➖➖\n\n"
+
+# ChatSettings is re-read this often by each process.
+_SETTINGS_TTL = 60.0
+_windows = {}
+_windows_loaded_at = None
+
+
+class Digest(NamedTuple):
+    chat_id: int
+    text: str
+    # The notifications merged into this message.
+    items: list
+
+
+def digest_window(chat_id) -> timedelta:
+    global _windows, _windows_loaded_at
+    now = time.monotonic()
+    if _windows_loaded_at is None or now - _windows_loaded_at > _SETTINGS_TTL:
+        _windows = dict(
+            ChatSettings.objects.filter(digest_window__isnull=False)
+            .values_list("chat_id", "digest_window")
+        )
+        _windows_loaded_at = now
+    seconds = _windows.get(chat_id)
+    if seconds is None:
+        seconds = getattr(settings, "ALERT_DIGEST_WINDOW", 0)
+    return timedelta(seconds=seconds)
+
+
+def _header(count: int) -> str:
+    return f"🔔 <b>Алерты: {count}</b>"
+
+
+def _join(texts) -> str:
+    if len(texts) == 1:
+        return texts[0]
+    return _header(len(texts)) + SEPARATOR + SEPARATOR.join(texts)
+
+
+def build_digests(notifications, limit: int = MAX_MESSAGE_LENGTH) -> list:
+    """
+    Group ``notifications`` (objects with ``chat_id``, ``text``, ``created_at``)
+    into Digest messages: one per chat, more when the texts exceed ``limit``.
+    """
+    by_chat = {}
+    for notification in sorted(notifications, key=lambda n: n.created_at):
+        by_chat.setdefault(notification.chat_id, []).append(notification)
+
+    digests = []
+    for chat_id, items in by_chat.items():
+        # size: length of the chunk's texts joined by separators, no header.
+        chunk, size = [], 0
+        for item in items:
+            if chunk:
+                grown = size + len(SEPARATOR) + len(item.text)
+                if len(_header(len(chunk) + 1)) + len(SEPARATOR) + grown > limit:
+                    digests.append(Digest(chat_id, _join([n.text for n in chunk]), chunk))
+                    chunk = []
+            size = grown if chunk else len(item.text)
+            chunk.append(item)
+        digests.append(Digest(chat_id, _join([n.text for n in chunk]), chunk))
+    return digests
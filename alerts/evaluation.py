@@ -0,0 +1,138 @@
+"""
+Set-based evaluation of AlertRule conditions.
+
+The cost of a run does not depend on the number of rules: one query loads the
+active rules, one ``DISTINCT ON`` query loads the latest snapshot of every
+symbol they reference, one UPDATE marks the rules that fired and one re-arms
+the rules whose value went back.
+
+Rules are edge-triggered: a rule fires when its condition becomes true and is
+then disarmed (``AlertRule.armed``) until the value is back across the
+threshold by the rule's ``hysteresis`` — a metric hovering at the threshold
+fires once, not every cooldown. The cooldown remains the minimum time between
+two firings.
+"""
+import operator
+from datetime import timedelta
+
+from screener.models import ScreenerSnapshot
+
+from .models import AlertRule
+
+
+OPERATORS = {
+    ">": operator.gt,
+    "<": operator.lt,
+    ">=": operator.ge,
+    "<=": operator.le,
+}
+
+ALERT_METRICS = [metric for metric, _ in AlertRule.METRIC_CHOICES]
+
+DEFAULT_COOLDOWN = timedelta(minutes=5)
+
+
+def active_rules():
+    return (
+        AlertRule.objects.filter(active=True, telegram_chat_id__isnull=False)
+        .select_related("symbol")
+    )
+
+
+def latest_values(symbol_ids) -> dict:
+    """
+    ``{symbol_id: {metric: value}}`` from the latest snapshot of each symbol.
+
+    ``symbol_ids`` may be a list or a queryset (then it is inlined as a
+    subquery, so the whole map is a single query).
+    """
+    rows = (
+        ScreenerSnapshot.objects.filter(symbol_id__in=symbol_ids)
+        .order_by("symbol_id", "-ts")
+        .distinct("symbol_id")
+        .values_list("symbol_id", *ALERT_METRICS)
+    )
+    return {row[0]: dict(zip(ALERT_METRICS, row[1:])) for row in rows}
+
+
+def rearms(operator, threshold, band, value) -> bool:
+    """
+    Whether ``value`` is back across ``threshold`` by at least ``band``: the
+    condition no longer holds even against a threshold moved by ``band``
+    towards the other side.
+    """
+    op_func = OPERATORS.get(operator)
+    if op_func is None:
+        return False
+    shifted = threshold - band if operator in (">", ">=") else threshold + band
+    return not op_func(float(value), shifted)
+
+
+def rule_rearms(rule, values) -> bool:
+    value = values.get(rule.metric) if values else None
+    if value is None:
+        return False
+    return rearms(rule.operator, float(rule.threshold), float(rule.hysteresis), value)
+
+
+def rule_fires(rule, values, now, cooldown=DEFAULT_COOLDOWN):
+    """
+    Value that fires ``rule`` or None (disarmed, cooldown, missing data, no
+    match).
+    """
+    if not rule.armed:
+        return None
+    if rule.last_triggered_at and now - rule.last_triggered_at < cooldown:
+        return None
+    if values is None:
+        return None
+    value = values.get(rule.metric)
+    if value is None:
+        return None
+    op_func = OPERATORS.get(rule.operator)
+    if not op_func:
+        return None
+    value = float(value)
+    return value if op_func(value, float(rule.threshold)) else None
+
+
+def evaluate_rules(now, cooldown=DEFAULT_COOLDOWN):
+    """
+    ``[(rule, value), ...]`` for every active rule that fires now; disarmed
+    rules whose value went back are re-armed.
+
+    Two queries whatever the number of rules, plus one UPDATE if any rule
+    re-arms.
+    """
+    rules = list(active_rules())
+    symbol_ids = AlertRule.objects.filter(
+        active=True, telegram_chat_id__isnull=False
+    ).values("symbol_id").distinct()
+    values = latest_values(symbol_ids) if rules else {}
+
+    fired = []
+    rearmed = []
+    for rule in rules:
+        symbol_values = values.get(rule.symbol_id)
+        if not rule.armed:
+            if rule_rearms(rule, symbol_values):
+                rule.armed = True
+                rearmed.append(rule.pk)
+            continue
+        value = rule_fires(rule, symbol_values, now, cooldown)
+        if value is not None:
+            fired.append((rule, value))
+    if rearmed:
+        AlertRule.objects.filter(pk__in=rearmed).update(armed=True)
+    return fired
+
+
+def mark_triggered(rules, now) -> int:
+    """Set ``last_triggered_at`` and disarm all ``rules`` in one UPDATE."""
+    ids = [rule.pk for rule in rules]
+    if not ids:
+        return 0
+    for rule in rules:
+        rule.last_triggered_at = now
+        rule.armed = False
+    return AlertRule.objects.filter(pk__in=ids).update(last_triggered_at=now, armed=False)
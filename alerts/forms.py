@@ -6,6 +6,6 @@ from .models import AlertRule
 class AlertRuleForm(forms.ModelForm):
     class Meta:
         model = AlertRule
-        fields = ("metric", "operator", "threshold", "telegram_chat_id")
+        fields = ("metric", "operator", "threshold", "hysteresis", "telegram_chat_id")
 
 
@@ -0,0 +1,509 @@
+"""
+In-memory index of active alert rules for long-running evaluators.
+
+Rules are grouped by ``(symbol_id, metric, operator)``; each group keeps its
+thresholds in a sorted array with the rule ids in the same order. For a new
+metric value the rules that fire are one contiguous slice of the group, found
+with a single bisect:
+
+    ``>``   thresholds <  value  -> [0, bisect_left)
+    ``>=``  thresholds <= value  -> [0, bisect_right)
+    ``<``   thresholds >  value  -> [bisect_right, n)
+    ``<=``  thresholds >= value  -> [bisect_left, n)
+
+so a cycle costs one bisect per group plus the size of the result, not one
+comparison per rule (see scripts/bench_alert_index.py).
+
+Rule edits are propagated through a changelog table (RuleChange): the
+AlertRule signals (alerts/models.py) record the id and the previous
+group/threshold of every created, edited, toggled or deleted rule in the same
+transaction as the edit, and :meth:`RuleIndex.sync` applies the new entries
+with one query for the changed rules, polling at most once per
+SYNC_INTERVAL. Entry ids come from the database
+sequence, so concurrent writers never share a version; entries of the last
+CHANGE_LOOKBACK seconds are read again, because a transaction can commit
+after one with a higher id. Applying an entry twice is harmless. Bulk deletes
+that skip the signals (:func:`bulk_delete_rules`) record a single RELOAD entry
+instead, which makes every index rebuild once. A full rebuild happens every
+REBUILD_INTERVAL as a safety net.
+
+Edge triggering (see alerts/evaluation.py) is kept in memory too: a rule that
+fired moves to ``disarmed`` — its UPDATE of ``last_triggered_at`` also clears
+``armed``. :meth:`RuleIndex.fired` only returns the candidates; the evaluator
+applies them with :meth:`RuleIndex.mark_fired` once they are recorded, so a
+failed write leaves the rules armed and they fire again on the next cycle. Disarmed rules are grouped like the index and sorted by the value
+that re-arms them (the threshold moved by the hysteresis), so the rules a
+value re-arms are again one slice found with a bisect: re-arming costs one
+bisect per group with disarmed rules plus the re-armed ones, not one check
+per disarmed rule. Re-armed rules are written back in batches by
+:meth:`RuleIndex.checkpoint`, one UPDATE per CHECKPOINT_INTERVAL.
+"""
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import NamedTuple
+
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from .evaluation import DEFAULT_COOLDOWN
+from .models import AlertRule, Notification, RuleChange
+
+
+CHANGE_TTL = 24 * 60 * 60
+CHANGE_LOOKBACK = 60
+REBUILD_INTERVAL = 10 * 60
+# The changelog is polled at most this often (seconds).
+SYNC_INTERVAL = 5.0
+# Changelog rule_id that makes every index rebuild instead of applying a rule.
+RELOAD = 0
+CHECKPOINT_INTERVAL = 30.0
+
+# Rules fetched per round trip while building the index.
+BUILD_CHUNK = 20_000
+
+_RULE_FIELDS = (
+    "id", "symbol_id", "metric", "operator", "threshold", "telegram_chat_id", "hysteresis",
+)
+
+
+class FiredRule(NamedTuple):
+    rule_id: int
+    symbol_id: int
+    metric: str
+    operator: str
+    threshold: float
+    chat_id: int
+    value: float
+    band: float
+
+
+def current_version() -> int:
+    return RuleChange.objects.aggregate(version=Max("id"))["version"] or 0
+
+
+def record_change(rule_id: int, old=None) -> None:
+    """
+    Append a rule change to the changelog. ``old`` is the rule's previous
+    ``(symbol_id, metric, operator, threshold)`` if it was in the index.
+    """
+    RuleChange.objects.create(rule_id=rule_id, old=list(old) if old is not None else None)
+
+
+def bulk_delete_rules(rules) -> int:
+    """
+    Delete the ``rules`` queryset and its outbox rows with plain DELETEs. The
+    collector and the per-rule signals are skipped, so instead of one
+    changelog entry per rule a single RELOAD entry makes live indexes rebuild.
+    """
+    with transaction.atomic():
+        notifications = Notification.objects.filter(rule__in=rules.values("pk"))
+        notifications._raw_delete(notifications.db)
+        deleted = rules._raw_delete(rules.db)
+        if deleted:
+            record_change(RELOAD)
+    return deleted
+
+
+def purge_changes() -> int:
+    """Drop changelog entries older than CHANGE_TTL (indexes rebuild sooner)."""
+    cutoff = timezone.now() - timedelta(seconds=CHANGE_TTL)
+    deleted, _ = RuleChange.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
+
+
+class _Group:
+    __slots__ = ("thresholds", "ids", "chats", "bands")
+
+    def __init__(self):
+        self.thresholds = array("d")
+        self.ids = array("q")
+        self.chats = array("q")
+        self.bands = array("d")
+
+    def insert(self, threshold, rule_id, chat_id, band):
+        pos = bisect_right(self.thresholds, threshold)
+        self.thresholds.insert(pos, threshold)
+        self.ids.insert(pos, rule_id)
+        self.chats.insert(pos, chat_id)
+        self.bands.insert(pos, band)
+
+    def remove(self, threshold, rule_id):
+        pos = bisect_left(self.thresholds, threshold)
+        end = bisect_right(self.thresholds, threshold)
+        for i in range(pos, end):
+            if self.ids[i] == rule_id:
+                del self.thresholds[i]
+                del self.ids[i]
+                del self.chats[i]
+                del self.bands[i]
+                return True
+        return False
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def _rearm_level(op, threshold, band) -> float:
+    """The threshold moved by ``band`` away from the firing side (see evaluation.rearms)."""
+    return threshold - band if op in (">", ">=") else threshold + band
+
+
+class _Disarmed:
+    """Disarmed rules of one group, sorted by their re-arm level."""
+
+    __slots__ = ("levels", "ids")
+
+    def __init__(self):
+        self.levels = []
+        self.ids = []
+
+    def insert(self, level, rule_id):
+        pos = bisect_right(self.levels, level)
+        self.levels.insert(pos, level)
+        self.ids.insert(pos, rule_id)
+
+    def remove(self, level, rule_id):
+        for i in range(bisect_left(self.levels, level), bisect_right(self.levels, level)):
+            if self.ids[i] == rule_id:
+                del self.levels[i]
+                del self.ids[i]
+                return True
+        return False
+
+    def take(self, op, value) -> list:
+        """
+        Remove and return the rules ``value`` re-arms, i.e. where ``value op
+        level`` no longer holds:
+
+            ``>``   levels >= value  -> [bisect_left, n)
+            ``>=``  levels >  value  -> [bisect_right, n)
+            ``<``   levels <= value  -> [0, bisect_right)
+            ``<=``  levels <  value  -> [0, bisect_left)
+        """
+        levels = self.levels
+        if op == ">":
+            start, end = bisect_left(levels, value), len(levels)
+        elif op == ">=":
+            start, end = bisect_right(levels, value), len(levels)
+        elif op == "<":
+            start, end = 0, bisect_right(levels, value)
+        elif op == "<=":
+            start, end = 0, bisect_left(levels, value)
+        else:
+            return []
+        if start >= end:
+            return []
+        ids = self.ids[start:end]
+        del levels[start:end]
+        del self.ids[start:end]
+        return ids
+
+    def __len__(self):
+        return len(self.ids)
+
+
+class RuleIndex:
+    """Active rules with a Telegram chat, grouped for bisect matching."""
+
+    def __init__(self, market_type=None, cooldown=DEFAULT_COOLDOWN):
+        # symbol_id -> {(metric, operator): _Group}
+        self.groups = {}
+        self.count = 0
+        self.market_type = market_type
+        self.cooldown = cooldown
+        self.version = 0
+        # Changelog ids of the last CHANGE_LOOKBACK seconds already applied.
+        self.applied = {}
+        self.built_at = 0.0
+        self.synced_at = 0.0
+        # rule_id -> last time it fired, for rules still in cooldown.
+        self.last_fired = {}
+        self.pruned_at = None
+        # rule_id -> (symbol_id, metric, operator, threshold, hysteresis) of
+        # rules that fired and wait to be re-armed ...
+        self.disarmed = {}
+        # ... and the same rules by symbol_id -> {(metric, operator): _Disarmed}.
+        self.waiting = {}
+        # Re-armed since the last checkpoint.
+        self.rearmed = set()
+        self.checkpointed_at = time.monotonic()
+
+    # --- building -------------------------------------------------------
+
+    @classmethod
+    def from_rows(cls, rows, **kwargs):
+        """
+        Build from ``(id, symbol_id, metric, operator, threshold, chat_id,
+        hysteresis)`` tuples.
+        """
+        index = cls(**kwargs)
+        pending = {}
+        for rule_id, symbol_id, metric, op, threshold, chat_id, band in rows:
+            pending.setdefault((symbol_id, metric, op), []).append(
+                (float(threshold), rule_id, chat_id, float(band))
+            )
+        for (symbol_id, metric, op), items in pending.items():
+            items.sort()
+            group = _Group()
+            group.thresholds = array("d", (t for t, _, _, _ in items))
+            group.ids = array("q", (i for _, i, _, _ in items))
+            group.chats = array("q", (c for _, _, c, _ in items))
+            group.bands = array("d", (b for _, _, _, b in items))
+            index.groups.setdefault(symbol_id, {})[(metric, op)] = group
+            index.count += len(items)
+        return index
+
+    @staticmethod
+    def _rules(market_type):
+        rules = AlertRule.objects.filter(active=True, telegram_chat_id__isnull=False)
+        if market_type:
+            rules = rules.filter(symbol__market_type=market_type)
+        return rules.order_by()
+
+    @classmethod
+    def load(cls, market_type=None, cooldown=DEFAULT_COOLDOWN):
+        """Build from the database (rules of one market if ``market_type``)."""
+        version = current_version()
+        # Recent entries are already reflected in the rows read below.
+        since = timezone.now() - timedelta(seconds=CHANGE_LOOKBACK)
+        applied = dict(
+            RuleChange.objects.filter(created_at__gte=since).values_list("pk", "created_at")
+        )
+        rules = cls._rules(market_type).values_list(*_RULE_FIELDS)
+        index = cls.from_rows(
+            rules.iterator(chunk_size=BUILD_CHUNK), market_type=market_type, cooldown=cooldown
+        )
+        recent = cls._rules(market_type).filter(
+            last_triggered_at__gte=timezone.now() - cooldown
+        ).values_list("id", "last_triggered_at")
+        index.last_fired = dict(recent)
+        disarmed = cls._rules(market_type).filter(armed=False).values_list(*_RULE_FIELDS)
+        for row in disarmed:
+            index.disarm(row[0], row[1], row[2], row[3], float(row[4]), float(row[6]))
+        index.version = version
+        index.applied = applied
+        index.built_at = index.synced_at = time.monotonic()
+        return index
+
+    # --- incremental updates --------------------------------------------
+
+    def add(self, rule_id, symbol_id, metric, op, threshold, chat_id, band=0.0):
+        by_op = self.groups.setdefault(symbol_id, {})
+        group = by_op.get((metric, op))
+        if group is None:
+            group = by_op[(metric, op)] = _Group()
+        group.insert(float(threshold), rule_id, chat_id, float(band))
+        self.count += 1
+
+    def remove(self, rule_id, symbol_id, metric, op, threshold):
+        by_op = self.groups.get(symbol_id)
+        group = by_op.get((metric, op)) if by_op else None
+        if group is None or not group.remove(float(threshold), rule_id):
+            return False
+        self.count -= 1
+        if not len(group):
+            del by_op[(metric, op)]
+            if not by_op:
+                del self.groups[symbol_id]
+        return True
+
+    def sync(self):
+        """
+        Apply changelog entries recorded since this index was built. Returns
+        the index to use: ``self``, or a fresh one after a full rebuild.
+        """
+        now = time.monotonic()
+        if now - self.built_at >= REBUILD_INTERVAL:
+            return self._reload()
+        if now - self.synced_at < SYNC_INTERVAL:
+            return self
+        self.synced_at = now
+        since = timezone.now() - timedelta(seconds=CHANGE_LOOKBACK)
+        self.applied = {pk: at for pk, at in self.applied.items() if at >= since}
+        entries = [
+            entry for entry in
+            RuleChange.objects.filter(Q(pk__gt=self.version) | Q(created_at__gte=since))
+            .order_by("pk").values_list("pk", "rule_id", "old", "created_at")
+            if entry[0] not in self.applied
+        ]
+        if not entries:
+            return self
+        if any(entry[1] == RELOAD for entry in entries):
+            return self._reload()
+
+        changed_ids = set()
+        for pk, rule_id, old, created_at in entries:
+            changed_ids.add(rule_id)
+            if old is not None:
+                self.remove(rule_id, *old)
+            self.drop_disarmed(rule_id)
+            self.version = max(self.version, pk)
+            self.applied[pk] = created_at
+        # Current state of every changed rule in one query; deleted and
+        # inactive rules simply do not come back.
+        current = (
+            self._rules(self.market_type).filter(pk__in=changed_ids)
+            .values_list(*_RULE_FIELDS, "armed")
+        )
+        for *row, armed in current:
+            # Drop a possible stale copy (several edits in one batch).
+            self.remove(*row[:5])
+            self.add(*row)
+            if not armed and row[0] not in self.rearmed:
+                self.disarm(row[0], row[1], row[2], row[3], float(row[4]), float(row[6]))
+        return self
+
+    def _reload(self):
+        purge_changes()
+        index = RuleIndex.load(self.market_type, self.cooldown)
+        # Keep cooldowns of rules fired since the rows were last read, and
+        # re-arms not written back yet.
+        for rule_id, fired_at in self.last_fired.items():
+            if fired_at > index.last_fired.get(rule_id, fired_at):
+                index.last_fired[rule_id] = fired_at
+        for rule_id in self.rearmed:
+            index.drop_disarmed(rule_id)
+        index.rearmed = self.rearmed
+        index.checkpointed_at = self.checkpointed_at
+        return index
+
+    def checkpoint(self, force=False) -> int:
+        """
+        Write the rules re-armed since the last checkpoint back in one UPDATE,
+        at most once per CHECKPOINT_INTERVAL unless ``force``.
+        """
+        if not self.rearmed:
+            return 0
+        if not force and time.monotonic() - self.checkpointed_at < CHECKPOINT_INTERVAL:
+            return 0
+        ids, self.rearmed = self.rearmed, set()
+        AlertRule.objects.filter(pk__in=ids).update(armed=True)
+        self.checkpointed_at = time.monotonic()
+        return len(ids)
+
+    # --- matching -------------------------------------------------------
+
+    def _slices(self, values):
+        """``(symbol_id, metric, op, group, start, end, value)`` per matching group."""
+        for symbol_id, metrics in values.items():
+            by_op = self.groups.get(symbol_id)
+            if not by_op:
+                continue
+            for (metric, op), group in by_op.items():
+                value = metrics.get(metric)
+                if value is None:
+                    continue
+                value = float(value)
+                thresholds = group.thresholds
+                if op == ">":
+                    start, end = 0, bisect_left(thresholds, value)
+                elif op == ">=":
+                    start, end = 0, bisect_right(thresholds, value)
+                elif op == "<":
+                    start, end = bisect_right(thresholds, value), len(thresholds)
+                elif op == "<=":
+                    start, end = bisect_left(thresholds, value), len(thresholds)
+                else:
+                    continue
+                if start < end:
+                    yield symbol_id, metric, op, group, start, end, value
+
+    def match(self, values):
+        """
+        Ids of the rules that fire for ``{symbol_id: {metric: value}}``.
+        Cooldown is not applied here (see :meth:`fired`).
+        """
+        fired = []
+        for _, _, _, group, start, end, _ in self._slices(values):
+            fired.extend(group.ids[start:end])
+        return fired
+
+    def disarm(self, rule_id, symbol_id, metric, op, threshold, band):
+        self.drop_disarmed(rule_id)
+        self.disarmed[rule_id] = (symbol_id, metric, op, threshold, band)
+        by_op = self.waiting.setdefault(symbol_id, {})
+        waiting = by_op.get((metric, op))
+        if waiting is None:
+            waiting = by_op[(metric, op)] = _Disarmed()
+        waiting.insert(_rearm_level(op, threshold, band), rule_id)
+
+    def drop_disarmed(self, rule_id):
+        """Drop ``rule_id`` from the disarmed rules (no-op if armed)."""
+        entry = self.disarmed.pop(rule_id, None)
+        if entry is None:
+            return
+        symbol_id, metric, op, threshold, band = entry
+        by_op = self.waiting[symbol_id]
+        waiting = by_op[(metric, op)]
+        waiting.remove(_rearm_level(op, threshold, band), rule_id)
+        if not len(waiting):
+            del by_op[(metric, op)]
+            if not by_op:
+                del self.waiting[symbol_id]
+
+    def _rearm(self, values):
+        """Re-arm disarmed rules whose value went back across the threshold."""
+        for symbol_id, metrics in values.items():
+            by_op = self.waiting.get(symbol_id)
+            if not by_op:
+                continue
+            for (metric, op), waiting in list(by_op.items()):
+                value = metrics.get(metric)
+                if value is None:
+                    continue
+                value = float(value)
+                if value != value:
+                    # NaN: no data, like a missing value.
+                    continue
+                for rule_id in waiting.take(op, value):
+                    del self.disarmed[rule_id]
+                    self.rearmed.add(rule_id)
+                if not len(waiting):
+                    del by_op[(metric, op)]
+            if not by_op:
+                del self.waiting[symbol_id]
+
+    def fired(self, values, now):
+        """
+        Armed rules that fire outside their cooldown, as :class:`FiredRule`
+        tuples. They stay armed until passed to :meth:`mark_fired`.
+        """
+        self._rearm(values)
+        result = []
+        last_fired = self.last_fired
+        disarmed = self.disarmed
+        cooldown = self.cooldown
+        for symbol_id, metric, op, group, start, end, value in self._slices(values):
+            for i in range(start, end):
+                rule_id = group.ids[i]
+                if rule_id in disarmed:
+                    continue
+                last = last_fired.get(rule_id)
+                if last is not None and now - last < cooldown:
+                    continue
+                result.append(FiredRule(
+                    rule_id, symbol_id, metric, op, group.thresholds[i], group.chats[i],
+                    value, group.bands[i],
+                ))
+        # Forget rules whose cooldown is over, once per cooldown period.
+        if self.pruned_at is None or now - self.pruned_at >= cooldown:
+            self.last_fired = {i: t for i, t in last_fired.items() if now - t < cooldown}
+            self.pruned_at = now
+        return result
+
+    def mark_fired(self, fired, now):
+        """Start the cooldown of recorded :meth:`fired` rules and disarm them."""
+        for item in fired:
+            self.last_fired[item.rule_id] = now
+            self.disarm(
+                item.rule_id, item.symbol_id, item.metric, item.operator, item.threshold, item.band
+            )
+            # Its UPDATE of last_triggered_at writes armed=False.
+            self.rearmed.discard(item.rule_id)
+
+    def __len__(self):
+        return self.count
@@ -0,0 +1,141 @@
+"""
+Alert evaluation inside the ingest loops, right after a cycle is published.
+
+The ingest script hands the rows it has just written to
+:meth:`InlineEvaluator.submit`, which returns immediately; a background thread
+matches them against a :class:`~alerts.index.RuleIndex` of the market's rules
+and queues the notifications in the outbox (alerts/outbox.py) for
+scripts/telegram_sender.py. The values come from memory and the rules from
+the index; the database is only polled for the rule changelog (RuleChange, at
+most once per ``SYNC_INTERVAL``, see alerts/index.py) and the chats' digest
+windows (ChatSettings, re-read once a minute by alerts/digest.py). Fired rules
+cost the outbox INSERT and an UPDATE of ``last_triggered_at``; the index marks
+them as fired only after that commits, so a failed write is retried on the
+next cycle instead of being lost. Market-wide scan rules (alerts/scan.py) are
+evaluated against the published board in the same pass.
+
+If evaluation falls behind, only the newest pending cycle is kept: an alert is
+about the current market, and older values would fire rules that no longer
+hold.
+
+Enabled with ``INLINE_ALERTS=1`` (or, as before the outbox, when
+``TELEGRAM_BOT_TOKEN`` is set in the ingest environment); ``INLINE_ALERTS=0``
+keeps using only ``scripts/check_alerts.py``. Do not run both: the outbox
+drops duplicates of the same cooldown window, but the cron checker and the
+inline evaluator do not share cooldowns.
+"""
+import os
+import threading
+from datetime import datetime, timezone
+
+from django.db import close_old_connections
+
+from config.metrics import ALERT_EVALUATION_DURATION, ALERTS_TRIGGERED, timed
+from screener.board import get_board
+from screener.models import Symbol
+
+from .evaluation import ALERT_METRICS, DEFAULT_COOLDOWN
+from .index import RuleIndex
+from .messages import alert_message
+from .models import AlertRule
+from .outbox import record_fired
+from .scan import Scanner
+
+
+class InlineEvaluator:
+    def __init__(self, market_type: str, cooldown=DEFAULT_COOLDOWN):
+        self.market_type = market_type
+        self.cooldown = cooldown
+        self.index = None
+        self.scanner = Scanner(market_type, "inline")
+        self.dropped = 0
+        self._pending = None
+        self._ready = threading.Condition()
+        self._thread = threading.Thread(
+            target=self._run, name=f"inline-alerts-{market_type}", daemon=True
+        )
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def submit(self, ts, symbol_ids, rows, board=None) -> None:
+        """
+        Queue a published cycle: ``rows`` are the board rows (dicts with
+        ``symbol`` and the metrics), ``symbol_ids`` the matching Symbol ids,
+        ``board`` what publish_board() returned, for the scan rules. Never
+        blocks.
+        """
+        with self._ready:
+            if self._pending is not None:
+                self.dropped += 1
+            self._pending = (ts, symbol_ids, rows, board)
+            self._ready.notify()
+
+    def _run(self):
+        while True:
+            with self._ready:
+                while self._pending is None:
+                    self._ready.wait()
+                cycle, self._pending = self._pending, None
+            try:
+                self.evaluate(*cycle)
+            except Exception as exc:
+                print(f"[inline alerts {self.market_type}] Evaluation failed: {exc}")
+
+    def evaluate(self, ts, symbol_ids, rows, board=None) -> int:
+        """
+        Match one cycle, queue and mark the fired rules and scan rule hits.
+        Returns their count.
+        """
+        close_old_connections()
+        with timed(ALERT_EVALUATION_DURATION):
+            if self.index is None:
+                self.index = RuleIndex.load(self.market_type, self.cooldown)
+            else:
+                self.index = self.index.sync()
+
+            values = {}
+            codes = {}
+            for symbol_id, row in zip(symbol_ids, rows):
+                values[symbol_id] = {metric: row.get(metric) for metric in ALERT_METRICS}
+                codes[symbol_id] = row["symbol"]
+
+            now = datetime.now(timezone.utc)
+            fired = self.index.fired(values, now)
+
+        queued = []
+        for item in fired:
+            # Unsaved objects with what alert_message() and the UPDATE need.
+            rule = AlertRule(
+                id=item.rule_id,
+                symbol=Symbol(
+                    id=item.symbol_id, symbol=codes[item.symbol_id], market_type=self.market_type
+                ),
+                metric=item.metric,
+                operator=item.operator,
+                threshold=item.threshold,
+                telegram_chat_id=item.chat_id,
+            )
+            queued.append((rule, alert_message(rule, item.value, now)))
+
+        record_fired(queued, now, self.cooldown)
+        self.index.mark_fired(fired, now)
+        ALERTS_TRIGGERED.inc(len(queued))
+        # Re-armed rules are written back in batches.
+        self.index.checkpoint()
+
+        # Market-wide scan rules: one vectorized filter over the board each.
+        if board is None:
+            board = get_board(self.market_type)
+        return len(queued) + self.scanner.run(board, now)
+
+
+def start_inline_alerts(market_type: str):
+    """Started evaluator for an ingest loop, or None when disabled."""
+    flag = os.getenv("INLINE_ALERTS", "")
+    if flag == "0" or (flag != "1" and not os.getenv("TELEGRAM_BOT_TOKEN")):
+        print("Inline alert evaluation is disabled (set INLINE_ALERTS=1 to enable).")
+        return None
+    print(f"Inline alert evaluation enabled for {market_type}.")
+    return InlineEvaluator(market_type).start()
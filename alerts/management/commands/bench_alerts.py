@@ -0,0 +1,416 @@
+"""
+Scaling benchmark of the alert checker (scripts/check_alerts.py).
+
+Seeds the latest snapshot of N symbols and sweeps K alert rules (by default
+1k, 10k, 100k, 1M), each step adding rules to the previous one. Rules are
+generated like real ones: popular symbols get most of them, ``>`` is more
+common than ``<``, and thresholds sit in the tails of the metric's current
+cross-section, so a few percent fire. Each step runs one check end to end in
+three measured phases:
+
+- evaluation — ``evaluate_rules`` (rules + latest snapshots);
+- persistence — messages, outbox INSERT and UPDATE of the fired rules
+  (``record_fired``), as check_alerts.py does;
+- delivery — the sender worker loop (claim, digests, send, record_results)
+  against an in-process fake Telegram that answers at once. The time Telegram's
+  rate limits would need for the same messages (30/s for the bot, 1/s per
+  chat) is reported next to it.
+
+For every phase the report has wall time, queries and peak Python memory
+(tracemalloc, which slows the phases down; ``--no-memory`` for clean timings),
+and marks the phase that dominates each K and the first K at which each phase
+exceeds ``--budget`` seconds (the cron interval by default).
+
+Run it against a dedicated database, like ``manage.py bench`` (same guard and
+BENCH symbols):
+
+    python manage.py bench_alerts
+    python manage.py bench_alerts --rules 1000,10000,100000 --symbols 300
+    python manage.py bench_alerts --output bench/alerts.json --no-memory
+"""
+
+import asyncio
+import io
+import json
+import random
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from alerts.digest import build_digests
+from alerts.evaluation import evaluate_rules
+from alerts.messages import alert_message
+from alerts.models import AlertRule, Notification
+from alerts.outbox import claim, record_fired, record_results
+from alerts.telegram import CHAT_RATE, GLOBAL_RATE, TelegramSender
+from screener.management.commands.bench import (
+    SNAPSHOT_COLUMNS,
+    SYMBOL_PREFIX,
+    Command as ScreenerBench,
+    _git_revision,
+    check_market,
+)
+from screener.models import Symbol
+
+
+DEFAULT_SWEEP = "1000,10000,100000,1000000"
+
+PHASES = ("evaluation", "persistence", "delivery")
+
+# Share of the rules per metric and operator.
+METRIC_WEIGHTS = {
+    "change_15m": 0.2,
+    "change_1h": 0.15,
+    "change_1d": 0.1,
+    "oi_change_15m": 0.15,
+    "oi_change_1h": 0.1,
+    "volume_15m": 0.1,
+    "volume_1h": 0.05,
+    "funding_rate": 0.1,
+    "vdelta_15m": 0.05,
+}
+OPERATOR_WEIGHTS = {">": 0.45, ">=": 0.15, "<": 0.3, "<=": 0.1}
+
+RULE_COPY_COLUMNS = [
+    "user_id", "symbol_id", "metric", "operator", "threshold", "hysteresis",
+    "telegram_chat_id", "active", "armed", "created_at",
+]
+CHAT_ID_BASE = 1_000_000
+
+
+class FakeTelegram(TelegramSender):
+    """Answers every sendMessage in-process, with no rate limits."""
+
+    def __init__(self, **kwargs):
+        super().__init__("bench", global_rate=1e9, chat_rate=1e9, group_rate=1e9, **kwargs)
+        self.sent = 0
+
+    async def __aenter__(self):
+        self._slots = asyncio.Semaphore(self.concurrency)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+    async def _post(self, payload):
+        self.sent += 1
+        await asyncio.sleep(0)
+        return "ok", None, ""
+
+
+class RuleGenerator:
+    """Deterministic rules; the first K of a larger sweep are the same."""
+
+    def __init__(self, seed, symbol_ids, latest, chats_per_rule):
+        self.rng = np.random.default_rng(seed)
+        self.symbol_ids = np.array(symbol_ids)
+        # Zipf-like popularity: the first symbols get most of the rules.
+        popularity = 1.0 / np.arange(1, len(symbol_ids) + 1) ** 0.8
+        self.symbol_p = popularity / popularity.sum()
+        self.metrics = list(METRIC_WEIGHTS)
+        self.operators = list(OPERATOR_WEIGHTS)
+        # Current cross-section of every metric, to put thresholds in its tails.
+        self.sorted_values = {m: np.sort(np.asarray(latest[m], dtype=np.float64)) for m in self.metrics}
+        self.chats_per_rule = chats_per_rule
+        self.generated = 0
+
+    def take(self, count):
+        """Arrays (symbol_id, metric, operator, threshold, chat_id) of ``count`` rules."""
+        rng = self.rng
+        metric_idx = rng.choice(len(self.metrics), count, p=list(METRIC_WEIGHTS.values()))
+        op_idx = rng.choice(len(self.operators), count, p=list(OPERATOR_WEIGHTS.values()))
+        above = op_idx < 2
+        # Quantile of the threshold: the top or bottom few percent.
+        tail = rng.beta(1.0, 30.0, count)
+        quantile = np.where(above, 1.0 - tail, tail)
+        thresholds = np.empty(count)
+        for i, metric in enumerate(self.metrics):
+            mask = metric_idx == i
+            values = self.sorted_values[metric]
+            thresholds[mask] = values[(quantile[mask] * (len(values) - 1)).astype(int)]
+        symbols = rng.choice(self.symbol_ids, count, p=self.symbol_p)
+        # About ``chats_per_rule`` chats per rule: users with several rules.
+        first = self.generated
+        self.generated += count
+        chats = CHAT_ID_BASE + (
+            (np.arange(first, first + count) * self.chats_per_rule).astype(np.int64)
+        )
+        rng.shuffle(chats)
+        return symbols, metric_idx, op_idx, thresholds, chats
+
+
+class Command(BaseCommand):
+    help = "Benchmark check_alerts at K = 1k..1M synthetic rules: evaluation, persistence, delivery"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rules", default=DEFAULT_SWEEP, help=f"Comma-separated K values (default: {DEFAULT_SWEEP})")
+        parser.add_argument("--symbols", type=int, default=500, help="Symbols to seed (default: 500)")
+        parser.add_argument("--market", choices=["spot", "futures"], default="futures")
+        parser.add_argument(
+            "--rules-per-chat", type=float, default=5.0,
+            help="Average rules per Telegram chat (default: 5)",
+        )
+        parser.add_argument("--batch", type=int, default=100, help="Sender claim batch (default: 100)")
+        parser.add_argument(
+            "--budget", type=float, default=60.0,
+            help="Seconds a phase may take per check, e.g. the cron interval (default: 60)",
+        )
+        parser.add_argument("--no-memory", action="store_true", help="Skip tracemalloc (cleaner timings)")
+        parser.add_argument("--seed", type=int, default=42, help="Random seed of the data generator")
+        parser.add_argument("--output", default="", help="Report path (default: bench/alerts-<time>.json)")
+        parser.add_argument("--keep", action="store_true", help="Keep the seeded data afterwards")
+        parser.add_argument("--force", action="store_true", help="Seed even if the market has real symbols")
+
+    def handle(self, *args, **options):
+        try:
+            sweep = sorted({int(k) for k in options["rules"].split(",") if k.strip()})
+        except ValueError:
+            raise CommandError("--rules must be comma-separated integers")
+        if not sweep or sweep[0] <= 0:
+            raise CommandError("--rules needs positive values")
+
+        report = self.run(options, sweep)
+        output = Path(options["output"] or Path(settings.BASE_DIR) / "bench" /
+                      f"alerts-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(report, indent=2))
+        self.print_report(report)
+        self.stdout.write(f"\nReport written to {output}")
+
+    # --- seeding --------------------------------------------------------
+
+    def seed_symbols(self, options):
+        """BENCH symbols with one latest snapshot each; ``{metric: [values]}``."""
+        market = options["market"]
+        screener_bench = ScreenerBench(stdout=io.StringIO())
+        check_market(market, options["force"])
+        screener_bench.cleanup(market)
+
+        now = timezone.now().replace(microsecond=0)
+        symbols = Symbol.objects.bulk_create([
+            Symbol(symbol=f"{SYMBOL_PREFIX}{i:04d}USDT", name=f"Bench {i}", market_type=market,
+                   last_seen_at=now)
+            for i in range(options["symbols"])
+        ])
+        if any(s.pk is None for s in symbols):
+            symbols = list(Symbol.objects.filter(market_type=market, symbol__startswith=SYMBOL_PREFIX)
+                           .order_by("symbol"))
+
+        rows = list(screener_bench._snapshot_rows(random.Random(options["seed"]), symbols, now, 1, 60))
+        screener_bench._copy_snapshots(iter(rows))
+        latest = {
+            metric: [float(row[SNAPSHOT_COLUMNS.index(metric)]) for row in rows]
+            for metric in METRIC_WEIGHTS
+        }
+        return [s.pk for s in symbols], latest
+
+    def add_rules(self, generator, count):
+        symbols, metric_idx, op_idx, thresholds, chats = generator.take(count)
+        metrics = generator.metrics
+        operators = generator.operators
+        now = timezone.now()
+        if connection.vendor != "postgresql":
+            AlertRule.objects.bulk_create(
+                [
+                    AlertRule(
+                        symbol_id=int(symbols[i]), metric=metrics[metric_idx[i]],
+                        operator=operators[op_idx[i]], threshold=float(thresholds[i]),
+                        telegram_chat_id=int(chats[i]),
+                    )
+                    for i in range(count)
+                ],
+                batch_size=5000,
+            )
+            return
+
+        sql = (
+            f"COPY alerts_alertrule ({', '.join(RULE_COPY_COLUMNS)}) "
+            "FROM STDIN WITH (FORMAT csv)"
+        )
+        created = now.isoformat()
+        buffer = io.StringIO()
+        for i in range(count):
+            buffer.write(
+                f",{symbols[i]},{metrics[metric_idx[i]]},{operators[op_idx[i]]},"
+                f"{float(thresholds[i])!r},0,{chats[i]},t,t,{created}\n"
+            )
+        buffer.seek(0)
+        with connection.cursor() as cursor:
+            cursor.cursor.copy_expert(sql, buffer)
+            cursor.execute("ANALYZE alerts_alertrule")
+
+    def reset(self, market):
+        """Every bench rule armed and out of cooldown, bench outbox empty."""
+        # A plain DELETE: the collector would load every notification first.
+        notifications = Notification.objects.filter(rule__symbol__symbol__startswith=SYMBOL_PREFIX)
+        notifications._raw_delete(notifications.db)
+        AlertRule.objects.filter(
+            symbol__market_type=market, symbol__symbol__startswith=SYMBOL_PREFIX
+        ).update(armed=True, last_triggered_at=None)
+
+    # --- phases ---------------------------------------------------------
+
+    def measure(self, func, memory):
+        """``(result, stats)`` of one run of ``func``."""
+        if memory:
+            tracemalloc.start()
+        try:
+            with CaptureQueriesContext(connection) as ctx:
+                start = time.perf_counter()
+                result = func()
+                elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1] if memory else None
+        finally:
+            if memory:
+                tracemalloc.stop()
+        return result, {
+            "seconds": round(elapsed, 4),
+            "queries": len(ctx.captured_queries),
+            "peak_mb": round(peak / 2**20, 1) if peak is not None else None,
+        }
+
+    def check(self, options):
+        memory = not options["no_memory"]
+        now = timezone.now()
+
+        fired, evaluation = self.measure(lambda: evaluate_rules(now), memory)
+
+        def persist():
+            record_fired([(rule, alert_message(rule, value, now)) for rule, value in fired], now)
+        _, persistence = self.measure(persist, memory)
+
+        def deliver():
+            # Everything queued is due: the digest window is not waited for.
+            due = timezone.now() + timedelta(hours=1)
+            messages, per_chat = 0, {}
+            loop = asyncio.new_event_loop()
+            try:
+                sender = loop.run_until_complete(FakeTelegram().__aenter__())
+                while True:
+                    rows = claim(options["batch"], due)
+                    if not rows:
+                        break
+                    digests = build_digests(rows)
+                    results = loop.run_until_complete(
+                        sender.send_many([(d.chat_id, d.text) for d in digests])
+                    )
+                    record_results(digests, results, timezone.now())
+                    messages += len(digests)
+                    for digest in digests:
+                        per_chat[digest.chat_id] = per_chat.get(digest.chat_id, 0) + 1
+            finally:
+                loop.close()
+            return messages, per_chat
+        (messages, per_chat), delivery = self.measure(deliver, memory)
+
+        # What Telegram's limits alone would take for these messages.
+        delivery["telegram_seconds"] = round(max(
+            messages / GLOBAL_RATE,
+            max(((n - 1) / CHAT_RATE for n in per_chat.values()), default=0.0),
+        ), 1)
+        return {
+            "fired": len(fired),
+            "messages": messages,
+            "chats": len(per_chat),
+            "evaluation": evaluation,
+            "persistence": persistence,
+            "delivery": delivery,
+        }
+
+    @staticmethod
+    def phase_seconds(step, phase):
+        stats = step[phase]
+        if phase == "delivery":
+            return max(stats["seconds"], stats["telegram_seconds"])
+        return stats["seconds"]
+
+    def run(self, options, sweep):
+        market = options["market"]
+        symbol_ids, latest = self.seed_symbols(options)
+        chats_per_rule = 1.0 / max(options["rules_per_chat"], 1.0)
+        generator = RuleGenerator(options["seed"], symbol_ids, latest, chats_per_rule)
+
+        steps = []
+        try:
+            total = 0
+            for k in sweep:
+                start = time.perf_counter()
+                self.add_rules(generator, k - total)
+                total = k
+                self.reset(market)
+                self.stdout.write(
+                    f"K={k}: rules seeded in {time.perf_counter() - start:.1f}s, checking..."
+                )
+                step = {"rules": k, **self.check(options)}
+                step["bottleneck"] = max(PHASES, key=lambda p: self.phase_seconds(step, p))
+                steps.append(step)
+                self.stdout.write(
+                    f"  fired {step['fired']}, {step['messages']} messages; "
+                    + ", ".join(f"{p} {self.phase_seconds(step, p):.2f}s" for p in PHASES)
+                )
+        finally:
+            if not options["keep"]:
+                ScreenerBench(stdout=io.StringIO()).cleanup(market)
+
+        return {
+            "meta": {
+                "created_at": timezone.now().isoformat(),
+                "git": _git_revision(),
+                "database": connection.vendor,
+                "symbols": options["symbols"],
+                "rules_per_chat": options["rules_per_chat"],
+                "market": market,
+                "batch": options["batch"],
+                "budget": options["budget"],
+                "memory": not options["no_memory"],
+                "seed": options["seed"],
+            },
+            "steps": steps,
+        }
+
+    # --- output ---------------------------------------------------------
+
+    def print_report(self, report):
+        steps = report["steps"]
+        budget = report["meta"]["budget"]
+
+        def mb(stats):
+            return "-" if stats["peak_mb"] is None else f"{stats['peak_mb']:.0f}"
+
+        self.stdout.write("")
+        self.stdout.write(
+            f"{'rules':>9} {'fired':>8} {'msgs':>7} | "
+            f"{'eval s':>8} {'q':>4} {'MB':>6} | {'persist s':>9} {'q':>4} {'MB':>6} | "
+            f"{'deliver s':>9} {'tg s':>7} {'q':>6} {'MB':>6} | bottleneck"
+        )
+        for step in steps:
+            e, p, d = step["evaluation"], step["persistence"], step["delivery"]
+            self.stdout.write(
+                f"{step['rules']:>9} {step['fired']:>8} {step['messages']:>7} | "
+                f"{e['seconds']:>8.2f} {e['queries']:>4} {mb(e):>6} | "
+                f"{p['seconds']:>9.2f} {p['queries']:>4} {mb(p):>6} | "
+                f"{d['seconds']:>9.2f} {d['telegram_seconds']:>7.1f} {d['queries']:>6} {mb(d):>6} | "
+                f"{step['bottleneck']}"
+            )
+        if report["meta"]["memory"]:
+            self.stdout.write("(timings include tracemalloc overhead; --no-memory for clean timings)")
+        self.stdout.write("delivery takes the longer of our side and Telegram's limits (tg s)")
+
+        self.stdout.write("")
+        for phase in PHASES:
+            dominant = next((s["rules"] for s in steps if s["bottleneck"] == phase), None)
+            over = next((s for s in steps if self.phase_seconds(s, phase) > budget), None)
+            parts = [
+                f"bottleneck from K={dominant}" if dominant is not None else "never the bottleneck",
+                (f"over the {budget:g}s budget at K={over['rules']} "
+                 f"({self.phase_seconds(over, phase):.1f}s)") if over else f"within {budget:g}s",
+            ]
+            self.stdout.write(f"{phase:<12} {'; '.join(parts)}")
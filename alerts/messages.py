@@ -0,0 +1,50 @@
+"""
+Telegram texts for fired alert rules (HTML parse mode).
+"""
+
+
+def format_metric_value(metric_name: str, val: float) -> str:
+    """Format metric value for display."""
+    if "change" in metric_name or "oi_change" in metric_name:
+        return f"{val:.2f}%"
+    elif "volume" in metric_name:
+        abs_v = abs(val)
+        if abs_v >= 1_000_000_000:
+            return f"{val / 1_000_000_000:.2f}B"
+        elif abs_v >= 1_000_000:
+            return f"{val / 1_000_000:.2f}M"
+        elif abs_v >= 1_000:
+            return f"{val / 1_000:.2f}K"
+        else:
+            return f"{val:.2f}"
+    elif "funding" in metric_name:
+        return f"{val:.4f}"
+    else:
+        return f"{val:.2f}"
+
+
+def alert_message(alert, value: float, now) -> str:
+    """HTML message for an AlertRule (symbol loaded) that fired with ``value``."""
+    # Get metric display name
+    metric_display = dict(alert.METRIC_CHOICES).get(alert.metric, alert.metric)
+
+    # Format values
+    threshold_formatted = format_metric_value(alert.metric, float(alert.threshold))
+    value_formatted = format_metric_value(alert.metric, float(value))
+
+    # Determine emoji based on operator and value
+    if alert.operator in [">", ">="]:
+        emoji = "📈" if float(value) > float(alert.threshold) else "📉"
+    else:
+        emoji = "📉" if float(value) < float(alert.threshold) else "📈"
+
+    return (
+        f"{emoji} <b>Алерт сработал!</b>\n\n"
+        f"<b>Символ:</b> {alert.symbol.symbol}\n"
+        f"<b>Тип рынка:</b> {alert.symbol.market_type.upper()}\n"
+        f"<b>Показатель:</b> {metric_display}\n"
+        f"<b>Условие:</b> {alert.metric} {alert.operator} {threshold_formatted}\n"
+        f"<b>Текущее значение:</b> <code>{value_formatted}</code>\n"
+        f"<b>Порог:</b> <code>{threshold_formatted}</code>\n\n"
+        f"⏰ {now.strftime('%Y-%m-%d %H:%M:%S UTC')}"
+    )
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-19 19:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alerts', '0002_notification_outbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatSettings',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chat_id', models.BigIntegerField(unique=True)),
+                ('digest_window', models.PositiveIntegerField(blank=True, help_text='Seconds to collect alerts into one digest message; empty = ALERT_DIGEST_WINDOW, 0 = send every alert separately', null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'chat settings',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['chat_id'], name='alerts_notification_chat'),
+        ),
+    ]
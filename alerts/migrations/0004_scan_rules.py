@@ -0,0 +1,41 @@
+# Generated by Django 5.2.8 on 2026-10-19 19:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alerts', '0003_chat_digests'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScanRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('market_type', models.CharField(choices=[('spot', 'Spot'), ('futures', 'Futures')], max_length=10)),
+                ('metric', models.CharField(choices=[('change_15m', 'Price change 15m, %'), ('change_1h', 'Price change 1h, %'), ('change_1d', 'Price change 1d, %'), ('oi_change_15m', 'OI change 15m, %'), ('oi_change_1h', 'OI change 1h, %'), ('volume_15m', 'Volume 15m'), ('volume_1h', 'Volume 1h'), ('funding_rate', 'Funding rate'), ('vdelta_15m', 'Vdelta 15m')], max_length=32)),
+                ('operator', models.CharField(choices=[('>', '>'), ('<', '<'), ('>=', '>='), ('<=', '<=')], max_length=2)),
+                ('threshold', models.FloatField()),
+                ('min_volume_15m', models.FloatField(blank=True, help_text='Only symbols with at least this 15m volume', null=True)),
+                ('cooldown_minutes', models.PositiveIntegerField(default=5, help_text='Per symbol: a symbol fires again only after this')),
+                ('telegram_chat_id', models.BigIntegerField(help_text='Telegram chat id to send alerts to')),
+                ('active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_triggered_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='scan_rules', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ('-created_at',),
+            },
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='scan_rule',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='alerts.scanrule'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-19 19:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alerts', '0004_scan_rules'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alertrule',
+            name='armed',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddField(
+            model_name='alertrule',
+            name='hysteresis',
+            field=models.FloatField(default=0.0, help_text='After firing, the value must go back across the threshold by this much before the alert can fire again'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-19 19:25
+
+import django.core.validators
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alerts', '0006_rule_changes'),
+        ('screener', '0006_symbol_last_seen_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='alertrule',
+            name='hysteresis',
+            field=models.FloatField(default=0.0, help_text='After firing, the value must go back across the threshold by this much before the alert can fire again', validators=[django.core.validators.MinValueValidator(0.0)]),
+        ),
+        # Rules saved before the validator existed.
+        migrations.RunSQL(
+            "UPDATE alerts_alertrule SET hysteresis = 0 WHERE hysteresis < 0",
+            migrations.RunSQL.noop,
+        ),
+        migrations.AddConstraint(
+            model_name='alertrule',
+            constraint=models.CheckConstraint(condition=models.Q(('hysteresis__gte', 0)), name='alerts_alertrule_hysteresis_gte_0'),
+        ),
+    ]
@@ -1,5 +1,9 @@
 from django.conf import settings
+from django.core.validators import MinValueValidator
 from django.db import models
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
 
 from screener.models import Symbol
 
@@ -36,6 +40,12 @@ class AlertRule(models.Model):
     metric = models.CharField(max_length=32, choices=METRIC_CHOICES)
     operator = models.CharField(max_length=2, choices=OPERATOR_CHOICES)
     threshold = models.FloatField()
+    hysteresis = models.FloatField(
+        default=0.0,
+        validators=[MinValueValidator(0.0)],
+        help_text="After firing, the value must go back across the threshold "
+        "by this much before the alert can fire again",
+    )
 
     telegram_chat_id = models.BigIntegerField(
         help_text="Telegram chat id to send alerts to", null=True, blank=True
@@ -44,11 +54,191 @@ class AlertRule(models.Model):
     active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     last_triggered_at = models.DateTimeField(null=True, blank=True)
+    # Edge trigger: cleared when the rule fires, set again once the value is
+    # back across the threshold (see alerts/evaluation.py).
+    armed = models.BooleanField(default=True)
 
     class Meta:
         ordering = ("-created_at",)
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(hysteresis__gte=0), name="alerts_alertrule_hysteresis_gte_0"
+            ),
+        ]
 
     def __str__(self) -> str:
         return f"{self.symbol.symbol} {self.metric} {self.operator} {self.threshold}"
 
 
+class ScanRule(models.Model):
+    """
+    Market-wide alert: fires for every symbol of ``market_type`` whose metric
+    matches, evaluated over the whole latest board at once (alerts/scan.py).
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="scan_rules",
+        null=True,
+        blank=True,
+    )
+    market_type = models.CharField(max_length=10, choices=Symbol.MARKET_TYPE_CHOICES)
+
+    metric = models.CharField(max_length=32, choices=AlertRule.METRIC_CHOICES)
+    operator = models.CharField(max_length=2, choices=AlertRule.OPERATOR_CHOICES)
+    threshold = models.FloatField()
+    min_volume_15m = models.FloatField(
+        null=True, blank=True, help_text="Only symbols with at least this 15m volume"
+    )
+    cooldown_minutes = models.PositiveIntegerField(
+        default=5, help_text="Per symbol: a symbol fires again only after this"
+    )
+
+    telegram_chat_id = models.BigIntegerField(help_text="Telegram chat id to send alerts to")
+
+    active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Last time any symbol fired.
+    last_triggered_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ("-created_at",)
+
+    def __str__(self) -> str:
+        return f"{self.market_type}: * {self.metric} {self.operator} {self.threshold}"
+
+
+class Notification(models.Model):
+    """
+    Outbox row: a Telegram message waiting to be sent by
+    scripts/telegram_sender.py (see alerts/outbox.py).
+    """
+
+    STATUS_PENDING = "pending"
+    STATUS_SENDING = "sending"
+    STATUS_SENT = "sent"
+    STATUS_DEAD = "dead"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Pending"),
+        (STATUS_SENDING, "Sending"),
+        (STATUS_SENT, "Sent"),
+        (STATUS_DEAD, "Dead"),
+    ]
+
+    rule = models.ForeignKey(
+        AlertRule, on_delete=models.CASCADE, related_name="notifications", null=True, blank=True
+    )
+    scan_rule = models.ForeignKey(
+        ScanRule, on_delete=models.CASCADE, related_name="notifications", null=True, blank=True
+    )
+    chat_id = models.BigIntegerField()
+    text = models.TextField()
+    # Same alert written twice (a retried evaluation) is stored once.
+    idempotency_key = models.CharField(max_length=64, unique=True)
+
+    status = models.CharField(max_length=8, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    # Pending: earliest next send; sending: end of the claim lease.
+    next_attempt_at = models.DateTimeField()
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ("-created_at",)
+        indexes = [
+            models.Index(
+                fields=["next_attempt_at"],
+                name="alerts_notification_due",
+                condition=models.Q(status__in=["pending", "sending"]),
+            ),
+            # Pending rows of a chat are claimed together into one digest.
+            models.Index(
+                fields=["chat_id"],
+                name="alerts_notification_chat",
+                condition=models.Q(status="pending"),
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.chat_id} {self.status} ({self.idempotency_key})"
+
+
+class ChatSettings(models.Model):
+    """Per-chat delivery settings (defaults come from settings.py)."""
+
+    chat_id = models.BigIntegerField(unique=True)
+    digest_window = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Seconds to collect alerts into one digest message; "
+        "empty = ALERT_DIGEST_WINDOW, 0 = send every alert separately",
+    )
+
+    class Meta:
+        verbose_name_plural = "chat settings"
+
+    def __str__(self) -> str:
+        return str(self.chat_id)
+
+
+class RuleChange(models.Model):
+    """
+    Changelog of AlertRule edits for long-running rule indexes
+    (alerts/index.py). The id is the changelog version.
+    """
+
+    # Not a foreign key: deleted rules keep their entry.
+    rule_id = models.BigIntegerField()
+    # Previous (symbol_id, metric, operator, threshold) if the rule was indexed.
+    old = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self) -> str:
+        return f"{self.pk}: rule {self.rule_id}"
+
+
+# Keep long-running rule indexes (alerts/index.py) in sync with edits made
+# through the site or the admin.
+
+_INDEX_FIELDS = ("symbol_id", "metric", "operator", "threshold", "active", "telegram_chat_id")
+
+
+def _indexed_key(values):
+    symbol_id, metric, operator, threshold, active, chat_id = values
+    if not active or not chat_id:
+        return None
+    return (symbol_id, metric, operator, float(threshold))
+
+
+@receiver(pre_save, sender=AlertRule)
+def remember_indexed_state(sender, instance, update_fields=None, **kwargs):
+    instance._index_old = None
+    if instance.pk is None or update_fields == frozenset({"last_triggered_at"}):
+        return
+    old = sender.objects.filter(pk=instance.pk).values_list(*_INDEX_FIELDS).first()
+    if old is not None:
+        instance._index_old = _indexed_key(old)
+        # A changed (or re-enabled) condition starts armed.
+        new = _indexed_key(tuple(getattr(instance, f) for f in _INDEX_FIELDS))
+        if new != instance._index_old:
+            instance.armed = True
+
+
+@receiver(post_save, sender=AlertRule)
+def record_rule_saved(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields == frozenset({"last_triggered_at"}):
+        return
+    from .index import record_change
+
+    record_change(instance.pk, getattr(instance, "_index_old", None))
+
+
+@receiver(post_delete, sender=AlertRule)
+def record_rule_deleted(sender, instance, **kwargs):
+    from .index import record_change
+
+    old = _indexed_key(tuple(getattr(instance, f) for f in _INDEX_FIELDS))
+    if old is not None:
+        record_change(instance.pk, old)
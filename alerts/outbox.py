@@ -0,0 +1,244 @@
+"""
+Notification outbox: evaluation writes messages, sender workers deliver them.
+
+The alert checker and the inline evaluator call :func:`record_fired`, which
+stores one Notification per fired rule and updates ``last_triggered_at`` in
+the same transaction, then returns: evaluation never waits for Telegram.
+
+``scripts/telegram_sender.py`` workers loop over :func:`claim` and
+:func:`record_results`:
+
+- ``claim`` takes due rows with ``SELECT ... FOR UPDATE SKIP LOCKED``, so any
+  number of workers (processes or hosts) get disjoint batches, together with
+  the other pending rows of the same chats (merged into digests, see
+  alerts/digest.py), and leases them for ``LEASE`` (status ``sending``). A worker that dies mid-batch leaves rows
+  whose lease runs out; they are claimed again. Delivery is therefore
+  at-least-once: a crash between the send and its UPDATE repeats the message.
+- the end of the lease (``next_attempt_at``) identifies the claim: a worker
+  extends it with :func:`renew` before sending, and :func:`renew` and
+  ``record_results`` only touch rows whose lease is still the one this worker
+  set. Rows re-claimed by another worker after the lease ran out are left
+  alone and not sent twice by this one.
+- failed sends go back to ``pending`` with exponential backoff; after
+  ``MAX_ATTEMPTS`` claims, or when Telegram rejects the message (blocked bot,
+  bad chat id), the row is dead-lettered (status ``dead``, see the admin).
+
+The idempotency key is the rule and the cooldown window the alert fired in, so
+two evaluators firing the same rule at the same time (an overlapping cron run,
+cron next to the inline evaluator) store one notification. Scan rules
+(alerts/scan.py) queue with :func:`record_scan_fired`, keyed per symbol.
+"""
+import random
+from datetime import timedelta
+
+from django.db import models, transaction
+from django.db.models import Case, F, Q, Value, When
+
+from config.metrics import ALERT_NOTIFICATIONS, ALERT_NOTIFY_LAG
+
+from .digest import digest_window
+from .evaluation import DEFAULT_COOLDOWN, mark_triggered
+from .models import Notification, ScanRule
+
+
+MAX_ATTEMPTS = 8
+BACKOFF_BASE = timedelta(seconds=10)
+BACKOFF_MAX = timedelta(minutes=30)
+
+# A claimed batch must be delivered within this time, rate limiting included.
+LEASE = timedelta(minutes=5)
+
+
+def idempotency_key(rule_id, fired_at, cooldown=DEFAULT_COOLDOWN) -> str:
+    window = int(fired_at.timestamp() // cooldown.total_seconds())
+    return f"rule:{rule_id}:{window}"
+
+
+def record_fired(fired, now, cooldown=DEFAULT_COOLDOWN) -> int:
+    """
+    Queue ``[(rule, text), ...]`` and mark the rules triggered, atomically.
+    Notifications already in the outbox (same key) are skipped.
+    """
+    if not fired:
+        return 0
+    rows = [
+        Notification(
+            rule_id=rule.pk,
+            chat_id=rule.telegram_chat_id,
+            text=text,
+            idempotency_key=idempotency_key(rule.pk, now, cooldown),
+            # Wait for more alerts of the chat to send them as one digest.
+            next_attempt_at=now + digest_window(rule.telegram_chat_id),
+        )
+        for rule, text in fired
+    ]
+    with transaction.atomic():
+        Notification.objects.bulk_create(rows, ignore_conflicts=True)
+        mark_triggered([rule for rule, _ in fired], now)
+    return len(rows)
+
+
+def scan_idempotency_key(rule, symbol, fired_at) -> str:
+    window = int(fired_at.timestamp() // (rule.cooldown_minutes * 60 or 1))
+    return f"scan:{rule.pk}:{symbol}:{window}"
+
+
+def record_scan_fired(fired, now) -> int:
+    """
+    Queue ``[(ScanFired, text), ...]`` (alerts/scan.py) and set the scan
+    rules' ``last_triggered_at``, atomically.
+    """
+    if not fired:
+        return 0
+    rows = [
+        Notification(
+            scan_rule_id=item.rule.pk,
+            chat_id=item.rule.telegram_chat_id,
+            text=text,
+            idempotency_key=scan_idempotency_key(item.rule, item.symbol, now),
+            next_attempt_at=now + digest_window(item.rule.telegram_chat_id),
+        )
+        for item, text in fired
+    ]
+    with transaction.atomic():
+        Notification.objects.bulk_create(rows, ignore_conflicts=True)
+        ScanRule.objects.filter(pk__in={item.rule.pk for item, _ in fired}).update(
+            last_triggered_at=now
+        )
+    return len(rows)
+
+
+def backoff(attempts: int) -> timedelta:
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** max(0, attempts - 1))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def claim(limit: int, now, lease=LEASE) -> list:
+    """
+    Lease up to ``limit`` due notifications to this worker, plus up to
+    ``limit`` not yet due pending ones of the same chats.
+    """
+    with transaction.atomic():
+        rows = list(
+            Notification.objects.select_for_update(skip_locked=True)
+            .filter(
+                status__in=(Notification.STATUS_PENDING, Notification.STATUS_SENDING),
+                next_attempt_at__lte=now,
+            )
+            .order_by("next_attempt_at")[:limit]
+        )
+        if rows:
+            rows += list(
+                Notification.objects.select_for_update(skip_locked=True)
+                .filter(
+                    status=Notification.STATUS_PENDING,
+                    chat_id__in={row.chat_id for row in rows},
+                    next_attempt_at__gt=now,
+                )
+                .order_by("next_attempt_at")[:limit]
+            )
+            Notification.objects.filter(pk__in=[row.pk for row in rows]).update(
+                status=Notification.STATUS_SENDING,
+                next_attempt_at=now + lease,
+                attempts=F("attempts") + 1,
+            )
+    for row in rows:
+        row.status = Notification.STATUS_SENDING
+        row.next_attempt_at = now + lease
+        row.attempts += 1
+    return rows
+
+
+def _held(notifications) -> Q:
+    """Rows of ``notifications`` still under the lease this worker holds."""
+    by_lease = {}
+    for notification in notifications:
+        by_lease.setdefault(notification.next_attempt_at, []).append(notification.pk)
+    held = Q(pk__in=[])
+    for lease_end, pks in by_lease.items():
+        held |= Q(pk__in=pks, next_attempt_at=lease_end)
+    return Q(status=Notification.STATUS_SENDING) & held
+
+
+def renew(notifications, now, lease=LEASE) -> list:
+    """
+    Extend the lease of the ``notifications`` this worker still holds and
+    return them; the others were re-claimed after their lease ran out.
+    """
+    if not notifications:
+        return []
+    with transaction.atomic():
+        held = set(
+            Notification.objects.select_for_update()
+            .filter(_held(notifications))
+            .values_list("pk", flat=True)
+        )
+        Notification.objects.filter(pk__in=held).update(next_attempt_at=now + lease)
+    kept = [n for n in notifications if n.pk in held]
+    for notification in kept:
+        notification.next_attempt_at = now + lease
+    return kept
+
+
+def record_results(digests, results, now) -> dict:
+    """
+    Store the outcome of a delivered batch: ``digests`` from build_digests()
+    and ``results`` from TelegramSender.send_many, same order. One UPDATE per
+    outcome, limited to the rows this worker still holds. Returns counts of
+    updated notifications per outcome.
+    """
+    sent, dead, retry = [], [], []
+    for digest, result in zip(digests, results):
+        for notification in digest.items:
+            if result.ok:
+                sent.append(notification)
+                ALERT_NOTIFY_LAG.observe((now - notification.created_at).total_seconds())
+            elif not result.retryable or notification.attempts >= MAX_ATTEMPTS:
+                dead.append((notification, result.error))
+            else:
+                retry.append((notification, result.error))
+
+    def per_row(values, output_field):
+        return Case(
+            *(When(pk=pk, then=Value(value)) for pk, value in values),
+            output_field=output_field,
+        )
+
+    counts = {"sent": 0, "retry": 0, "dead": 0}
+    with transaction.atomic():
+        if sent:
+            counts["sent"] = Notification.objects.filter(_held(sent)).update(
+                status=Notification.STATUS_SENT, sent_at=now, last_error=""
+            )
+        if dead:
+            counts["dead"] = Notification.objects.filter(_held(n for n, _ in dead)).update(
+                status=Notification.STATUS_DEAD,
+                last_error=per_row([(n.pk, error) for n, error in dead], models.TextField()),
+            )
+        if retry:
+            counts["retry"] = Notification.objects.filter(_held(n for n, _ in retry)).update(
+                status=Notification.STATUS_PENDING,
+                next_attempt_at=per_row(
+                    [(n.pk, now + backoff(n.attempts)) for n, _ in retry], models.DateTimeField()
+                ),
+                last_error=per_row([(n.pk, error) for n, error in retry], models.TextField()),
+            )
+
+    for outcome, count in counts.items():
+        if count:
+            ALERT_NOTIFICATIONS.labels(outcome=outcome).inc(count)
+    return counts
+
+
+def requeue(queryset, now) -> int:
+    """Send dead (or any) notifications again with a fresh attempt budget."""
+    return queryset.update(
+        status=Notification.STATUS_PENDING, attempts=0, next_attempt_at=now, last_error=""
+    )
+
+
+def purge_sent(older_than) -> int:
+    """Delete notifications sent before ``older_than``."""
+    return Notification.objects.filter(
+        status=Notification.STATUS_SENT, sent_at__lt=older_than
+    ).delete()[0]
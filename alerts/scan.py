@@ -0,0 +1,216 @@
+"""
+Market-wide scan rules (ScanRule): "any futures pair with oi_change_15m > 5".
+
+A scan rule is evaluated once per cycle against the latest board
+(screener/board.py) as one vectorized filter over a metric column: the
+condition, the optional ``min_volume_15m`` floor and the per-symbol cooldown
+are numpy comparisons over every symbol at once, so one scan rule costs about
+as much as one board filter instead of one AlertRule per symbol.
+
+Per-symbol cooldowns live in :class:`ScanState`: a slot per symbol code and,
+per rule, a float64 array of the epoch seconds each slot last fired. Slots of
+symbols that left the board are dropped once their cooldowns ran out, so the
+state stays about the size of the board. The state is kept in memory and
+checkpointed to the cache when something fires, under a key per market and
+owner (``inline``, ``cron``): each evaluator continues its own state after a
+restart and never overwrites the other's. The outbox key
+``scan:<rule>:<symbol>:<window>`` drops the duplicates when both run, or when
+a state is lost.
+"""
+import time
+from typing import NamedTuple
+
+import numpy as np
+from django.core.cache import cache
+
+from config.metrics import ALERTS_TRIGGERED
+from screener.board import BOARD_METRICS
+from screener.models import Symbol
+
+from .messages import alert_message
+from .models import AlertRule, ScanRule
+from .outbox import record_scan_fired
+
+
+OPS = {
+    ">": np.greater,
+    "<": np.less,
+    ">=": np.greater_equal,
+    "<=": np.less_equal,
+}
+
+# Active scan rules are re-read this often by a long-running Scanner.
+RELOAD_INTERVAL = 30.0
+
+STATE_TTL = 24 * 60 * 60
+
+# Off-board slots tolerated before ScanState.compact runs.
+MAX_STALE_SLOTS = 256
+
+_VOLUME_COLUMN = BOARD_METRICS.index("volume_15m")
+
+
+def state_key(market_type: str, owner: str) -> str:
+    return f"alerts:scan:state:{market_type}:{owner}"
+
+
+class ScanFired(NamedTuple):
+    rule: ScanRule
+    symbol: str
+    value: float
+
+
+class ScanState:
+    """Per-rule, per-symbol last fired times (epoch seconds, 0 = never)."""
+
+    def __init__(self):
+        self.slots = {}
+        self.fired_at = {}
+
+    def positions(self, symbols) -> np.ndarray:
+        """Slots of the board's ``symbols``, registering new ones."""
+        slots = self.slots
+        for symbol in symbols:
+            if symbol not in slots:
+                slots[symbol] = len(slots)
+        return np.fromiter((slots[s] for s in symbols), dtype=np.intp, count=len(symbols))
+
+    def rule_array(self, rule_id) -> np.ndarray:
+        array = self.fired_at.get(rule_id)
+        if array is None or len(array) < len(self.slots):
+            grown = np.zeros(len(self.slots), dtype=np.float64)
+            if array is not None:
+                grown[:len(array)] = array
+            array = self.fired_at[rule_id] = grown
+        return array
+
+    def mark(self, fired, now) -> None:
+        now_ts = now.timestamp()
+        for item in fired:
+            self.rule_array(item.rule.pk)[self.slots[item.symbol]] = now_ts
+
+    def prune(self, rule_ids) -> None:
+        """Forget rules that were deleted or disabled."""
+        for rule_id in set(self.fired_at) - set(rule_ids):
+            del self.fired_at[rule_id]
+
+    def compact(self, symbols, now, keep_seconds) -> None:
+        """
+        Drop the slots of symbols not in ``symbols`` (the board) that did not
+        fire within ``keep_seconds`` (the longest cooldown).
+        """
+        count = len(self.slots)
+        recent = np.zeros(count, dtype=bool)
+        cutoff = now.timestamp() - keep_seconds
+        for array in self.fired_at.values():
+            recent[:len(array)] |= array >= cutoff
+        on_board = set(symbols)
+        kept = [
+            (symbol, slot) for symbol, slot in self.slots.items()
+            if symbol in on_board or recent[slot]
+        ]
+        index = np.fromiter((slot for _, slot in kept), dtype=np.intp, count=len(kept))
+        self.slots = {symbol: i for i, (symbol, _) in enumerate(kept)}
+        for rule_id, array in self.fired_at.items():
+            full = np.zeros(count, dtype=np.float64)
+            full[:len(array)] = array
+            self.fired_at[rule_id] = full[index]
+
+    @classmethod
+    def load(cls, market_type: str, owner: str):
+        state = cls()
+        saved = cache.get(state_key(market_type, owner))
+        if saved:
+            state.slots, state.fired_at = saved
+        return state
+
+    def save(self, market_type: str, owner: str) -> None:
+        cache.set(state_key(market_type, owner), (self.slots, self.fired_at), timeout=STATE_TTL)
+
+
+def evaluate_scan_rules(rules, board, state, now) -> list:
+    """
+    ``[ScanFired, ...]`` for every (rule, symbol) of the board that matches
+    and is out of the rule's cooldown in ``state`` (see ScanState.mark).
+    """
+    if not board or not board["count"] or not rules:
+        return []
+    symbols = board["symbols"]
+    values = board["values"]
+    missing = board.get("missing")
+    slots = state.positions(symbols)
+    now_ts = now.timestamp()
+
+    fired = []
+    for rule in rules:
+        op_func = OPS.get(rule.operator)
+        if op_func is None:
+            continue
+        column = BOARD_METRICS.index(rule.metric)
+        column_values = values[:, column]
+        mask = op_func(column_values, float(rule.threshold))
+        if missing is not None:
+            mask &= ~missing[:, column]
+        if rule.min_volume_15m is not None:
+            mask &= values[:, _VOLUME_COLUMN] >= rule.min_volume_15m
+        if not mask.any():
+            continue
+        last = state.rule_array(rule.pk)
+        mask &= now_ts - last[slots] >= rule.cooldown_minutes * 60
+        hits = np.flatnonzero(mask)
+        if not len(hits):
+            continue
+        fired.extend(ScanFired(rule, symbols[i], float(column_values[i])) for i in hits)
+    return fired
+
+
+def scan_message(item: ScanFired, market_type: str, now) -> str:
+    rule = item.rule
+    # The usual per-symbol layout (alerts/messages.py).
+    alert = AlertRule(
+        symbol=Symbol(symbol=item.symbol, market_type=market_type),
+        metric=rule.metric,
+        operator=rule.operator,
+        threshold=rule.threshold,
+    )
+    return alert_message(alert, item.value, now)
+
+
+class Scanner:
+    """
+    Scan rules of one market, evaluated against each published board.
+    ``owner`` names the evaluator ("inline", "cron") whose state this is.
+    """
+
+    def __init__(self, market_type: str, owner: str, reload_interval: float = RELOAD_INTERVAL):
+        self.market_type = market_type
+        self.owner = owner
+        self.reload_interval = reload_interval
+        self.rules = []
+        self.state = ScanState.load(market_type, owner)
+        self._loaded_at = None
+
+    def _load_rules(self) -> None:
+        now = time.monotonic()
+        if self._loaded_at is not None and now - self._loaded_at < self.reload_interval:
+            return
+        self.rules = list(ScanRule.objects.filter(market_type=self.market_type, active=True))
+        self.state.prune([rule.pk for rule in self.rules])
+        self._loaded_at = now
+
+    def run(self, board, now) -> int:
+        """Evaluate, queue the notifications and checkpoint. Returns their count."""
+        self._load_rules()
+        if board and len(self.state.slots) - board["count"] > MAX_STALE_SLOTS:
+            longest = max((rule.cooldown_minutes * 60 for rule in self.rules), default=0)
+            self.state.compact(board["symbols"], now, longest)
+        fired = evaluate_scan_rules(self.rules, board, self.state, now)
+        if not fired:
+            return 0
+        record_scan_fired(
+            [(item, scan_message(item, self.market_type, now)) for item in fired], now
+        )
+        self.state.mark(fired, now)
+        self.state.save(self.market_type, self.owner)
+        ALERTS_TRIGGERED.inc(len(fired))
+        return len(fired)
@@ -0,0 +1,254 @@
+"""
+Telegram Bot API delivery shared by the alert checker and the inline
+evaluator of the ingest loops.
+
+Messages are sent by :class:`TelegramSender` on an asyncio loop over one
+pooled HTTP/1.1 client, many at a time, within Telegram's limits:
+
+- ``GLOBAL_RATE`` messages per second for the bot;
+- ``CHAT_RATE`` per second to one private chat, ``GROUP_RATE`` to a group
+  (negative chat id).
+
+Each limit is a token bucket. Messages to one chat go out one at a time in
+order, so the per-chat spacing holds between actual sends; a 429 answer pauses
+the chat's bucket for its ``retry_after`` and the message is retried. Network errors and 5xx are retried
+with exponential backoff up to ``MAX_ATTEMPTS``.
+
+Synchronous code (the cron checker, the inline evaluator thread) uses
+:class:`DeliveryWorker`, which runs the loop in a background thread, or the
+one-shot :func:`deliver`. ``TELEGRAM_API_BASE`` points the client elsewhere
+(the fake server of scripts/bench_telegram.py).
+"""
+import asyncio
+import os
+import threading
+import time
+from typing import NamedTuple
+
+import httpx
+
+from config.metrics import TELEGRAM_SEND_DURATION
+
+
+API_BASE = os.getenv("TELEGRAM_API_BASE", "https://api.telegram.org")
+
+GLOBAL_RATE = 30.0
+CHAT_RATE = 1.0
+GROUP_RATE = 20.0 / 60.0
+
+# Requests in flight (and pooled connections).
+CONCURRENCY = 32
+MAX_ATTEMPTS = 4
+# 429 answers do not count as attempts, up to this many per message.
+MAX_RATE_LIMITED = 10
+BACKOFF_BASE = 0.5
+REQUEST_TIMEOUT = 10.0
+
+# Per-chat buckets unused for this long are dropped.
+_CHAT_BUCKET_TTL = 10 * 60
+
+
+class TokenBucket:
+    """
+    ``rate`` tokens per second, at most ``capacity`` stored.
+
+    Waiters reserve their token up front (the balance goes negative), so each
+    sleeps once for its own slot instead of all of them polling the bucket.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def reserve(self) -> float:
+        """Take a token; returns the seconds to wait before using it."""
+        now = time.monotonic()
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+        self.tokens -= 1.0
+        wait = self.updated - now
+        if self.tokens < 0:
+            wait += -self.tokens / self.rate
+        return wait
+
+    async def acquire(self) -> None:
+        while True:
+            wait = self.reserve()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            # A pause that started while we slept invalidates the slot.
+            if time.monotonic() >= self.paused_until:
+                return
+
+    def pause(self, seconds: float) -> None:
+        """Honour a ``retry_after``: no tokens until it has passed."""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+        self.updated = max(self.updated, self.paused_until)
+
+
+class SendResult(NamedTuple):
+    chat_id: int
+    ok: bool
+    attempts: int
+    # Seconds from send_many() to the final answer, including rate limiting.
+    latency: float
+    error: str = ""
+    # False when Telegram rejected the message itself (4xx other than 429).
+    retryable: bool = True
+
+
+class TelegramSender:
+    """Rate-limited concurrent sendMessage; use as ``async with``."""
+
+    def __init__(
+        self,
+        token: str,
+        api_base: str = None,
+        global_rate: float = GLOBAL_RATE,
+        chat_rate: float = CHAT_RATE,
+        group_rate: float = GROUP_RATE,
+        concurrency: int = CONCURRENCY,
+    ):
+        self.url = f"{api_base or API_BASE}/bot{token}/sendMessage"
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self.concurrency = concurrency
+        self.global_bucket = TokenBucket(global_rate)
+        # chat_id -> (TokenBucket, asyncio.Lock)
+        self.chats = {}
+        self.client = None
+        self._slots = None
+        self._pruned_at = time.monotonic()
+
+    async def __aenter__(self):
+        limits = httpx.Limits(
+            max_connections=self.concurrency, max_keepalive_connections=self.concurrency
+        )
+        self.client = httpx.AsyncClient(limits=limits, timeout=REQUEST_TIMEOUT)
+        self._slots = asyncio.Semaphore(self.concurrency)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.client.aclose()
+
+    def _chat(self, chat_id):
+        now = time.monotonic()
+        if now - self._pruned_at > _CHAT_BUCKET_TTL:
+            self.chats = {
+                chat: state for chat, state in self.chats.items()
+                if state[1].locked() or now - state[0].updated < _CHAT_BUCKET_TTL
+            }
+            self._pruned_at = now
+        state = self.chats.get(chat_id)
+        if state is None:
+            rate = self.group_rate if int(chat_id) < 0 else self.chat_rate
+            state = self.chats[chat_id] = (TokenBucket(rate), asyncio.Lock())
+        return state
+
+    async def _post(self, payload):
+        """One attempt: ``(result, retry_after, error)``."""
+        start = time.perf_counter()
+        result, retry_after, error = "error", None, ""
+        try:
+            resp = await self.client.post(self.url, json=payload)
+            if resp.status_code == 429:
+                result = "rate_limited"
+                try:
+                    retry_after = resp.json()["parameters"]["retry_after"]
+                except (ValueError, KeyError, TypeError):
+                    retry_after = 1
+            elif resp.status_code >= 500:
+                error = f"HTTP {resp.status_code}"
+            elif resp.status_code >= 400:
+                result, error = "rejected", f"HTTP {resp.status_code}: {resp.text[:200]}"
+            else:
+                result = "ok"
+        except httpx.HTTPError as exc:
+            error = f"{type(exc).__name__}: {exc}"
+        TELEGRAM_SEND_DURATION.labels(result=result).observe(time.perf_counter() - start)
+        return result, retry_after, error
+
+    async def send(self, chat_id, text, parse_mode="HTML", started=None) -> SendResult:
+        started = started or time.perf_counter()
+        payload = {"chat_id": chat_id, "text": text, "parse_mode": parse_mode}
+        chat_bucket, chat_lock = self._chat(chat_id)
+        error = ""
+        attempt = limited = 0
+        async with chat_lock:
+            while attempt < MAX_ATTEMPTS and limited < MAX_RATE_LIMITED:
+                # Global slot first: the chat token is then taken right
+                # before the request, one second after the previous send.
+                await self.global_bucket.acquire()
+                await chat_bucket.acquire()
+                async with self._slots:
+                    result, retry_after, error = await self._post(payload)
+                if result == "ok":
+                    return SendResult(chat_id, True, attempt + 1, time.perf_counter() - started)
+                if result == "rejected":
+                    print(f"Telegram rejected the message to {chat_id}: {error}")
+                    return SendResult(
+                        chat_id, False, attempt + 1, time.perf_counter() - started, error, False
+                    )
+                if result == "rate_limited":
+                    # Not counted as a failed attempt: the message is fine.
+                    limited += 1
+                    chat_bucket.pause(float(retry_after))
+                    error = f"429 retry_after={retry_after}"
+                    continue
+                attempt += 1
+                if attempt < MAX_ATTEMPTS:
+                    await asyncio.sleep(BACKOFF_BASE * 2 ** (attempt - 1))
+        print(f"Failed to send telegram message to {chat_id}: {error}")
+        return SendResult(chat_id, False, max(attempt, 1), time.perf_counter() - started, error)
+
+    async def send_many(self, messages) -> list:
+        """Send ``(chat_id, text)`` pairs concurrently; results in the same order."""
+        started = time.perf_counter()
+        return await asyncio.gather(
+            *(self.send(chat_id, text, started=started) for chat_id, text in messages)
+        )
+
+
+class DeliveryWorker:
+    """A TelegramSender on an event loop in a background thread."""
+
+    def __init__(self, token: str, **sender_kwargs):
+        self.sender = TelegramSender(token, **sender_kwargs)
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="telegram", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self.sender.__aenter__(), self.loop).result()
+        return self
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self.sender.__aexit__(None, None, None), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+
+    def send_many(self, messages) -> list:
+        """Blocks until every message is sent or has failed."""
+        if not messages:
+            return []
+        future = asyncio.run_coroutine_threadsafe(self.sender.send_many(messages), self.loop)
+        return future.result()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def deliver(token: str, messages, **sender_kwargs) -> list:
+    """Send ``(chat_id, text)`` pairs with a short-lived worker."""
+    if not messages:
+        return []
+    with DeliveryWorker(token, **sender_kwargs) as worker:
+        return worker.send_many(messages)
@@ -1,10 +1,16 @@
+from datetime import timedelta
+
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.http import require_POST
+from django.utils import timezone
+from django.views.decorators.http import require_GET, require_POST
 
+from accounts.decorators import access_required
 from screener.models import Symbol
 
+from .backtest import backtest_rule
 from .forms import AlertRuleForm
 from .models import AlertRule
 
@@ -116,3 +122,37 @@ def toggle_alert(request, alert_id):
     return redirect("alerts:list")
 
 
+BACKTEST_DAYS = 30
+
+
+@access_required
+@require_GET
+def backtest_alert(request, symbol):
+    """
+    How often a rule would have fired over the stored history, before saving
+    it: the create form's fields as GET params, plus ``days`` (max 30).
+    """
+    market_type = request.GET.get("market_type", "spot").strip()
+    if market_type not in ["spot", "futures"]:
+        market_type = "spot"
+    symbol_obj = get_object_or_404(Symbol, symbol__iexact=symbol, market_type=market_type)
+
+    form = AlertRuleForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({"errors": form.errors}, status=400)
+    try:
+        days = min(max(int(request.GET.get("days", BACKTEST_DAYS)), 1), BACKTEST_DAYS)
+    except ValueError:
+        days = BACKTEST_DAYS
+
+    rule = form.cleaned_data
+    result = backtest_rule(
+        symbol_obj.id,
+        rule["metric"],
+        rule["operator"],
+        rule["threshold"],
+        rule["hysteresis"],
+        start=timezone.now() - timedelta(days=days),
+    )
+    result.update({"symbol": symbol_obj.symbol, "days": days})
+    return JsonResponse(result)
@@ -0,0 +1,293 @@
+"""
+Column registry and row serializer for the screener JSON API.
+
+Every UI column maps to the snapshot field it is read from and to the kind of
+JSON keys it produces (raw value, ``*_formatted``, ``*_color``). A request for
+a handful of visible columns only selects and formats those columns.
+"""
+from screener.templatetags.formatting import format_price, format_ticks
+from screener.utils import format_volume
+
+try:
+    import msgpack
+except ImportError:
+    # msgpack is optional: without it the columnar format is served as JSON.
+    msgpack = None
+
+
+# column -> (ORM field for values_list, kind of emitted keys)
+SCREENER_COLUMNS = {
+    "symbol": ("symbol__symbol", "raw"),
+    "name": ("symbol__name", "raw"),
+    "price": ("price", "price"),
+    "change_5m": ("change_5m", "raw"),
+    "change_15m": ("change_15m", "raw"),
+    "change_1h": ("change_1h", "raw"),
+    "change_8h": ("change_8h", "raw"),
+    "change_1d": ("change_1d", "raw"),
+    "oi_change_5m": ("oi_change_5m", "raw"),
+    "oi_change_15m": ("oi_change_15m", "raw"),
+    "oi_change_1h": ("oi_change_1h", "raw"),
+    "oi_change_8h": ("oi_change_8h", "raw"),
+    "oi_change_1d": ("oi_change_1d", "raw"),
+    "volatility_5m": ("volatility_5m", "raw"),
+    "volatility_15m": ("volatility_15m", "raw"),
+    "volatility_1h": ("volatility_1h", "raw"),
+    "ticks_5m": ("ticks_5m", "ticks"),
+    "ticks_15m": ("ticks_15m", "ticks"),
+    "ticks_1h": ("ticks_1h", "ticks"),
+    "vdelta_5m": ("vdelta_5m", "volume"),
+    "vdelta_15m": ("vdelta_15m", "volume"),
+    "vdelta_1h": ("vdelta_1h", "volume"),
+    "vdelta_8h": ("vdelta_8h", "volume"),
+    "vdelta_1d": ("vdelta_1d", "volume"),
+    "volume_5m": ("volume_5m", "volume"),
+    "volume_15m": ("volume_15m", "volume"),
+    "volume_1h": ("volume_1h", "volume"),
+    "volume_8h": ("volume_8h", "volume"),
+    "volume_1d": ("volume_1d", "volume"),
+    "funding_rate": ("funding_rate", "float"),
+    "open_interest": ("open_interest", "open_interest"),
+    "ts": ("ts", "ts"),
+}
+
+
+_NO_COLORS = {}
+
+# Kinds that emit a ``*_color`` key.
+_COLORED_KINDS = {"price", "ticks", "volume", "open_interest"}
+
+
+def parse_fields(raw):
+    """
+    Parse the ``fields=`` whitelist into registry column names.
+
+    Unknown names are ignored, ``symbol`` is always included because it
+    identifies the row. An empty value selects every column.
+    """
+    if not raw:
+        return list(SCREENER_COLUMNS)
+    requested = {name.strip() for name in raw.split(",") if name.strip()}
+    requested.add("symbol")
+    return [col for col in SCREENER_COLUMNS if col in requested]
+
+
+def db_fields(columns):
+    return [SCREENER_COLUMNS[col][0] for col in columns]
+
+
+def _emit_raw(item, col, value, market_type, color):
+    item[col] = value
+
+
+def _emit_price(item, col, value, market_type, color):
+    item[col] = float(value)
+    item[f"{col}_formatted"] = format_price(value)
+    item[f"{col}_color"] = color
+
+
+def _emit_ticks(item, col, value, market_type, color):
+    item[col] = value
+    item[f"{col}_formatted"] = format_ticks(value)
+    item[f"{col}_color"] = color
+
+
+def _emit_volume(item, col, value, market_type, color):
+    item[col] = value
+    item[f"{col}_formatted"] = format_volume(value, market_type)
+    item[f"{col}_color"] = color
+
+
+def _emit_float(item, col, value, market_type, color):
+    item[col] = float(value) if value else 0.0
+
+
+def _emit_open_interest(item, col, value, market_type, color):
+    item[col] = float(value) if value else 0.0
+    item[f"{col}_formatted"] = format_volume(value, market_type)
+    item[f"{col}_color"] = color
+
+
+def _emit_ts(item, col, value, market_type, color):
+    item[col] = value.isoformat()
+
+
+_EMITTERS = {
+    "raw": _emit_raw,
+    "price": _emit_price,
+    "ticks": _emit_ticks,
+    "volume": _emit_volume,
+    "float": _emit_float,
+    "open_interest": _emit_open_interest,
+    "ts": _emit_ts,
+}
+
+
+def serialize_rows(rows, columns, market_type, colors=None):
+    """
+    Turn ``values_list`` tuples (in ``columns`` order) into row dicts.
+
+    Only the keys belonging to the requested columns are emitted. ``colors``
+    is the precomputed ``{metric: {symbol: class}}`` map of the latest board
+    (see screener.board); the first column is always ``symbol``.
+    """
+    colors = colors or {}
+    plan = [
+        (index, col, _EMITTERS[SCREENER_COLUMNS[col][1]], colors.get(col, _NO_COLORS))
+        for index, col in enumerate(columns)
+    ]
+    data = []
+    for row in rows:
+        symbol = row[0]
+        item = {}
+        for index, col, emit, col_colors in plan:
+            emit(item, col, row[index], market_type, col_colors.get(symbol, ""))
+        data.append(item)
+    return data
+
+
+def _column_raw(out, col, values, market_type, colors):
+    out[col] = list(values)
+
+
+def _column_price(out, col, values, market_type, colors):
+    out[col] = [float(v) for v in values]
+    out[f"{col}_formatted"] = [format_price(v) for v in values]
+    out[f"{col}_color"] = colors
+
+
+def _column_ticks(out, col, values, market_type, colors):
+    out[col] = list(values)
+    out[f"{col}_formatted"] = [format_ticks(v) for v in values]
+    out[f"{col}_color"] = colors
+
+
+def _column_volume(out, col, values, market_type, colors):
+    out[col] = list(values)
+    out[f"{col}_formatted"] = [format_volume(v, market_type) for v in values]
+    out[f"{col}_color"] = colors
+
+
+def _column_float(out, col, values, market_type, colors):
+    out[col] = [float(v) if v else 0.0 for v in values]
+
+
+def _column_open_interest(out, col, values, market_type, colors):
+    out[col] = [float(v) if v else 0.0 for v in values]
+    out[f"{col}_formatted"] = [format_volume(v, market_type) for v in values]
+    out[f"{col}_color"] = colors
+
+
+def _column_ts(out, col, values, market_type, colors):
+    out[col] = [v.isoformat() for v in values]
+
+
+_COLUMN_ENCODERS = {
+    "raw": _column_raw,
+    "price": _column_price,
+    "ticks": _column_ticks,
+    "volume": _column_volume,
+    "float": _column_float,
+    "open_interest": _column_open_interest,
+    "ts": _column_ts,
+}
+
+
+def serialize_columns(rows, columns, market_type, colors=None):
+    """
+    Columnar form of :func:`serialize_rows`: one array per emitted key.
+
+    ``values_list`` tuples are transposed once and every column is encoded
+    as a whole, so no per-row dict is ever built and key names are sent
+    once per response instead of once per row.
+    """
+    colors = colors or {}
+    arrays = list(zip(*rows)) if rows else [()] * len(columns)
+    symbols = arrays[0]
+    data = {}
+    for col, values in zip(columns, arrays):
+        kind = SCREENER_COLUMNS[col][1]
+        col_colors = None
+        if kind in _COLORED_KINDS:
+            lookup = colors.get(col, _NO_COLORS)
+            col_colors = [lookup.get(sym, "") for sym in symbols]
+        _COLUMN_ENCODERS[kind](data, col, values, market_type, col_colors)
+    return {
+        "format": "columnar",
+        "count": len(rows),
+        "columns": list(data),
+        "data": data,
+    }
+
+
+def pack_msgpack(payload):
+    """Encode a columnar payload with MessagePack, or None if msgpack is missing."""
+    if msgpack is None:
+        return None
+    return msgpack.packb(payload, use_bin_type=True)
+
+
+# Metric columns of the symbol history endpoint, in response key order.
+HISTORY_FIELDS = [
+    "price",
+    "volatility_15m",
+    "volatility_5m",
+    "volatility_1h",
+    "ticks_15m",
+    "ticks_5m",
+    "ticks_1h",
+    "vdelta_5m",
+    "vdelta_15m",
+    "vdelta_1h",
+    "vdelta_8h",
+    "vdelta_1d",
+    "volume_5m",
+    "volume_15m",
+    "volume_1h",
+    "volume_8h",
+    "volume_1d",
+    "oi_change_5m",
+    "oi_change_15m",
+    "oi_change_1h",
+    "oi_change_8h",
+    "oi_change_1d",
+    "change_5m",
+    "change_15m",
+    "change_1h",
+    "change_8h",
+    "change_1d",
+    "funding_rate",
+    "open_interest",
+]
+
+
+def parse_history_fields(raw):
+    """Metric whitelist for symbol history; empty selects every metric."""
+    if not raw:
+        return list(HISTORY_FIELDS)
+    requested = [name.strip() for name in raw.split(",") if name.strip()]
+    fields = [name for name in requested if name in HISTORY_FIELDS]
+    # Keep the requested order: the first metric drives downsampling.
+    return list(dict.fromkeys(fields)) or list(HISTORY_FIELDS)
+
+
+def serialize_history(rows, fields):
+    """``values_list("ts", *fields)`` rows -> history dicts."""
+    convert = [
+        (index, name, _HISTORY_CONVERTERS.get(name))
+        for index, name in enumerate(fields, start=1)
+    ]
+    data = []
+    for row in rows:
+        item = {"ts": row[0].isoformat()}
+        for index, name, func in convert:
+            value = row[index]
+            item[name] = func(value) if func else value
+        data.append(item)
+    return data
+
+
+_HISTORY_CONVERTERS = {
+    "price": lambda value: float(value) if value is not None else None,
+    "open_interest": lambda value: float(value) if value else 0.0,
+}
@@ -1,6 +1,6 @@
 from django.urls import path
 
-from .views import screener_list_api, symbol_detail_api, symbols_list_api
+from .views import screener_list_api, symbol_detail_api, symbols_history_api, symbols_list_api
 
 app_name = "api"
 
@@ -8,6 +8,7 @@ urlpatterns = [
     path("screener/", screener_list_api, name="screener_list"),
     path("symbol/<str:symbol>/", symbol_detail_api, name="symbol_detail"),
     path("symbols/", symbols_list_api, name="symbols_list"),
+    path("symbols/history/", symbols_history_api, name="symbols_history"),
 ]
 
 
@@ -1,40 +1,117 @@
-from django.http import JsonResponse
-from django.shortcuts import get_object_or_404
+from datetime import datetime, timedelta, timezone as dt_timezone
+from itertools import groupby
+from operator import itemgetter
+
+from asgiref.sync import sync_to_async
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.http import HttpResponse, JsonResponse
+from django.shortcuts import aget_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from accounts.decorators import access_required
+from config.instrumentation import span
 
+from screener.board import aget_board, board_snapshot, get_board_colors
+from screener.downsample import BUCKETS_PER_POINT, MAX_RANGE, downsample_rows, load_range
 from screener.models import ScreenerSnapshot, Symbol
-from screener.utils import format_volume, get_value_color
-from screener.templatetags.formatting import format_price, format_ticks
+from screener.symbol_index import aget_symbol_index
 
+from .serializers import (
+    db_fields,
+    pack_msgpack,
+    parse_fields,
+    parse_history_fields,
+    serialize_columns,
+    serialize_history,
+    serialize_rows,
+)
 
-@access_required
-def screener_list_api(request):
-    from django.db import connection
-    from django.utils import timezone
-    from datetime import timedelta
-    
+
+# Символ считается активным, если у него есть снимки за это окно.
+RECENT_WINDOW = timedelta(hours=2)
+
+# Upper bound for ?limit= on the screener endpoint.
+MAX_LIMIT = 1000
+
+MSGPACK_CONTENT_TYPE = "application/msgpack"
+
+# Symbol history: rows without a range, and point budget with from/to.
+HISTORY_LIMIT = 50
+DEFAULT_POINTS = 500
+MAX_POINTS = 2000
+
+# Upper bound for ?symbols= on the batch history endpoint.
+MAX_BATCH_SYMBOLS = 100
+
+
+def _get_market_type(request):
     market_type = request.GET.get("market_type", "spot").strip()
     if market_type not in ["spot", "futures"]:
         market_type = "spot"
-    
-    recent_cutoff = timezone.now() - timedelta(hours=2)
-    
-    with connection.cursor() as cursor:
-        cursor.execute("""
-            SELECT DISTINCT ON (s.symbol_id)
-                s.id
-            FROM screener_screenersnapshot s
-            INNER JOIN screener_symbol sym ON s.symbol_id = sym.id
-            WHERE s.ts >= %s AND sym.market_type = %s
-            ORDER BY s.symbol_id, s.ts DESC
-        """, [recent_cutoff, market_type])
-        
-        snapshot_ids = [row[0] for row in cursor.fetchall()]
-    
-    if not snapshot_ids:
-        snapshot_ids = [0]
-    
-    qs = ScreenerSnapshot.objects.filter(id__in=snapshot_ids).select_related("symbol")
+    return market_type
+
+
+def _wants_msgpack(request):
+    if request.GET.get("encoding") == "msgpack":
+        return True
+    accept = request.headers.get("Accept", "")
+    return "application/msgpack" in accept or "application/x-msgpack" in accept
+
+
+def _parse_ts(val):
+    """ISO 8601 datetime or unix seconds -> aware datetime (UTC if naive)."""
+    if not val:
+        return None
+    try:
+        return datetime.fromtimestamp(float(val), tz=dt_timezone.utc)
+    except (ValueError, OverflowError, OSError):
+        pass
+    try:
+        parsed = parse_datetime(val)
+    except ValueError:
+        return None
+    if parsed is not None and timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, dt_timezone.utc)
+    return parsed
+
+
+def _to_int(val, default, maximum):
+    try:
+        number = int(val)
+    except (TypeError, ValueError):
+        return default
+    if number < 0:
+        return default
+    if maximum is not None:
+        number = min(number, maximum)
+    return number
+
+
+def _latest_snapshots_qs(market_type):
+    """
+    Latest snapshot per symbol of the given market as a single query.
+
+    Same ``DISTINCT ON (symbol_id)`` selection as before, but expressed through
+    the ORM as a subquery so it can be evaluated with the async ORM.
+    """
+    recent_cutoff = timezone.now() - RECENT_WINDOW
+    latest_ids = (
+        ScreenerSnapshot.objects.filter(
+            ts__gte=recent_cutoff, symbol__market_type=market_type
+        )
+        .order_by("symbol_id", "-ts")
+        .distinct("symbol_id")
+        .values("id")
+    )
+    return ScreenerSnapshot.objects.filter(id__in=latest_ids)
+
+
+@access_required
+async def screener_list_api(request):
+    market_type = _get_market_type(request)
+
+    qs = _latest_snapshots_qs(market_type)
     
     search = request.GET.get("search", "").strip()
     if search:
@@ -117,254 +194,204 @@ def screener_list_api(request):
 
     sort_field = allowed_sort_fields.get(sort, "oi_change_15m")
     if order == "asc":
-        qs = qs.order_by(sort_field)
+        qs = qs.order_by(sort_field, "id")
     else:
-        qs = qs.order_by(f"-{sort_field}")
+        qs = qs.order_by(f"-{sort_field}", "-id")
 
-    # Convert queryset to list
-    snapshots = list(qs)
-    
-    # Store previous values per symbol for comparison
-    # This will be populated as we iterate
-    symbol_previous_values = {}
-    
-    data = []
-    for s in snapshots:
-        symbol = s.symbol.symbol
-        prev_vals = symbol_previous_values.get(symbol, {})
-        
-        # Format vdelta values (use same formatter as volume for consistency - both in USDT)
-        market_type = s.symbol.market_type
-        vdelta_5m_formatted = format_volume(s.vdelta_5m, market_type)
-        vdelta_15m_formatted = format_volume(s.vdelta_15m, market_type)
-        vdelta_1h_formatted = format_volume(s.vdelta_1h, market_type)
-        vdelta_8h_formatted = format_volume(s.vdelta_8h, market_type)
-        vdelta_1d_formatted = format_volume(s.vdelta_1d, market_type)
-        
-        # Get colors for vdelta (compare with previous value for same symbol)
-        vdelta_5m_color = get_value_color(s.vdelta_5m, prev_vals.get("vdelta_5m"), False)
-        vdelta_15m_color = get_value_color(s.vdelta_15m, prev_vals.get("vdelta_15m"), False)
-        vdelta_1h_color = get_value_color(s.vdelta_1h, prev_vals.get("vdelta_1h"), False)
-        vdelta_8h_color = get_value_color(s.vdelta_8h, prev_vals.get("vdelta_8h"), False)
-        vdelta_1d_color = get_value_color(s.vdelta_1d, prev_vals.get("vdelta_1d"), False)
-        
-        # Format volume values (use different thresholds for spot / futures)
-        volume_5m_formatted = format_volume(s.volume_5m, market_type)
-        volume_15m_formatted = format_volume(s.volume_15m, market_type)
-        volume_1h_formatted = format_volume(s.volume_1h, market_type)
-        volume_8h_formatted = format_volume(s.volume_8h, market_type)
-        volume_1d_formatted = format_volume(s.volume_1d, market_type)
-        
-        # Get colors for volume (compare with previous value for same symbol)
-        volume_5m_color = get_value_color(s.volume_5m, prev_vals.get("volume_5m"), True)
-        volume_15m_color = get_value_color(s.volume_15m, prev_vals.get("volume_15m"), True)
-        volume_1h_color = get_value_color(s.volume_1h, prev_vals.get("volume_1h"), True)
-        volume_8h_color = get_value_color(s.volume_8h, prev_vals.get("volume_8h"), True)
-        volume_1d_color = get_value_color(s.volume_1d, prev_vals.get("volume_1d"), True)
-        
-        # Format OI and get color (same thresholds as volume)
-        oi_formatted = format_volume(s.open_interest, market_type)
-        oi_color = get_value_color(s.open_interest, prev_vals.get("open_interest"), True)
-        
-        # Format price
-        price_formatted = format_price(s.price)
-        price_color = get_value_color(s.price, prev_vals.get("price"), True)
-        
-        # Format ticks
-        ticks_5m_formatted = format_ticks(s.ticks_5m)
-        ticks_15m_formatted = format_ticks(s.ticks_15m)
-        ticks_1h_formatted = format_ticks(s.ticks_1h)
-        ticks_5m_color = get_value_color(s.ticks_5m, prev_vals.get("ticks_5m"), True)
-        ticks_15m_color = get_value_color(s.ticks_15m, prev_vals.get("ticks_15m"), True)
-        ticks_1h_color = get_value_color(s.ticks_1h, prev_vals.get("ticks_1h"), True)
-        
-        data.append({
-            "symbol": s.symbol.symbol,
-            "name": s.symbol.name,
-            "price": float(s.price),
-            "price_formatted": price_formatted,
-            "price_color": price_color,
-            "change_5m": s.change_5m,
-            "change_15m": s.change_15m,
-            "change_1h": s.change_1h,
-            "change_8h": s.change_8h,
-            "change_1d": s.change_1d,
-            "oi_change_5m": s.oi_change_5m,
-            "oi_change_15m": s.oi_change_15m,
-            "oi_change_1h": s.oi_change_1h,
-            "oi_change_8h": s.oi_change_8h,
-            "oi_change_1d": s.oi_change_1d,
-            "volatility_5m": s.volatility_5m,
-            "volatility_15m": s.volatility_15m,
-            "volatility_1h": s.volatility_1h,
-            "ticks_5m": s.ticks_5m,
-            "ticks_5m_formatted": ticks_5m_formatted,
-            "ticks_5m_color": ticks_5m_color,
-            "ticks_15m": s.ticks_15m,
-            "ticks_15m_formatted": ticks_15m_formatted,
-            "ticks_15m_color": ticks_15m_color,
-            "ticks_1h": s.ticks_1h,
-            "ticks_1h_formatted": ticks_1h_formatted,
-            "ticks_1h_color": ticks_1h_color,
-            # Vdelta - raw values and formatted
-            "vdelta_5m": s.vdelta_5m,
-            "vdelta_5m_formatted": vdelta_5m_formatted,
-            "vdelta_5m_color": vdelta_5m_color,
-            "vdelta_15m": s.vdelta_15m,
-            "vdelta_15m_formatted": vdelta_15m_formatted,
-            "vdelta_15m_color": vdelta_15m_color,
-            "vdelta_1h": s.vdelta_1h,
-            "vdelta_1h_formatted": vdelta_1h_formatted,
-            "vdelta_1h_color": vdelta_1h_color,
-            "vdelta_8h": s.vdelta_8h,
-            "vdelta_8h_formatted": vdelta_8h_formatted,
-            "vdelta_8h_color": vdelta_8h_color,
-            "vdelta_1d": s.vdelta_1d,
-            "vdelta_1d_formatted": vdelta_1d_formatted,
-            "vdelta_1d_color": vdelta_1d_color,
-            # Volume - raw values and formatted
-            "volume_5m": s.volume_5m,
-            "volume_5m_formatted": volume_5m_formatted,
-            "volume_5m_color": volume_5m_color,
-            "volume_15m": s.volume_15m,
-            "volume_15m_formatted": volume_15m_formatted,
-            "volume_15m_color": volume_15m_color,
-            "volume_1h": s.volume_1h,
-            "volume_1h_formatted": volume_1h_formatted,
-            "volume_1h_color": volume_1h_color,
-            "volume_8h": s.volume_8h,
-            "volume_8h_formatted": volume_8h_formatted,
-            "volume_8h_color": volume_8h_color,
-            "volume_1d": s.volume_1d,
-            "volume_1d_formatted": volume_1d_formatted,
-            "volume_1d_color": volume_1d_color,
-            "funding_rate": float(s.funding_rate) if s.funding_rate else 0.0,
-            "open_interest": float(s.open_interest) if s.open_interest else 0.0,
-            "open_interest_formatted": oi_formatted,
-            "open_interest_color": oi_color,
-            "ts": s.ts.isoformat(),
-        })
-        
-        # Store current values as previous for next update (for same symbol)
-        symbol_previous_values[symbol] = {
-            "price": float(s.price) if s.price is not None else None,
-            "vdelta_5m": float(s.vdelta_5m) if s.vdelta_5m is not None else None,
-            "vdelta_15m": float(s.vdelta_15m) if s.vdelta_15m is not None else None,
-            "vdelta_1h": float(s.vdelta_1h) if s.vdelta_1h is not None else None,
-            "vdelta_8h": float(s.vdelta_8h) if s.vdelta_8h is not None else None,
-            "vdelta_1d": float(s.vdelta_1d) if s.vdelta_1d is not None else None,
-            "volume_5m": float(s.volume_5m) if s.volume_5m is not None else None,
-            "volume_15m": float(s.volume_15m) if s.volume_15m is not None else None,
-            "volume_1h": float(s.volume_1h) if s.volume_1h is not None else None,
-            "volume_8h": float(s.volume_8h) if s.volume_8h is not None else None,
-            "volume_1d": float(s.volume_1d) if s.volume_1d is not None else None,
-            "open_interest": float(s.open_interest) if s.open_interest is not None else None,
-            "ticks_5m": float(s.ticks_5m) if s.ticks_5m is not None else None,
-            "ticks_15m": float(s.ticks_15m) if s.ticks_15m is not None else None,
-            "ticks_1h": float(s.ticks_1h) if s.ticks_1h is not None else None,
-        }
-    
-    return JsonResponse(data, safe=False)
+    offset = _to_int(request.GET.get("offset", "").strip(), default=0, maximum=None)
+    limit = _to_int(request.GET.get("limit", "").strip(), default=None, maximum=MAX_LIMIT)
+    if limit is not None:
+        qs = qs[offset:offset + limit]
+    elif offset:
+        qs = qs[offset:]
+
+    # Read only the visible columns as tuples: no model instances are built
+    # and the payload scales with visible columns x visible rows.
+    columns = parse_fields(request.GET.get("fields", "").strip())
+    rows = [row async for row in qs.values_list(*db_fields(columns))]
+
+    # Up/down colors against the previous ingest cycle are precomputed once
+    # per cycle by the board layer and shared by every request.
+    colors = get_board_colors(await aget_board(market_type))
+
+    with span("serialize"):
+        if request.GET.get("format") == "columnar":
+            payload = serialize_columns(rows, columns, market_type, colors)
+            if _wants_msgpack(request):
+                packed = pack_msgpack(payload)
+                if packed is not None:
+                    return HttpResponse(packed, content_type=MSGPACK_CONTENT_TYPE)
+            return JsonResponse(payload)
+
+        data = serialize_rows(rows, columns, market_type, colors)
+        return JsonResponse(data, safe=False)
 
 
 @access_required
-def symbol_detail_api(request, symbol):
-    market_type = request.GET.get("market_type", "spot").strip()
-    if market_type not in ["spot", "futures"]:
-        market_type = "spot"
-    
-    symbol_obj = get_object_or_404(
+async def symbol_detail_api(request, symbol):
+    """
+    History of one symbol.
+
+    - default: the last HISTORY_LIMIT snapshots;
+    - ``after_ts``: only snapshots newer than the client's last timestamp
+      (polling tail, usually 0-1 rows);
+    - ``latest_only=1``: just the latest snapshot, taken from the board
+      without touching the DB when the symbol was in the last cycle;
+    - ``from`` / ``to`` / ``points``: a range downsampled with LTTB.
+    """
+    market_type = _get_market_type(request)
+    fields = parse_history_fields(request.GET.get("fields", "").strip())
+    after = _parse_ts(request.GET.get("after_ts", "").strip())
+    latest_only = request.GET.get("latest_only", "").strip().lower() in ("1", "true", "yes")
+
+    if latest_only:
+        index = await aget_symbol_index(market_type)
+        entry = index.get(symbol)
+        found = board_snapshot(await aget_board(market_type), entry["symbol"]) if entry else None
+        if found is not None:
+            ts, values = found
+            snapshots = []
+            if after is None or ts > after:
+                snapshots = serialize_history([(ts, *(values[f] for f in fields))], fields)
+            return JsonResponse({
+                "symbol": entry["symbol"],
+                "name": entry["name"],
+                "latest": snapshots[0] if snapshots else None,
+                "snapshots": snapshots,
+                "downsampled": False,
+            })
+
+    symbol_obj = await aget_object_or_404(
         Symbol,
         symbol__iexact=symbol,
         market_type=market_type
     )
-    snapshots_qs = (
-        ScreenerSnapshot.objects.filter(symbol=symbol_obj)
-        .order_by("-ts")[:50]
-        .select_related("symbol")
-    )
+    start = _parse_ts(request.GET.get("from", "").strip())
+    end = _parse_ts(request.GET.get("to", "").strip())
 
-    snapshots = [
-        {
-            "ts": s.ts.isoformat(),
-            "price": float(s.price),
-            "volatility_15m": s.volatility_15m,
-            "volatility_5m": s.volatility_5m,
-            "volatility_1h": s.volatility_1h,
-            "ticks_15m": s.ticks_15m,
-            "ticks_5m": s.ticks_5m,
-            "ticks_1h": s.ticks_1h,
-            "vdelta_5m": s.vdelta_5m,
-            "vdelta_15m": s.vdelta_15m,
-            "vdelta_1h": s.vdelta_1h,
-            "vdelta_8h": s.vdelta_8h,
-            "vdelta_1d": s.vdelta_1d,
-            "volume_5m": s.volume_5m,
-            "volume_15m": s.volume_15m,
-            "volume_1h": s.volume_1h,
-            "volume_8h": s.volume_8h,
-            "volume_1d": s.volume_1d,
-            "oi_change_5m": s.oi_change_5m,
-            "oi_change_15m": s.oi_change_15m,
-            "oi_change_1h": s.oi_change_1h,
-            "oi_change_8h": s.oi_change_8h,
-            "oi_change_1d": s.oi_change_1d,
-            "change_5m": s.change_5m,
-            "change_15m": s.change_15m,
-            "change_1h": s.change_1h,
-            "change_8h": s.change_8h,
-            "change_1d": s.change_1d,
-            "funding_rate": s.funding_rate,
-            "open_interest": float(s.open_interest) if s.open_interest else 0.0,
-        }
-        for s in snapshots_qs
-    ]
+    history_qs = ScreenerSnapshot.objects.filter(symbol=symbol_obj)
+    if after is not None:
+        history_qs = history_qs.filter(ts__gt=after)
+    downsampled = False
+    if latest_only or (start is None and end is None):
+        # Default: the last rows, as the symbol pages poll it.
+        limit = 1 if latest_only else HISTORY_LIMIT
+        rows = [
+            row async for row in
+            history_qs.order_by("-ts").values_list("ts", *fields)[:limit]
+        ]
+    else:
+        # The span is capped at MAX_RANGE so an open or huge range does not
+        # scan the whole history of the symbol.
+        end = end or timezone.now()
+        if start is None or start < end - MAX_RANGE:
+            start = end - MAX_RANGE
+        points = max(_to_int(
+            request.GET.get("points", "").strip(),
+            default=DEFAULT_POINTS,
+            maximum=MAX_POINTS,
+        ), 3)
+        # The database returns only min/max rows per time bucket, LTTB on the
+        # first metric then bounds the response.
+        rows, total = await sync_to_async(load_range)(
+            symbol_obj.pk, fields, start, end,
+            after=after, buckets=points * BUCKETS_PER_POINT,
+        )
+        rows, downsampled = downsample_rows(rows, points)
+        downsampled = downsampled or len(rows) < total
+        rows.reverse()
 
-    latest = snapshots[0] if snapshots else None
+    with span("serialize"):
+        snapshots = serialize_history(rows, fields)
 
-    data = {
-        "symbol": symbol_obj.symbol,
-        "name": symbol_obj.name,
-        "latest": latest,
-        "snapshots": snapshots,
-    }
-    return JsonResponse(data)
+        latest = snapshots[0] if snapshots else None
+
+        data = {
+            "symbol": symbol_obj.symbol,
+            "name": symbol_obj.name,
+            "latest": latest,
+            "snapshots": snapshots,
+            "downsampled": downsampled,
+        }
+        return JsonResponse(data)
 
 
 @access_required
-def symbols_list_api(request):
-    """API для получения списка доступных символов."""
-    from django.db import connection
-    from django.utils import timezone
-    from datetime import timedelta
-    
-    market_type = request.GET.get("market_type", "spot").strip()
-    if market_type not in ["spot", "futures"]:
-        market_type = "spot"
+async def symbols_list_api(request):
+    """
+    API для получения списка доступных символов.
+
+    Поиск идёт по индексу в памяти процесса (screener/symbol_index.py),
+    который перестраивается раз в цикл ingest: exact > prefix > substring.
+    """
+    market_type = _get_market_type(request)
     
     search = request.GET.get("search", "").strip()
+    limit = _to_int(request.GET.get("limit", "").strip(), default=None, maximum=MAX_LIMIT)
     
-    # Получаем только символы, у которых есть свежие данные (за последние 2 часа)
-    recent_cutoff = timezone.now() - timedelta(hours=2)
-    
-    with connection.cursor() as cursor:
-        cursor.execute("""
-            SELECT DISTINCT sym.symbol, sym.name
-            FROM screener_symbol sym
-            INNER JOIN screener_screenersnapshot s ON s.symbol_id = sym.id
-            WHERE s.ts >= %s AND sym.market_type = %s
-        """, [recent_cutoff, market_type])
-        
-        symbols = [{"symbol": row[0], "name": row[1] or ""} for row in cursor.fetchall()]
-    
-    # Фильтрация по поисковому запросу
-    if search:
-        search_upper = search.upper()
-        symbols = [s for s in symbols if search_upper in s["symbol"].upper() or (s["name"] and search_upper in s["name"].upper())]
-    
-    # Сортировка по символу
-    symbols.sort(key=lambda x: x["symbol"])
+    index = await aget_symbol_index(market_type)
+    symbols = index.search(search, limit)
     
     return JsonResponse({"symbols": symbols})
 
 
+@access_required
+async def symbols_history_api(request):
+    """
+    History of several symbols in one round trip:
+    ``/api/symbols/history/?symbols=BTCUSDT,ETHUSDT&fields=price&from=...``.
+
+    All series come from a single query numbering each symbol's rows with
+    ``ROW_NUMBER() OVER (PARTITION BY symbol_id ORDER BY ts DESC)``.
+    """
+    market_type = _get_market_type(request)
+    codes = [
+        code.strip().upper()
+        for code in request.GET.get("symbols", "").split(",")
+        if code.strip()
+    ]
+    codes = list(dict.fromkeys(codes))[:MAX_BATCH_SYMBOLS]
+    if not codes:
+        return JsonResponse({"error": "symbols parameter is required"}, status=400)
+
+    fields = parse_history_fields(request.GET.get("fields", "").strip())
+    start = _parse_ts(request.GET.get("from", "").strip())
+    end = _parse_ts(request.GET.get("to", "").strip())
+    limit = _to_int(
+        request.GET.get("limit", "").strip(),
+        default=HISTORY_LIMIT,
+        maximum=MAX_POINTS,
+    ) or HISTORY_LIMIT
+
+    history_qs = ScreenerSnapshot.objects.filter(
+        symbol__market_type=market_type, symbol__symbol__in=codes
+    )
+    if start is not None:
+        history_qs = history_qs.filter(ts__gte=start)
+    if end is not None:
+        history_qs = history_qs.filter(ts__lte=end)
+    history_qs = (
+        history_qs.annotate(
+            row_number=Window(
+                expression=RowNumber(),
+                partition_by=[F("symbol_id")],
+                order_by=F("ts").desc(),
+            )
+        )
+        .filter(row_number__lte=limit)
+        .order_by("symbol__symbol", "-ts")
+        .values_list("symbol__symbol", "ts", *fields)
+    )
+    rows = [row async for row in history_qs]
+
+    with span("serialize"):
+        series = {
+            code: serialize_history([row[1:] for row in group], fields)
+            for code, group in groupby(rows, key=itemgetter(0))
+        }
+        data = {
+            "market_type": market_type,
+            "series": series,
+            "missing": [code for code in codes if code not in series],
+        }
+        return JsonResponse(data)
@@ -0,0 +1,265 @@
+"""
+Per-request instrumentation: SQL query count, DB time, template render time
+and serialization time.
+
+:class:`ServerTimingMiddleware` opens a :class:`RequestTimings` for sampled
+requests and keeps it in a context variable, so the DB execute wrapper, the
+template render hook and :func:`span` (used around serialization in api/views)
+add to it without passing anything around. Async ORM calls run in
+``sync_to_async`` threads that inherit the context, so async views are covered
+too. At the end of the request the numbers are sent back as a
+``Server-Timing`` header (visible in the browser devtools) and written as one
+JSON line to the ``config.instrumentation`` logger.
+
+Staff can add ``?_queries=1`` to any URL to get every SQL statement with its
+duration in the log (and, for HTML pages, as a comment at the end of the page).
+For anyone else the parameter is ignored and the request is sampled as usual,
+so the middleware goes after AuthenticationMiddleware.
+
+Sampling is configured by path prefix in ``SERVER_TIMING_SAMPLING``, e.g.
+``{"/api/": 1.0, "/": 0.1}``; the longest matching prefix wins and the
+language prefix (``/ru/``, ``/en/`` ...) is ignored. An unsampled request
+costs one dict lookup and one ``random()`` call.
+"""
+import json
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+
+logger = logging.getLogger("config.instrumentation")
+
+DUMP_PARAM = "_queries"
+
+_current: ContextVar = ContextVar("request_timings", default=None)
+
+
+class RequestTimings:
+    """Counters of one request. Durations are in milliseconds."""
+
+    __slots__ = ("queries", "db_ms", "spans", "statements", "_open")
+
+    def __init__(self, collect_sql=False):
+        self.queries = 0
+        self.db_ms = 0.0
+        self.spans = {}
+        # Only filled for a staff query dump.
+        self.statements = [] if collect_sql else None
+        self._open = set()
+
+    def add(self, name, ms):
+        self.spans[name] = self.spans.get(name, 0.0) + ms
+
+
+def current_timings():
+    return _current.get()
+
+
+@contextmanager
+def span(name):
+    """
+    Add the time spent in the block to the ``name`` span of the current
+    request. Nested spans with the same name are counted once.
+    """
+    timings = _current.get()
+    if timings is None or name in timings._open:
+        yield
+        return
+    timings._open.add(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings._open.discard(name)
+        timings.add(name, (time.perf_counter() - start) * 1000)
+
+
+def _db_wrapper(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        ms = (time.perf_counter() - start) * 1000
+        timings.queries += 1
+        timings.db_ms += ms
+        if timings.statements is not None:
+            timings.statements.append((round(ms, 2), sql if many else _render_sql(sql, params)))
+
+
+def _render_sql(sql, params):
+    if not params:
+        return sql
+    try:
+        return sql % tuple(repr(p) for p in params)
+    except (TypeError, ValueError):
+        return f"{sql} -- params: {params!r}"
+
+
+def _install_db_wrapper(sender, connection, **kwargs):
+    if _db_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_db_wrapper)
+
+
+def _install_template_hook():
+    from django.template.backends.django import Template
+
+    if getattr(Template.render, "_instrumented", False):
+        return
+    original = Template.render
+
+    def render(self, context=None, request=None):
+        with span("template"):
+            return original(self, context, request)
+
+    render._instrumented = True
+    Template.render = render
+
+
+_installed = False
+
+
+def install():
+    """Hook DB connections and template rendering (idempotent)."""
+    global _installed
+    if _installed:
+        return
+    connection_created.connect(_install_db_wrapper, dispatch_uid="config.instrumentation")
+    # Connections opened before the signal was connected (e.g. at import time).
+    from django.db import connections
+
+    for conn in connections.all(initialized_only=True):
+        _install_db_wrapper(None, conn)
+    _install_template_hook()
+    _installed = True
+
+
+_LANGUAGE_CODES = {code for code, _ in getattr(settings, "LANGUAGES", [])}
+
+
+def _language_stripped(path):
+    parts = path.split("/", 2)
+    if len(parts) > 2 and parts[1] in _LANGUAGE_CODES:
+        return "/" + parts[2]
+    return path
+
+
+def sample_rate(path):
+    rates = getattr(settings, "SERVER_TIMING_SAMPLING", {})
+    path = _language_stripped(path)
+    best, rate = -1, 0.0
+    for prefix, value in rates.items():
+        if path.startswith(prefix) and len(prefix) > best:
+            best, rate = len(prefix), value
+    return rate
+
+
+def server_timing_header(timings, total_ms):
+    parts = [
+        f'db;dur={timings.db_ms:.1f};desc="{timings.queries} queries"',
+    ]
+    for name, ms in timings.spans.items():
+        parts.append(f"{name};dur={ms:.1f}")
+    parts.append(f"total;dur={total_ms:.1f}")
+    return ", ".join(parts)
+
+
+def _sql_comment(statements):
+    lines = [f"{ms:>8.2f} ms  {sql}" for ms, sql in statements]
+    # "--" must not appear inside an HTML comment.
+    body = "\n".join(lines).replace("--", "- -")
+    return f"\n<!-- {len(statements)} queries\n{body}\n-->\n".encode()
+
+
+class ServerTimingMiddleware:
+    """
+    Goes right after AuthenticationMiddleware: the ``?_queries`` dump is
+    staff-only and needs ``request.user``. Time spent in the middleware above
+    it (sessions, locale, CSRF) is therefore not in the ``total`` metric.
+    Works in both sync (gunicorn sync workers) and async (uvicorn) mode.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        install()
+
+    @staticmethod
+    def _start(request, wants_dump):
+        if not wants_dump and random.random() >= sample_rate(request.path_info):
+            return None
+        return RequestTimings(collect_sql=wants_dump)
+
+    def _finish(self, request, response, timings, start):
+        total_ms = (time.perf_counter() - start) * 1000
+        response["Server-Timing"] = server_timing_header(timings, total_ms)
+        record = {
+            "method": request.method,
+            "path": request.path_info,
+            "status": response.status_code,
+            "total_ms": round(total_ms, 2),
+            "db_ms": round(timings.db_ms, 2),
+            "queries": timings.queries,
+        }
+        for name, ms in timings.spans.items():
+            record[f"{name}_ms"] = round(ms, 2)
+        logger.info(json.dumps(record))
+
+        if timings.statements is not None:
+            logger.info(json.dumps({
+                "path": request.path_info,
+                "queries": [{"ms": ms, "sql": sql} for ms, sql in timings.statements],
+            }))
+            content_type = response.get("Content-Type", "")
+            if content_type.startswith("text/html") and not response.streaming:
+                response.content += _sql_comment(timings.statements)
+                if response.has_header("Content-Length"):
+                    response["Content-Length"] = str(len(response.content))
+        return response
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        wants_dump = False
+        if DUMP_PARAM in request.GET:
+            user = getattr(request, "user", None)
+            wants_dump = bool(user and user.is_staff)
+        timings = self._start(request, wants_dump)
+        if timings is None:
+            return self.get_response(request)
+        token = _current.set(timings)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, timings, start)
+
+    async def __acall__(self, request):
+        wants_dump = False
+        if DUMP_PARAM in request.GET and hasattr(request, "auser"):
+            user = await request.auser()
+            wants_dump = user.is_staff
+        timings = self._start(request, wants_dump)
+        if timings is None:
+            return await self.get_response(request)
+        token = _current.set(timings)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, timings, start)
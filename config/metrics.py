@@ -0,0 +1,285 @@
+"""
+Prometheus metrics shared by the web workers, the ingest loops and the alert
+checker.
+
+Every process writes its samples to files in ``PROMETHEUS_MULTIPROC_DIR``
+(prometheus_client multiprocess mode), and the ``/metrics`` view merges the
+files of all processes at scrape time, so histograms and counters add up
+correctly across gunicorn workers and the separate scripts.
+
+Every process folds its counters and histograms into shared ``*_archive.db``
+files when it exits and removes its own files, so neither recycled gunicorn
+workers nor a cron run every minute leave a file per PID behind. Gunicorn
+workers are folded by the master in the ``child_exit`` hook; any other process
+(ingest loops, the cron alert checker, management commands) does it at exit.
+
+This module must be imported before anything else imports prometheus_client:
+the multiprocess directory is picked up on import. It does not depend on Django
+settings, so the standalone scripts can import it before ``django.setup()``.
+
+prometheus_client is optional: without it every metric is a no-op and
+``/metrics`` answers 503.
+"""
+import atexit
+import fcntl
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+MULTIPROC_DIR = os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR", str(BASE_DIR / "prometheus")
+)
+os.makedirs(MULTIPROC_DIR, exist_ok=True)
+
+try:
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST,
+        CollectorRegistry,
+        Counter,
+        Gauge,
+        Histogram,
+        generate_latest,
+        multiprocess,
+    )
+    from prometheus_client.core import GaugeMetricFamily
+    from prometheus_client.mmap_dict import MmapedDict
+except ImportError:  # pragma: no cover - optional dependency
+    CollectorRegistry = None
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+CYCLE_BUCKETS = (0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0)
+
+
+class _NoopMetric:
+    def labels(self, *args, **kwargs):
+        return self
+
+    def observe(self, value):
+        pass
+
+    def inc(self, amount=1):
+        pass
+
+    def set(self, value):
+        pass
+
+
+if CollectorRegistry is not None:
+    HTTP_REQUEST_DURATION = Histogram(
+        "http_request_duration_seconds",
+        "Request latency by view",
+        ["view", "method", "status"],
+        buckets=LATENCY_BUCKETS,
+    )
+    INGEST_CYCLE_DURATION = Histogram(
+        "ingest_cycle_duration_seconds",
+        "Duration of one ingest cycle",
+        ["market"],
+        buckets=CYCLE_BUCKETS,
+    )
+    INGEST_ROWS = Counter(
+        "ingest_rows",
+        "Snapshots written by the ingest loops",
+        ["market"],
+    )
+    INGEST_CYCLE_ROWS = Gauge(
+        "ingest_cycle_rows",
+        "Snapshots written by the last ingest cycle",
+        ["market"],
+        multiprocess_mode="mostrecent",
+    )
+    ALERT_EVALUATION_DURATION = Histogram(
+        "alerts_evaluation_duration_seconds",
+        "Duration of one alert check run",
+        buckets=CYCLE_BUCKETS,
+    )
+    ALERTS_TRIGGERED = Counter(
+        "alerts_triggered",
+        "Alert rules that fired",
+    )
+    ALERT_NOTIFY_LAG = Histogram(
+        "alerts_notify_lag_seconds",
+        "Alert fired (outbox row created) to Telegram send",
+        buckets=LATENCY_BUCKETS,
+    )
+    ALERT_NOTIFICATIONS = Counter(
+        "alerts_notifications",
+        "Outbox deliveries by outcome",
+        ["outcome"],
+    )
+    TELEGRAM_SEND_DURATION = Histogram(
+        "telegram_send_duration_seconds",
+        "Telegram sendMessage latency",
+        ["result"],
+        buckets=LATENCY_BUCKETS,
+    )
+    TABLE_CACHE_LOOKUPS = Counter(
+        "screener_table_cache_lookups",
+        "Rendered screener table cache lookups",
+        ["result"],
+    )
+else:
+    HTTP_REQUEST_DURATION = INGEST_CYCLE_DURATION = INGEST_ROWS = _NoopMetric()
+    INGEST_CYCLE_ROWS = ALERT_EVALUATION_DURATION = ALERTS_TRIGGERED = _NoopMetric()
+    ALERT_NOTIFY_LAG = ALERT_NOTIFICATIONS = TELEGRAM_SEND_DURATION = _NoopMetric()
+    TABLE_CACHE_LOOKUPS = _NoopMetric()
+
+
+@contextmanager
+def timed(histogram, **labels):
+    """Observe the duration of the block in ``histogram`` (seconds)."""
+    metric = histogram.labels(**labels) if labels else histogram
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metric.observe(time.perf_counter() - start)
+
+
+def mark_process_dead(pid):
+    """Gunicorn ``child_exit`` hook: drop the live gauges of a dead worker."""
+    if CollectorRegistry is not None:
+        multiprocess.mark_process_dead(pid, MULTIPROC_DIR)
+
+
+# Samples of exited processes that add up (see fold_process_files).
+ARCHIVED_TYPES = ("counter", "histogram")
+
+
+def fold_process_files(pid):
+    """
+    Add the counters and histograms of process ``pid`` to the archive files and
+    remove all of its sample files. Totals stay monotonic for Prometheus while
+    the number of files stays bounded.
+    """
+    if CollectorRegistry is None:
+        return
+    directory = Path(MULTIPROC_DIR)
+    with open(directory / "archive.lock", "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        for typ in ARCHIVED_TYPES:
+            path = directory / f"{typ}_{pid}.db"
+            if not path.exists():
+                continue
+            source = MmapedDict(str(path), read_mode=True)
+            archive = MmapedDict(str(directory / f"{typ}_archive.db"))
+            try:
+                for key, value, timestamp in source.read_all_values():
+                    total, _ = archive.read_value(key)
+                    archive.write_value(key, total + value, timestamp)
+            finally:
+                archive.close()
+                source.close()
+            path.unlink()
+    for path in directory.glob(f"gauge_*_{pid}.db"):
+        path.unlink(missing_ok=True)
+
+
+def _at_exit():
+    try:
+        fold_process_files(os.getpid())
+    except OSError:
+        pass
+
+
+# Gunicorn workers leave with os._exit() and never get here (child_exit does).
+atexit.register(_at_exit)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def prune_dead_files():
+    """
+    Fold the sample files of processes that no longer exist (previous gunicorn
+    workers, processes that were killed) into the archive. Called from gunicorn
+    ``on_starting``; the files of the running ingest loops are kept.
+    """
+    dead = set()
+    for path in Path(MULTIPROC_DIR).glob("*.db"):
+        try:
+            pid = int(path.stem.rsplit("_", 1)[-1])
+        except ValueError:
+            continue
+        if not _pid_alive(pid):
+            dead.add(pid)
+    for pid in dead:
+        fold_process_files(pid)
+
+
+class _ScrapeTimeCollector:
+    """Values computed when Prometheus scrapes: snapshot lag."""
+
+    def collect(self):
+        from screener.board import get_board
+
+        lag = GaugeMetricFamily(
+            "screener_snapshot_lag_seconds",
+            "Now minus the ts of the latest published ingest cycle",
+            labels=["market"],
+        )
+        now = time.time()
+        for market in ("spot", "futures"):
+            board = get_board(market)
+            if board:
+                lag.add_metric([market], now - board["ts"].timestamp())
+        yield lag
+
+
+class MetricsMiddleware:
+    """Request latency per resolved view name (sync and async)."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def _observe(request, response, start):
+        match = getattr(request, "resolver_match", None)
+        view = match.view_name if match else "<unresolved>"
+        HTTP_REQUEST_DURATION.labels(
+            view=view, method=request.method, status=f"{response.status_code // 100}xx"
+        ).observe(time.perf_counter() - start)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        start = time.perf_counter()
+        response = self.get_response(request)
+        self._observe(request, response, start)
+        return response
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        self._observe(request, response, start)
+        return response
+
+
+def render_latest():
+    """``(body, content_type)`` of all processes' metrics, or None."""
+    if CollectorRegistry is None:
+        return None
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry, path=MULTIPROC_DIR)
+    registry.register(_ScrapeTimeCollector())
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,282 @@
+"""
+On-demand request profiling.
+
+A request is profiled when a staff user adds ``?_profile=1`` to the URL, or
+when its path matches one of ``PROFILE_PATH_PATTERNS`` (regular expressions,
+any user). Two modes:
+
+- ``_profile=1`` (and path patterns): a sampling profiler. A background thread
+  takes the Python stack of the request every ``PROFILE_SAMPLE_INTERVAL``
+  seconds; stacks are stored in the "collapsed" format
+  (``frame;frame;frame count`` per line), which ``flamegraph.pl``,
+  speedscope.app and inferno read directly.
+- ``_profile=cprofile``: deterministic profiling with cProfile; the report is
+  the ``pstats`` listing sorted by cumulative time. Sync workers and sync
+  views only: cProfile sees just the thread it was started on, and an async
+  view (the ``/api/`` endpoints) runs under a sync worker inside
+  ``async_to_sync`` on another thread, so such requests fall back to the
+  sampler.
+
+Every report is written to ``PROFILE_DIR`` (oldest reports are removed once
+the directory exceeds ``PROFILE_MAX_BYTES``). The response gets an
+``X-Profile`` header with the file name and the share of samples spent in the
+ORM, template filters (screener/templatetags), template rendering and JSON
+encoding. Staff can add ``_profile_output=1`` to get the report itself as
+``text/plain`` instead of the page.
+
+With uvicorn workers all threads of the process are sampled, so concurrent
+requests can show up in the report; profile API views under the sync workers
+when that matters.
+"""
+import cProfile
+import io
+import pstats
+import re
+import sys
+import threading
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse
+from django.urls import Resolver404, resolve
+
+
+PROFILE_PARAM = "_profile"
+OUTPUT_PARAM = "_profile_output"
+
+# First matching rule wins; checked from the innermost frame outwards.
+CATEGORIES = [
+    ("filters", ("screener/templatetags/",)),
+    ("json", ("/json/", "api/serializers.py", "msgpack", "django/core/serializers/")),
+    ("orm", ("django/db/", "psycopg2/", "sqlite3/")),
+    ("template", ("django/template/",)),
+]
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _profile_dir():
+    path = Path(_setting("PROFILE_DIR", settings.BASE_DIR / "profiles"))
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _frame_label(code):
+    filename = code.co_filename
+    # Shorten site-packages / project paths to something readable.
+    for marker in ("site-packages/", str(settings.BASE_DIR) + "/"):
+        pos = filename.find(marker)
+        if pos >= 0:
+            filename = filename[pos + len(marker):]
+            break
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+# A thread whose innermost frame is in one of these is blocked, not working
+# (idle pool threads, a sync thread waiting for an async view).
+_IDLE_FILES = ("/threading.py", "/queue.py", "/selectors.py")
+
+
+def _category(paths):
+    for path in reversed(paths):
+        for name, markers in CATEGORIES:
+            if any(marker in path for marker in markers):
+                return name
+    return "other"
+
+
+class SamplingProfiler:
+    """Collects collapsed stacks of every thread except its own."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.stacks = Counter()
+        self.categories = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own or frame.f_code.co_filename.endswith(_IDLE_FILES):
+                    continue
+                labels, paths = [], []
+                while frame is not None:
+                    labels.append(_frame_label(frame.f_code))
+                    paths.append(frame.f_code.co_filename.replace("\\", "/"))
+                    frame = frame.f_back
+                labels.reverse()
+                paths.reverse()
+                self.stacks[";".join(labels)] += 1
+                self.categories[_category(paths)] += 1
+                self.samples += 1
+
+    def report(self):
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common()) + "\n"
+
+    def summary(self):
+        total = self.samples or 1
+        parts = [f"samples={self.samples}"]
+        for name in ("orm", "filters", "template", "json", "other"):
+            parts.append(f"{name}={100.0 * self.categories[name] / total:.0f}%")
+        return "; ".join(parts)
+
+
+class DeterministicProfiler:
+    """cProfile wrapper with the same interface as SamplingProfiler."""
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+
+    def report(self):
+        out = io.StringIO()
+        stats = pstats.Stats(self.profile, stream=out)
+        stats.sort_stats("cumulative").print_stats(80)
+        return out.getvalue()
+
+    def summary(self):
+        stats = pstats.Stats(self.profile).stats
+        totals = Counter()
+        for (filename, _, _), (_, _, tottime, _, _) in stats.items():
+            totals[_category([filename.replace("\\", "/")])] += tottime
+        total = sum(totals.values()) or 1.0
+        return "; ".join(
+            f"{name}={100.0 * totals[name] / total:.0f}%"
+            for name in ("orm", "filters", "template", "json", "other")
+        )
+
+
+def _enforce_size_cap(directory, max_bytes):
+    files = sorted(
+        (p for p in directory.iterdir() if p.is_file()),
+        key=lambda p: p.stat().st_mtime,
+    )
+    total = sum(p.stat().st_size for p in files)
+    while files and total > max_bytes:
+        oldest = files.pop(0)
+        total -= oldest.stat().st_size
+        oldest.unlink(missing_ok=True)
+
+
+def store_report(request, profiler, extension):
+    """Write the report to PROFILE_DIR and return the file name."""
+    directory = _profile_dir()
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", request.path_info).strip("_") or "root"
+    name = f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}_{request.method}_{slug[:80]}.{extension}"
+    (directory / name).write_text(profiler.report(), encoding="utf-8")
+    _enforce_size_cap(directory, _setting("PROFILE_MAX_BYTES", 50 * 1024 * 1024))
+    return name
+
+
+_path_patterns = None
+
+
+def _matches_path(path):
+    global _path_patterns
+    if _path_patterns is None:
+        _path_patterns = [re.compile(p) for p in _setting("PROFILE_PATH_PATTERNS", [])]
+    return any(p.search(path) for p in _path_patterns)
+
+
+class ProfilingMiddleware:
+    """
+    Goes after AuthenticationMiddleware: the staff check needs request.user.
+    Costs one dict lookup per request when profiling is not requested.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def _mode(self, request, is_staff):
+        requested = request.GET.get(PROFILE_PARAM)
+        if requested and is_staff:
+            return "cprofile" if requested == "cprofile" else "sampling"
+        if _matches_path(request.path_info):
+            return "sampling"
+        return None
+
+    @staticmethod
+    def _async_view(request):
+        try:
+            match = resolve(request.path_info, getattr(request, "urlconf", None))
+        except Resolver404:
+            return False
+        return iscoroutinefunction(match.func)
+
+    def _profiler(self, mode, request):
+        # cProfile only sees the thread it runs on and refuses to run twice at
+        # once: async requests use the sampler, and so do async views under
+        # sync workers (async_to_sync runs them on the event loop thread).
+        if mode == "cprofile" and not self.async_mode and not self._async_view(request):
+            return DeterministicProfiler(), "pstats.txt"
+        return SamplingProfiler(_setting("PROFILE_SAMPLE_INTERVAL", 0.001)), "collapsed.txt"
+
+    def _finish(self, request, response, profiler, extension, is_staff):
+        name = store_report(request, profiler, extension)
+        if not is_staff:
+            # PROFILE_PATH_PATTERNS profile everyone; only staff see the result.
+            return response
+        if request.GET.get(OUTPUT_PARAM):
+            response = HttpResponse(profiler.report(), content_type="text/plain; charset=utf-8")
+        response["X-Profile"] = f"{name}; {profiler.summary()}"
+        return response
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        is_staff = PROFILE_PARAM in request.GET and request.user.is_staff
+        mode = self._mode(request, is_staff)
+        if mode is None:
+            return self.get_response(request)
+        profiler, extension = self._profiler(mode, request)
+        profiler.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.stop()
+        if not is_staff:
+            is_staff = request.user.is_staff
+        return self._finish(request, response, profiler, extension, is_staff)
+
+    async def __acall__(self, request):
+        is_staff = False
+        if PROFILE_PARAM in request.GET:
+            is_staff = (await request.auser()).is_staff
+        mode = self._mode(request, is_staff)
+        if mode is None:
+            return await self.get_response(request)
+        profiler, extension = self._profiler(mode, request)
+        profiler.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            profiler.stop()
+        if not is_staff:
+            is_staff = (await request.auser()).is_staff
+        return self._finish(request, response, profiler, extension, is_staff)
@@ -30,6 +30,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "config.metrics.MetricsMiddleware",  # Prometheus: латентность по view
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.locale.LocaleMiddleware",  # Локализация (базовый)
@@ -37,6 +38,8 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "config.instrumentation.ServerTimingMiddleware",  # Server-Timing: SQL/шаблоны/сериализация (нужен request.user)
+    "config.profiling.ProfilingMiddleware",  # ?_profile=1 для staff (нужен request.user)
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "config.middleware.CSPMiddleware",  # Custom CSP middleware for TradingView
@@ -80,6 +83,71 @@ DATABASES = {
 }
 
 
+# Shared cache: the ingest processes publish the latest board here and the web
+# workers read it (screener/board.py), so it must be visible across processes.
+# Set CACHE_BACKEND=django.core.cache.backends.redis.RedisCache and
+# CACHE_LOCATION=redis://127.0.0.1:6379/1 to use Redis instead of files.
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND", "django.core.cache.backends.filebased.FileBasedCache"
+        ),
+        "LOCATION": os.getenv("CACHE_LOCATION", str(BASE_DIR / "cache")),
+    }
+}
+
+
+# Доля запросов с Server-Timing и строкой в logs/request_timings.log, по префиксу
+# пути (без языкового префикса): "/api/=1.0,/=0.1". Самый длинный префикс выигрывает.
+SERVER_TIMING_SAMPLING = {
+    prefix.strip(): float(rate)
+    for prefix, rate in (
+        item.split("=", 1)
+        for item in os.getenv("SERVER_TIMING_SAMPLING", "/api/=1.0,/=0.1").split(",")
+        if "=" in item
+    )
+}
+
+# Профилирование запросов (config/profiling.py): staff добавляет ?_profile=1,
+# либо все запросы с путём по regex из PROFILE_PATH_PATTERNS ("^/api/screener/,^/$").
+PROFILE_PATH_PATTERNS = [
+    p.strip() for p in os.getenv("PROFILE_PATH_PATTERNS", "").split(",") if p.strip()
+]
+PROFILE_DIR = BASE_DIR / "profiles"
+PROFILE_MAX_BYTES = int(os.getenv("PROFILE_MAX_MB", "50")) * 1024 * 1024
+PROFILE_SAMPLE_INTERVAL = 0.001
+
+# Алерты одного чата, сработавшие в течение этого окна (секунды), уходят одним
+# сообщением-дайджестом (alerts/digest.py). 0 — без дайджестов. Для отдельных
+# чатов окно задаётся в админке (Chat settings).
+ALERT_DIGEST_WINDOW = int(os.getenv("ALERT_DIGEST_WINDOW", "5"))
+
+LOG_DIR = BASE_DIR / "logs"
+LOG_DIR.mkdir(exist_ok=True)
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "plain": {"format": "%(asctime)s %(message)s"},
+    },
+    "handlers": {
+        "request_timings": {
+            "class": "logging.handlers.WatchedFileHandler",
+            "filename": str(LOG_DIR / "request_timings.log"),
+            "formatter": "plain",
+        },
+    },
+    "loggers": {
+        "config.instrumentation": {
+            "handlers": ["request_timings"],
+            "level": "INFO",
+            "propagate": False,
+        },
+    },
+}
+
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
@@ -2,11 +2,12 @@ from django.contrib import admin
 from django.urls import include, path
 from django.conf.urls.i18n import i18n_patterns
 from django.views.i18n import set_language
-from config.views import set_language_custom
+from config.views import metrics_view, set_language_custom
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("i18n/setlang/", set_language_custom, name="set_language"),
+    path("metrics", metrics_view, name="metrics"),
 ]
 
 urlpatterns += i18n_patterns(
@@ -1,8 +1,11 @@
 """
 Custom views for language switching and other utilities.
 """
+import hmac
+import os
+
 from django.conf import settings
-from django.http import HttpResponseRedirect
+from django.http import HttpResponse, HttpResponseForbidden, HttpResponseRedirect
 from django.utils import translation
 from django.views.decorators.http import require_POST
 from django.views.decorators.csrf import csrf_protect
@@ -73,3 +76,27 @@ def set_language_custom(request):
     # If language is invalid, redirect to next URL without changing language
     return HttpResponseRedirect(next_url)
 
+
+def _metrics_allowed(request):
+    token = os.getenv("METRICS_TOKEN", "")
+    if token:
+        auth = request.headers.get("Authorization", "")
+        return hmac.compare_digest(auth, f"Bearer {token}")
+    # Без токена — только напрямую с localhost, не через nginx
+    proxied = "X-Forwarded-For" in request.headers or "X-Real-IP" in request.headers
+    return not proxied and request.META.get("REMOTE_ADDR") in ("127.0.0.1", "::1")
+
+
+def metrics_view(request):
+    """
+    Prometheus exposition of all processes (web workers, ingest, alerts).
+    """
+    from config.metrics import render_latest
+
+    if not _metrics_allowed(request):
+        return HttpResponseForbidden("Forbidden")
+    rendered = render_latest()
+    if rendered is None:
+        return HttpResponse("prometheus_client is not installed", status=503)
+    body, content_type = rendered
+    return HttpResponse(body, content_type=content_type)
@@ -0,0 +1,57 @@
+"""
+Gunicorn profile for the async JSON API (config.asgi) served by uvicorn workers.
+
+Runs next to the WSGI profile from gunicorn_config.py: nginx sends /api/ to
+this port and everything else (HTML pages, admin, static) to the sync workers.
+
+    gunicorn --config gunicorn_asgi_config.py config.asgi:application
+"""
+
+import multiprocessing
+import os
+
+bind = os.getenv("ASGI_BIND", "127.0.0.1:8001")
+
+cpu_count = multiprocessing.cpu_count()
+if cpu_count <= 2:
+    workers = 1
+else:
+    workers = 2
+
+# Each uvicorn worker runs an event loop, so a single process keeps many
+# I/O-bound API requests in flight instead of one per sync worker.
+worker_class = "uvicorn_worker.UvicornWorker"
+timeout = 60
+keepalive = 5
+graceful_timeout = 30
+max_requests = 5000
+max_requests_jitter = 200
+preload_app = True
+
+loglevel = "info"
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+log_dir = os.path.join(base_dir, "logs")
+
+if not os.path.exists(log_dir):
+    os.makedirs(log_dir, exist_ok=True)
+
+errorlog = os.path.join(log_dir, "gunicorn_asgi_error.log")
+accesslog = os.path.join(log_dir, "gunicorn_asgi_access.log")
+
+
+def on_starting(server):
+    # Sample files of processes that are gone (previous workers, cron runs).
+    from config.metrics import prune_dead_files
+
+    prune_dead_files()
+
+
+def child_exit(server, worker):
+    # Prometheus multiprocess mode: forget the live gauges of the exited worker
+    # and fold its counters/histograms into the archive. Workers recycled by
+    # max_requests leave with os._exit(), so their atexit hook never runs.
+    from config.metrics import fold_process_files, mark_process_dead
+
+    mark_process_dead(worker.pid)
+    fold_process_files(worker.pid)
@@ -31,3 +31,19 @@ if not os.path.exists(log_dir):
 errorlog = os.path.join(log_dir, "gunicorn_error.log")
 accesslog = os.path.join(log_dir, "gunicorn_access.log")
 
+
+def on_starting(server):
+    # Sample files of processes that are gone (previous workers, cron runs).
+    from config.metrics import prune_dead_files
+
+    prune_dead_files()
+
+
+def child_exit(server, worker):
+    # Prometheus multiprocess mode: forget the live gauges of the exited worker
+    # and fold its counters/histograms into the archive. Workers recycled by
+    # max_requests leave with os._exit(), so their atexit hook never runs.
+    from config.metrics import fold_process_files, mark_process_dead
+
+    mark_process_dead(worker.pid)
+    fold_process_files(worker.pid)
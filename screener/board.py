@@ -0,0 +1,205 @@
+"""
+Latest board per market, shared between the ingest loops and the web workers.
+
+After every ingest cycle the ingest script publishes the freshly written rows
+with :func:`publish_board`. The board lives in the Django cache (see CACHES in
+settings) and holds, per market:
+
+- ``cycle_id`` / ``ts`` — identity and timestamp of the ingest cycle;
+- ``symbols`` / ``snapshot_ids`` — the latest snapshot of every symbol;
+- ``values`` — a float matrix (symbols x BOARD_METRICS) of the latest values,
+  0.0 where a metric is missing; ``missing`` — a bool matrix marking those;
+- ``colors`` — up/down classes against the previous cycle, computed once per
+  cycle with vectorized comparisons and reused by every request.
+"""
+import numpy as np
+from django.core.cache import cache
+
+
+BOARD_METRICS = [
+    "price",
+    "open_interest",
+    "funding_rate",
+    "change_5m",
+    "change_15m",
+    "change_1h",
+    "change_8h",
+    "change_1d",
+    "oi_change_5m",
+    "oi_change_15m",
+    "oi_change_1h",
+    "oi_change_8h",
+    "oi_change_1d",
+    "volatility_5m",
+    "volatility_15m",
+    "volatility_1h",
+    "ticks_5m",
+    "ticks_15m",
+    "ticks_1h",
+    "vdelta_5m",
+    "vdelta_15m",
+    "vdelta_1h",
+    "vdelta_8h",
+    "vdelta_1d",
+    "volume_5m",
+    "volume_15m",
+    "volume_1h",
+    "volume_8h",
+    "volume_1d",
+]
+
+# Metrics that get a ``*_color`` key in the API (see api/serializers.py).
+COLOR_METRICS = [
+    "price",
+    "open_interest",
+    "ticks_5m",
+    "ticks_15m",
+    "ticks_1h",
+    "vdelta_5m",
+    "vdelta_15m",
+    "vdelta_1h",
+    "vdelta_8h",
+    "vdelta_1d",
+    "volume_5m",
+    "volume_15m",
+    "volume_1h",
+    "volume_8h",
+    "volume_1d",
+]
+
+# IntegerField columns of ScreenerSnapshot: the board stores floats, the
+# latest-snapshot reads give them back as ints like the DB does.
+INT_METRICS = {"ticks_5m", "ticks_15m", "ticks_1h"}
+
+# Same dead band as screener.utils.get_value_color.
+COLOR_EPSILON = 0.0001
+
+# A board older than this is treated as missing (ingest is down).
+BOARD_TTL = 10 * 60
+
+_COLOR_COLUMNS = np.array([BOARD_METRICS.index(m) for m in COLOR_METRICS])
+
+
+def board_key(market_type: str) -> str:
+    return f"screener:board:{market_type}"
+
+
+def cycle_key(market_type: str) -> str:
+    return f"screener:board:{market_type}:cycle"
+
+
+def get_board(market_type: str):
+    return cache.get(board_key(market_type))
+
+
+async def aget_board(market_type: str):
+    return await cache.aget(board_key(market_type))
+
+
+async def aget_cycle_id(market_type: str):
+    """Id of the latest cycle without loading the whole board."""
+    return await cache.aget(cycle_key(market_type))
+
+
+def get_board_colors(board) -> dict:
+    """``{metric: {symbol: "value-up" | "value-down"}}`` or an empty dict."""
+    if not board:
+        return {}
+    return board["colors"]
+
+
+def board_snapshot(board, symbol_code: str):
+    """
+    ``(ts, {metric: value})`` of a symbol's latest snapshot on the board, or
+    None if the board is missing or the symbol was not in the last cycle.
+    Values have the types a DB read gives: ints for INT_METRICS, None where
+    the metric is missing.
+    """
+    if not board:
+        return None
+    try:
+        pos = board["symbols"].index(symbol_code)
+    except ValueError:
+        return None
+    row = board["values"][pos].tolist()
+    missing = board.get("missing")
+    missing = missing[pos].tolist() if missing is not None else [False] * len(row)
+    values = {}
+    for i, metric in enumerate(BOARD_METRICS):
+        if missing[i]:
+            values[metric] = None
+        elif metric in INT_METRICS:
+            values[metric] = int(row[i])
+        else:
+            values[metric] = row[i]
+    return board["ts"], values
+
+
+def _compute_colors(symbols, values, previous) -> dict:
+    colors = {metric: {} for metric in COLOR_METRICS}
+    if not previous or not symbols:
+        return colors
+
+    prev_index = {sym: i for i, sym in enumerate(previous["symbols"])}
+    idx = np.array([prev_index.get(sym, -1) for sym in symbols])
+    present = idx >= 0
+    if not present.any():
+        return colors
+
+    current = values[present][:, _COLOR_COLUMNS]
+    prior = previous["values"][idx[present]][:, _COLOR_COLUMNS]
+    diff = current - prior
+    up = diff > COLOR_EPSILON
+    down = diff < -COLOR_EPSILON
+
+    present_symbols = np.array(symbols, dtype=object)[present]
+    for col, metric in enumerate(COLOR_METRICS):
+        target = colors[metric]
+        for sym in present_symbols[up[:, col]]:
+            target[sym] = "value-up"
+        for sym in present_symbols[down[:, col]]:
+            target[sym] = "value-down"
+    return colors
+
+
+def board_row(symbol_code: str, snapshot) -> dict:
+    """Board row for a freshly created ScreenerSnapshot."""
+    row = {"symbol": symbol_code, "snapshot_id": snapshot.id}
+    for metric in BOARD_METRICS:
+        row[metric] = getattr(snapshot, metric)
+    return row
+
+
+def publish_board(market_type: str, ts, rows) -> dict:
+    """
+    Publish the rows of one ingest cycle as the new latest board.
+
+    ``rows`` is a list of dicts with ``symbol``, ``snapshot_id`` and every
+    metric of BOARD_METRICS. The board that was current until now becomes the
+    previous cycle the colors are computed against.
+    """
+    symbols = [row["symbol"] for row in rows]
+    values = np.array(
+        [[np.nan if row[m] is None else float(row[m]) for m in BOARD_METRICS] for row in rows],
+        dtype=np.float64,
+    ).reshape(len(rows), len(BOARD_METRICS))
+    missing = np.isnan(values)
+    values[missing] = 0.0
+
+    previous = get_board(market_type)
+    board = {
+        "market_type": market_type,
+        "cycle_id": int(ts.timestamp() * 1000),
+        "ts": ts,
+        "count": len(rows),
+        "symbols": symbols,
+        "snapshot_ids": [row["snapshot_id"] for row in rows],
+        "values": values,
+        "missing": missing,
+        "colors": _compute_colors(symbols, values, previous),
+    }
+    cache.set_many(
+        {board_key(market_type): board, cycle_key(market_type): board["cycle_id"]},
+        timeout=BOARD_TTL,
+    )
+    return board
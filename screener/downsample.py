@@ -0,0 +1,137 @@
+"""
+Largest-Triangle-Three-Buckets downsampling for symbol history.
+
+LTTB keeps the visual shape of a series (peaks, dips, trend changes) while
+reducing it to a fixed number of points, so a chart of any time range costs
+a bounded response size.
+
+:func:`load_range` bounds the server side as well: the range is cut into time
+buckets in SQL and only the rows with the lowest and highest value of the
+driving metric in each bucket leave the database, so LTTB runs on at most two
+rows per bucket however many snapshots the range holds.
+"""
+from datetime import timedelta
+
+import numpy as np
+from django.db import connection
+
+from .models import ScreenerSnapshot
+
+
+# Time buckets read per requested point; LTTB picks from their extremes.
+BUCKETS_PER_POINT = 4
+# Longest range served: an earlier ``from`` is moved up to ``to - MAX_RANGE``.
+MAX_RANGE = timedelta(days=31)
+
+
+def lttb_indices(x, y, threshold: int):
+    """
+    Indices of the points LTTB keeps out of ``len(x)``.
+
+    ``x`` must be ascending. The first and last points are always kept.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    every = (n - 2) / (threshold - 2)
+
+    sampled = np.empty(threshold, dtype=np.int64)
+    sampled[0] = 0
+    a = 0
+    for i in range(threshold - 2):
+        # Average point of the next bucket.
+        avg_start = int(np.floor((i + 1) * every)) + 1
+        avg_end = min(int(np.floor((i + 2) * every)) + 1, n)
+        avg_x = x[avg_start:avg_end].mean()
+        avg_y = y[avg_start:avg_end].mean()
+
+        # Point of the current bucket forming the largest triangle with the
+        # previously selected point and the next bucket's average.
+        range_start = int(np.floor(i * every)) + 1
+        range_end = int(np.floor((i + 1) * every)) + 1
+        area = np.abs(
+            (x[a] - avg_x) * (y[range_start:range_end] - y[a])
+            - (x[a] - x[range_start:range_end]) * (avg_y - y[a])
+        )
+        a = range_start + int(area.argmax())
+        sampled[i + 1] = a
+    sampled[-1] = n - 1
+    return sampled
+
+
+def downsample_rows(rows, threshold: int, value_index: int = 1):
+    """
+    Downsample ``values_list`` rows (``ts`` first, ascending) with LTTB.
+
+    The points are chosen on the column at ``value_index``; the other columns
+    of the kept rows are returned as they are. Returns ``(rows, downsampled)``.
+    """
+    if len(rows) <= threshold:
+        return list(rows), False
+    x = [row[0].timestamp() for row in rows]
+    y = [float(row[value_index] or 0.0) for row in rows]
+    return [rows[i] for i in lttb_indices(x, y, threshold)], True
+
+
+def _bucket_extremes(rows, start, width):
+    """Min and max row (on the first metric) per bucket, ts ascending, and the row count."""
+    buckets = {}
+    total = 0
+    for row in rows:
+        total += 1
+        bucket = int((row[0] - start).total_seconds() // width)
+        value = float(row[1] or 0.0)
+        low, high = buckets.get(bucket, ((value, row), (value, row)))
+        if value < low[0]:
+            low = (value, row)
+        if value > high[0]:
+            high = (value, row)
+        buckets[bucket] = (low, high)
+    kept = {row[0]: row for low, high in buckets.values() for _, row in (low, high)}
+    return [kept[ts] for ts in sorted(kept)], total
+
+
+def load_range(symbol_id, fields, start, end, after=None, buckets=2000):
+    """
+    ``values_list("ts", *fields)`` rows of a symbol in ``[start, end]`` (and
+    after ``after``), ts ascending, reduced to the extremes of ``fields[0]``
+    in each of ``buckets`` time buckets. Returns ``(rows, total)``, ``total``
+    being the number of rows in the range before the reduction.
+    """
+    width = max((end - start).total_seconds() / max(buckets, 1), 1.0)
+    if connection.vendor != "postgresql":
+        qs = ScreenerSnapshot.objects.filter(symbol_id=symbol_id, ts__gte=start, ts__lte=end)
+        if after is not None:
+            qs = qs.filter(ts__gt=after)
+        rows = qs.order_by("ts").values_list("ts", *fields).iterator(chunk_size=10_000)
+        return _bucket_extremes(rows, start, width)
+
+    opts = ScreenerSnapshot._meta
+    quote = connection.ops.quote_name
+    columns = ", ".join(quote(opts.get_field(name).column) for name in fields)
+    where = "symbol_id = %s AND ts >= %s AND ts <= %s"
+    params = [start, width, symbol_id, start, end]
+    if after is not None:
+        where += " AND ts > %s"
+        params.append(after)
+    sql = (
+        f"SELECT ts, {columns}, total FROM ("
+        f" SELECT ts, {columns}, total,"
+        f"  row_number() OVER (PARTITION BY bucket ORDER BY value, ts) AS low,"
+        f"  row_number() OVER (PARTITION BY bucket ORDER BY value DESC, ts) AS high"
+        f" FROM ("
+        f"  SELECT ts, {columns}, count(*) OVER () AS total,"
+        f"   coalesce({quote(opts.get_field(fields[0]).column)}::float8, 0) AS value,"
+        f"   floor(extract(epoch FROM ts - %s) / %s) AS bucket"
+        f"  FROM {quote(opts.db_table)} WHERE {where}"
+        f" ) AS points"
+        f") AS ranked WHERE low = 1 OR high = 1 ORDER BY ts"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    total = rows[0][-1] if rows else 0
+    return [row[:-1] for row in rows], total
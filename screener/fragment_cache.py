@@ -0,0 +1,49 @@
+"""
+Cycle-keyed cache for the rendered screener table.
+
+Users that share a market, sort order, filters, page and language get the same
+HTML until the next ingest cycle lands, so the rendered table body and
+pagination are cached under a key that includes the board's ``cycle_id``. A
+new cycle changes the key, which invalidates every fragment of that market
+without an explicit purge; stale entries simply expire.
+
+Hits and misses are counted in Prometheus
+(``screener_table_cache_lookups_total``), not in the cache: a shared counter
+would cost a cache round trip (a file write on FileBasedCache) per request.
+"""
+import hashlib
+
+from django.core.cache import cache
+
+from config.metrics import TABLE_CACHE_LOOKUPS
+
+
+FRAGMENT_TTL = 120
+
+
+def fragment_key(market_type, sort, order, params, cursor, language, cycle_id):
+    """
+    Build the cache key. ``params`` are the filter/search query parameters
+    (anything besides sort, order, cursor and market type).
+    """
+    filters = "&".join(f"{k}={v}" for k, v in sorted(params.items()) if v)
+    filters_hash = hashlib.sha1(filters.encode()).hexdigest()[:16]
+    cursor_hash = hashlib.sha1(cursor.encode()).hexdigest()[:16] if cursor else "first"
+    return (
+        f"screener:table:{market_type}:{cycle_id}:{sort}:{order}:"
+        f"{filters_hash}:{cursor_hash}:{language}"
+    )
+
+
+def get_fragment(key):
+    fragment = cache.get(key)
+    if fragment is not None:
+        TABLE_CACHE_LOOKUPS.labels(result="hit").inc()
+    else:
+        TABLE_CACHE_LOOKUPS.labels(result="miss").inc()
+    return fragment
+
+
+def set_fragment(key, fragment):
+    cache.set(key, fragment, timeout=FRAGMENT_TTL)
+
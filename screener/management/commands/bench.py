@@ -0,0 +1,475 @@
+"""
+End-to-end benchmark of the hot paths on synthetic data.
+
+Seeds N symbols x M hours of ScreenerSnapshot rows (PostgreSQL COPY) and K
+alert rules, then times the views through the full middleware stack (Django
+test client) plus the alert checker and the snapshot cleanup, and writes
+p50/p95/p99 and query counts to a JSON report.
+
+Run it against a dedicated database, not production: the command refuses to
+run (with or without seeding) when the market already has real symbols unless
+``--force`` is given. The synthetic board and everything the scenarios cache
+go under a ``bench`` key prefix, so the real board is never overwritten or
+deleted even when the cache is shared.
+
+Usage:
+    python manage.py bench
+    python manage.py bench --symbols 500 --hours 24 --interval 60 --alerts 5000
+    python manage.py bench --output bench/baseline.json
+    python manage.py bench --compare bench/baseline.json   # fails on regressions
+    python manage.py bench --input bench/new.json --compare bench/baseline.json
+    python manage.py bench --no-seed --keep                 # reuse seeded data
+"""
+
+import importlib.util
+import io
+import json
+import math
+import platform
+import random
+import subprocess
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+
+from alerts.index import bulk_delete_rules
+from alerts.models import AlertRule
+from screener.board import BOARD_METRICS, board_key, board_row, cycle_key, publish_board
+from screener.models import ScreenerSnapshot, Symbol
+
+
+SYMBOL_PREFIX = "BENCH"
+BENCH_USERNAME = "__bench__"
+BENCH_KEY_PREFIX = "bench"
+
+SNAPSHOT_COLUMNS = ["symbol_id", "ts", *BOARD_METRICS]
+
+COPY_CHUNK_ROWS = 50_000
+
+
+class _Rollback(Exception):
+    pass
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(samples_ms, queries):
+    ordered = sorted(samples_ms)
+    return {
+        "iterations": len(ordered),
+        "p50_ms": round(percentile(ordered, 50), 3),
+        "p95_ms": round(percentile(ordered, 95), 3),
+        "p99_ms": round(percentile(ordered, 99), 3),
+        "mean_ms": round(sum(ordered) / len(ordered), 3),
+        "min_ms": round(ordered[0], 3),
+        "max_ms": round(ordered[-1], 3),
+        "queries": queries,
+    }
+
+
+def compare_reports(current, baseline, threshold):
+    """
+    Rows of ``(name, metric, baseline, current, regressed)``. A scenario
+    regresses when its p95 grows by more than ``threshold`` (a fraction) or
+    when it issues more queries than in the baseline.
+    """
+    rows = []
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            rows.append((name, "p95_ms", None, result["p95_ms"], False))
+            continue
+        slower = result["p95_ms"] > base["p95_ms"] * (1.0 + threshold)
+        rows.append((name, "p95_ms", base["p95_ms"], result["p95_ms"], slower))
+        more_queries = result["queries"] > base["queries"]
+        rows.append((name, "queries", base["queries"], result["queries"], more_queries))
+    return rows
+
+
+def check_market(market, force):
+    """Refuse to touch a market that has real symbols, unless ``force``."""
+    real = Symbol.objects.filter(market_type=market).exclude(symbol__startswith=SYMBOL_PREFIX)
+    if real.exists() and not force:
+        raise CommandError(
+            f"Market {market!r} has real symbols; run the bench on a separate database "
+            "or pass --force"
+        )
+
+
+def bench_caches():
+    """settings.CACHES with every alias under BENCH_KEY_PREFIX."""
+    return {
+        alias: {**config, "KEY_PREFIX": f"{BENCH_KEY_PREFIX}{config.get('KEY_PREFIX', '')}"}
+        for alias, config in settings.CACHES.items()
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+            timeout=5,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _load_check_alerts():
+    path = Path(settings.BASE_DIR) / "scripts" / "check_alerts.py"
+    spec = importlib.util.spec_from_file_location("bench_check_alerts", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class Command(BaseCommand):
+    help = "Seed synthetic data and benchmark the screener, API, alerts and cleanup"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--symbols", type=int, default=200, help="Symbols to seed (default: 200)")
+        parser.add_argument("--hours", type=int, default=24, help="Hours of history per symbol (default: 24)")
+        parser.add_argument(
+            "--interval", type=int, default=60,
+            help="Seconds between seeded snapshots of a symbol (default: 60)",
+        )
+        parser.add_argument("--alerts", type=int, default=1000, help="Alert rules to seed (default: 1000)")
+        parser.add_argument("--market", choices=["spot", "futures"], default="futures")
+        parser.add_argument("--iterations", type=int, default=20, help="Timed runs per scenario (default: 20)")
+        parser.add_argument("--warmup", type=int, default=2, help="Untimed runs per scenario (default: 2)")
+        parser.add_argument("--seed", type=int, default=42, help="Random seed of the data generator")
+        parser.add_argument("--only", default="", help="Comma-separated scenario name prefixes to run")
+        parser.add_argument("--output", default="", help="Report path (default: bench/bench-<time>.json)")
+        parser.add_argument("--compare", default="", help="Baseline report to compare against")
+        parser.add_argument(
+            "--threshold", type=float, default=0.2,
+            help="Allowed p95 slowdown vs the baseline, as a fraction (default: 0.2)",
+        )
+        parser.add_argument("--input", default="", help="Compare an existing report instead of running")
+        parser.add_argument("--no-seed", action="store_true", help="Reuse previously seeded data")
+        parser.add_argument("--keep", action="store_true", help="Keep the seeded data afterwards")
+        parser.add_argument("--force", action="store_true", help="Seed even if the market has real symbols")
+
+    def handle(self, *args, **options):
+        if options["input"]:
+            report = json.loads(Path(options["input"]).read_text())
+        else:
+            report = self.run(options)
+            output = Path(options["output"] or Path(settings.BASE_DIR) / "bench" /
+                          f"bench-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+            output.parent.mkdir(parents=True, exist_ok=True)
+            output.write_text(json.dumps(report, indent=2))
+            self.print_results(report)
+            self.stdout.write(f"\nReport written to {output}")
+
+        if options["compare"]:
+            baseline = json.loads(Path(options["compare"]).read_text())
+            self.print_comparison(report, baseline, options["threshold"])
+
+    # --- seeding --------------------------------------------------------
+
+    def seed(self, options, user):
+        market = options["market"]
+        self.cleanup(market)
+
+        rng = random.Random(options["seed"])
+        now = timezone.now().replace(microsecond=0)
+        symbols = Symbol.objects.bulk_create([
+            Symbol(
+                symbol=f"{SYMBOL_PREFIX}{i:04d}USDT",
+                name=f"Bench {i}",
+                market_type=market,
+                last_seen_at=now,
+            )
+            for i in range(options["symbols"])
+        ])
+        if any(s.pk is None for s in symbols):
+            symbols = list(Symbol.objects.filter(market_type=market, symbol__startswith=SYMBOL_PREFIX))
+
+        steps = max(1, options["hours"] * 3600 // options["interval"])
+        start = time.perf_counter()
+        rows = self._snapshot_rows(rng, symbols, now, steps, options["interval"])
+        count = self._copy_snapshots(rows)
+        self.stdout.write(f"Seeded {count} snapshots in {time.perf_counter() - start:.1f}s")
+
+        metrics = [m for m, _ in AlertRule.METRIC_CHOICES]
+        operators = [o for o, _ in AlertRule.OPERATOR_CHOICES]
+        AlertRule.objects.bulk_create(
+            [
+                AlertRule(
+                    user=user,
+                    symbol=rng.choice(symbols),
+                    metric=rng.choice(metrics),
+                    operator=rng.choice(operators),
+                    threshold=rng.uniform(-5.0, 5.0),
+                    telegram_chat_id=1_000_000 + i,
+                )
+                for i in range(options["alerts"])
+            ],
+            batch_size=5000,
+        )
+        self.stdout.write(f"Seeded {options['alerts']} alert rules")
+
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE screener_screenersnapshot")
+                cursor.execute("ANALYZE alerts_alertrule")
+
+    def _snapshot_rows(self, rng, symbols, now, steps, interval):
+        """Yield snapshot rows (SNAPSHOT_COLUMNS order), oldest cycle first."""
+        state = {s.pk: rng.uniform(0.01, 50_000.0) for s in symbols}
+        for step in range(steps):
+            ts = now - timedelta(seconds=interval * (steps - 1 - step))
+            for symbol in symbols:
+                price = state[symbol.pk] = max(1e-6, state[symbol.pk] * rng.uniform(0.995, 1.005))
+                change = rng.gauss(0.0, 1.5)
+                volume = rng.lognormvariate(13.0, 2.0)
+                values = {
+                    "price": f"{price:.8f}",
+                    "open_interest": rng.lognormvariate(14.0, 2.0),
+                    "funding_rate": rng.gauss(0.0001, 0.0003),
+                }
+                for tf, k in (("5m", 0.2), ("15m", 0.4), ("1h", 1.0), ("8h", 3.0), ("1d", 6.0)):
+                    values[f"change_{tf}"] = change * k
+                    values[f"oi_change_{tf}"] = rng.gauss(0.0, k)
+                    values[f"vdelta_{tf}"] = rng.gauss(0.0, volume * k * 0.1)
+                    values[f"volume_{tf}"] = volume * k
+                for tf, k in (("5m", 0.2), ("15m", 0.4), ("1h", 1.0)):
+                    values[f"volatility_{tf}"] = abs(change) * k
+                    values[f"ticks_{tf}"] = int(rng.expovariate(1 / 500.0) * k)
+                yield (symbol.pk, ts, *(values[m] for m in BOARD_METRICS))
+
+    def _copy_snapshots(self, rows):
+        if connection.vendor != "postgresql":
+            # Fallback for local runs on other databases.
+            objs, count = [], 0
+            for row in rows:
+                objs.append(ScreenerSnapshot(**dict(zip(SNAPSHOT_COLUMNS, row))))
+                if len(objs) >= COPY_CHUNK_ROWS:
+                    ScreenerSnapshot.objects.bulk_create(objs, batch_size=2000)
+                    count += len(objs)
+                    objs = []
+            ScreenerSnapshot.objects.bulk_create(objs, batch_size=2000)
+            return count + len(objs)
+
+        sql = (
+            f"COPY screener_screenersnapshot ({', '.join(SNAPSHOT_COLUMNS)}) "
+            "FROM STDIN WITH (FORMAT csv)"
+        )
+        count = 0
+        buffer = io.StringIO()
+        with connection.cursor() as cursor:
+            for row in rows:
+                buffer.write(",".join(
+                    value.isoformat() if isinstance(value, datetime) else str(value)
+                    for value in row
+                ))
+                buffer.write("\n")
+                count += 1
+                if count % COPY_CHUNK_ROWS == 0:
+                    buffer.seek(0)
+                    cursor.cursor.copy_expert(sql, buffer)
+                    buffer = io.StringIO()
+            buffer.seek(0)
+            cursor.cursor.copy_expert(sql, buffer)
+        return count
+
+    def publish(self, market):
+        """Publish the latest seeded cycle as the board, like the ingest does."""
+        latest_ts = (
+            ScreenerSnapshot.objects.filter(
+                symbol__market_type=market, symbol__symbol__startswith=SYMBOL_PREFIX
+            )
+            .order_by("-ts")
+            .values_list("ts", flat=True)
+            .first()
+        )
+        if latest_ts is None:
+            raise CommandError("No seeded data; run without --no-seed first")
+        latest = ScreenerSnapshot.objects.filter(
+            ts=latest_ts, symbol__market_type=market, symbol__symbol__startswith=SYMBOL_PREFIX
+        ).select_related("symbol")
+        rows = [board_row(s.symbol.symbol, s) for s in latest]
+        # Twice, so that colors vs the previous cycle are populated.
+        publish_board(market, latest_ts - timedelta(seconds=1), rows)
+        publish_board(market, latest_ts, rows)
+        return latest_ts
+
+    def cleanup(self, market):
+        symbols = Symbol.objects.filter(market_type=market, symbol__startswith=SYMBOL_PREFIX)
+        # Rules first, with plain DELETEs: cascading them from the symbols loads
+        # every rule and writes one changelog entry per rule.
+        bulk_delete_rules(AlertRule.objects.filter(symbol__in=symbols))
+        symbols.delete()
+
+    def bench_user(self):
+        user, _ = User.objects.get_or_create(
+            username=BENCH_USERNAME, defaults={"email": "bench@example.invalid"}
+        )
+        profile = user.profile
+        profile.email_verified = True
+        profile.admin_approved = True
+        profile.save(update_fields=["email_verified", "admin_approved"])
+        return user
+
+    # --- scenarios ------------------------------------------------------
+
+    def scenarios(self, options, client, latest_ts):
+        market = options["market"]
+        symbol = f"{SYMBOL_PREFIX}0001USDT"
+        range_from = (latest_ts - timedelta(hours=options["hours"])).isoformat()
+
+        def get(url, params=None):
+            def run():
+                response = client.get(url, params or {})
+                if response.status_code != 200:
+                    raise CommandError(f"GET {url} {params} -> {response.status_code}")
+            return run
+
+        check_alerts = _load_check_alerts()
+
+        def run_check_alerts():
+            # Notifications go to the outbox, rolled back with the scenario.
+            check_alerts.main()
+
+        def run_cleanup():
+            call_command("cleanup_old_snapshots", hours=max(1, options["hours"] // 2), stdout=io.StringIO())
+
+        base = {"market_type": market}
+        return [
+            ("screener_list", get("/", base), False),
+            ("screener_list[sort=change_15m]", get("/", {**base, "sort": "change_15m", "order": "desc"}), False),
+            ("screener_list[filters]", get("/", {**base, "min_volume_15m": "100000", "min_change_15m": "0"}), False),
+            ("screener_list[search]", get("/", {**base, "search": "BENCH00"}), False),
+            ("screener_list_api", get("/api/screener/", base), False),
+            ("screener_list_api[sort=change_1h,asc]", get("/api/screener/", {**base, "sort": "change_1h", "order": "asc"}), False),
+            ("screener_list_api[filters]", get("/api/screener/", {**base, "min_volume_15m": "100000", "max_funding_rate": "0.001"}), False),
+            ("screener_list_api[columnar,fields]", get("/api/screener/", {**base, "format": "columnar", "fields": "price,change_15m,volume_15m"}), False),
+            ("symbol_detail_api", get(f"/api/symbol/{symbol}/", base), False),
+            ("symbol_detail_api[range]", get(f"/api/symbol/{symbol}/", {**base, "from": range_from, "points": "500"}), False),
+            ("symbol_detail_api[latest_only]", get(f"/api/symbol/{symbol}/", {**base, "latest_only": "1"}), False),
+            ("symbols_list_api", get("/api/symbols/", {**base, "search": "BENCH00"}), False),
+            # Both write; every run is rolled back so that runs stay comparable.
+            ("check_alerts", run_check_alerts, True),
+            ("cleanup_old_snapshots", run_cleanup, True),
+        ]
+
+    def measure(self, func, rollback, iterations, warmup):
+        samples, queries = [], 0
+        for i in range(warmup + iterations):
+            with CaptureQueriesContext(connection) as ctx:
+                start = time.perf_counter()
+                try:
+                    with transaction.atomic():
+                        func()
+                        if rollback:
+                            raise _Rollback
+                except _Rollback:
+                    pass
+                elapsed = (time.perf_counter() - start) * 1000
+            if i >= warmup:
+                samples.append(elapsed)
+                queries = max(queries, len(ctx.captured_queries))
+        return summarize(samples, queries)
+
+    def run(self, options):
+        market = options["market"]
+        check_market(market, options["force"])
+        with override_settings(
+            CACHES=bench_caches(),
+            ALLOWED_HOSTS=["testserver", *settings.ALLOWED_HOSTS],
+        ):
+            results = self.run_scenarios(options)
+
+        return {
+            "meta": {
+                "created_at": timezone.now().isoformat(),
+                "git": _git_revision(),
+                "python": platform.python_version(),
+                "database": connection.vendor,
+                "cache": settings.CACHES["default"]["BACKEND"],
+                "symbols": options["symbols"],
+                "hours": options["hours"],
+                "interval": options["interval"],
+                "alerts": options["alerts"],
+                "market": market,
+                "iterations": options["iterations"],
+                "seed": options["seed"],
+            },
+            "results": results,
+        }
+
+    def run_scenarios(self, options):
+        market = options["market"]
+        user = self.bench_user()
+        if not options["no_seed"]:
+            self.seed(options, user)
+        latest_ts = self.publish(market)
+
+        only = [p.strip() for p in options["only"].split(",") if p.strip()]
+        client = Client()
+        client.force_login(user)
+
+        results = {}
+        for name, func, rollback in self.scenarios(options, client, latest_ts):
+            if only and not any(name.startswith(p) for p in only):
+                continue
+            iterations = options["iterations"]
+            if rollback:
+                # Writers are slow on big data sets; a few runs are enough.
+                iterations = min(iterations, 5)
+            results[name] = self.measure(func, rollback, iterations, options["warmup"])
+            self.stdout.write(f"  {name}: p50 {results[name]['p50_ms']:.1f} ms")
+
+        if not options["keep"]:
+            self.cleanup(market)
+            # Bench-prefixed keys (bench_caches), not the real board.
+            cache.delete_many([board_key(market), cycle_key(market)])
+            user.delete()
+        return results
+
+    # --- output ---------------------------------------------------------
+
+    def print_results(self, report):
+        self.stdout.write("")
+        self.stdout.write(f"{'scenario':<42} {'p50':>9} {'p95':>9} {'p99':>9} {'queries':>8}")
+        for name, r in report["results"].items():
+            self.stdout.write(
+                f"{name:<42} {r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} {r['p99_ms']:>9.1f} {r['queries']:>8}"
+            )
+
+    def print_comparison(self, report, baseline, threshold):
+        rows = compare_reports(report, baseline, threshold)
+        self.stdout.write("")
+        self.stdout.write(f"{'scenario':<42} {'metric':<8} {'baseline':>10} {'current':>10}")
+        regressions = 0
+        for name, metric, base, current, regressed in rows:
+            base_text = "-" if base is None else f"{base:.1f}" if metric == "p95_ms" else str(base)
+            current_text = f"{current:.1f}" if metric == "p95_ms" else str(current)
+            line = f"{name:<42} {metric:<8} {base_text:>10} {current_text:>10}"
+            if regressed:
+                regressions += 1
+                self.stdout.write(self.style.ERROR(line + "  REGRESSION"))
+            else:
+                self.stdout.write(line)
+        if regressions:
+            raise CommandError(f"{regressions} regression(s) against the baseline")
+        self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
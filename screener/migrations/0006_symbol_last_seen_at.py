@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-19 18:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('screener', '0005_alter_symbol_symbol'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='symbol',
+            name='last_seen_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        # Backfill from the existing snapshots so the search index is
+        # populated before the first ingest cycle after deploy.
+        migrations.RunSQL(
+            sql="""
+                UPDATE screener_symbol
+                SET last_seen_at = (
+                    SELECT MAX(s.ts)
+                    FROM screener_screenersnapshot s
+                    WHERE s.symbol_id = screener_symbol.id
+                )
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
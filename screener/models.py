@@ -12,6 +12,8 @@ class Symbol(models.Model):
     market_type = models.CharField(
         max_length=10, choices=MARKET_TYPE_CHOICES, default="futures"
     )
+    # Updated by the ingest scripts once per cycle; drives the symbol search index.
+    last_seen_at = models.DateTimeField(null=True, blank=True, db_index=True)
 
     class Meta:
         unique_together = [["symbol", "market_type"]]
@@ -0,0 +1,164 @@
+"""
+Keyset (seek) pagination for the HTML screener list.
+
+Pages are addressed by an opaque cursor holding the ``(sort value, id)`` of the
+row the page starts after (or ends before), so every page is one indexed
+``WHERE (sort_field, id) < (value, id) ORDER BY ... LIMIT n`` query: no
+``COUNT(*)`` and no ``OFFSET``, and page 20 costs the same as page 1.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+class KeysetPage:
+    """One page of rows plus cursors to its neighbours."""
+
+    def __init__(self, object_list, number, has_next, has_previous,
+                 next_cursor=None, previous_cursor=None, total_count=None, per_page=50):
+        self.object_list = object_list
+        self.number = number
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.total_count = total_count
+        self.num_pages = None
+        if total_count is not None:
+            self.num_pages = max(1, -(-total_count // per_page))
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def _decode_value(sort_field, value):
+    if sort_field == "ts":
+        return parse_datetime(value)
+    if sort_field == "price":
+        return Decimal(value)
+    return value
+
+
+def encode_cursor(sort_field, order, direction, row, number):
+    payload = {
+        "s": sort_field,
+        "o": order,
+        "d": direction,
+        "v": _encode_value(_sort_value(row, sort_field)),
+        "id": row.pk,
+        "p": number,
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor, sort_field, order):
+    """Return the cursor dict, or None if it is missing, broken or stale."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        if payload["s"] != sort_field or payload["o"] != order:
+            return None
+        if payload["d"] not in ("next", "prev"):
+            return None
+        payload["v"] = _decode_value(sort_field, payload["v"])
+        payload["id"] = int(payload["id"])
+        payload["p"] = max(1, int(payload["p"]))
+    except (binascii.Error, ValueError, KeyError, TypeError, InvalidOperation):
+        return None
+    if payload["v"] is None:
+        return None
+    return payload
+
+
+def _sort_value(row, sort_field):
+    value = row
+    for part in sort_field.split("__"):
+        value = getattr(value, part)
+    return value
+
+
+def _seek_filter(sort_field, value, pk, descending):
+    op = "lt" if descending else "gt"
+    return Q(**{f"{sort_field}__{op}": value}) | Q(**{sort_field: value, f"id__{op}": pk})
+
+
+def _ordering(sort_field, descending):
+    if descending:
+        return (f"-{sort_field}", "-id")
+    return (sort_field, "id")
+
+
+def paginate_keyset(qs, sort_field, order, cursor, per_page=50, total_count=None):
+    """
+    Return a :class:`KeysetPage` of ``qs`` ordered by ``(sort_field, id)``.
+
+    ``order`` is ``"asc"`` or ``"desc"``; ``cursor`` comes from a previous
+    page's ``next_cursor`` / ``previous_cursor``.
+    """
+    descending = order != "asc"
+    state = decode_cursor(cursor, sort_field, order)
+
+    if state is None:
+        number = 1
+        rows = list(qs.order_by(*_ordering(sort_field, descending))[:per_page + 1])
+        has_next = len(rows) > per_page
+        rows = rows[:per_page]
+        has_previous = False
+    elif state["d"] == "next":
+        number = state["p"]
+        rows = list(
+            qs.filter(_seek_filter(sort_field, state["v"], state["id"], descending))
+            .order_by(*_ordering(sort_field, descending))[:per_page + 1]
+        )
+        has_next = len(rows) > per_page
+        rows = rows[:per_page]
+        has_previous = number > 1
+    else:
+        # Walk backwards from the first row of the page we came from.
+        number = state["p"]
+        rows = list(
+            qs.filter(_seek_filter(sort_field, state["v"], state["id"], not descending))
+            .order_by(*_ordering(sort_field, not descending))[:per_page + 1]
+        )
+        has_previous = len(rows) > per_page
+        rows = rows[:per_page]
+        rows.reverse()
+        has_next = True
+        if not has_previous:
+            number = 1
+
+    next_cursor = previous_cursor = None
+    if has_next and rows:
+        next_cursor = encode_cursor(sort_field, order, "next", rows[-1], number + 1)
+    if has_previous and rows:
+        previous_cursor = encode_cursor(sort_field, order, "prev", rows[0], number - 1)
+
+    return KeysetPage(
+        rows,
+        number,
+        has_next=bool(next_cursor),
+        has_previous=bool(previous_cursor),
+        next_cursor=next_cursor,
+        previous_cursor=previous_cursor,
+        total_count=total_count,
+        per_page=per_page,
+    )
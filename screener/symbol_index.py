@@ -0,0 +1,123 @@
+"""
+In-process symbol search index for the trading terminal autocomplete.
+
+The index is built from ``Symbol`` rows whose ``last_seen_at`` (maintained by
+the ingest scripts) is recent, and is rebuilt at most once per ingest cycle.
+Between rebuilds a search is pure Python over a few hundred entries: no DB
+query and no cache read.
+"""
+import time
+from bisect import bisect_left
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .board import aget_cycle_id
+from .models import Symbol
+
+
+# Symbols without a snapshot in this window are not offered.
+RECENT_WINDOW = timedelta(hours=2)
+
+# How often to look at the board's cycle id (one small cache read).
+CYCLE_CHECK_INTERVAL = 5.0
+
+# Rebuild interval when no board is published (ingest down / cold cache).
+FALLBACK_REFRESH_INTERVAL = 60.0
+
+RANK_EXACT = 0
+RANK_PREFIX = 1
+RANK_SUBSTRING = 2
+RANK_NAME = 3
+
+
+class SymbolIndex:
+    """Sorted symbol list with exact > prefix > substring ranking."""
+
+    def __init__(self, entries=()):
+        # (SYMBOL, NAME, symbol, name) sorted by SYMBOL for prefix bisection.
+        self.entries = sorted(
+            (sym.upper(), (name or "").upper(), sym, name or "") for sym, name in entries
+        )
+        self.keys = [entry[0] for entry in self.entries]
+        self.cycle_id = None
+        self.built_at = 0.0
+        self.checked_at = 0.0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, symbol):
+        """``{"symbol", "name"}`` for an exact (case-insensitive) match, or None."""
+        key = symbol.strip().upper()
+        pos = bisect_left(self.keys, key)
+        if pos < len(self.keys) and self.keys[pos] == key:
+            entry = self.entries[pos]
+            return {"symbol": entry[2], "name": entry[3]}
+        return None
+
+    def all(self, limit=None):
+        items = [{"symbol": e[2], "name": e[3]} for e in self.entries]
+        return items if limit is None else items[:limit]
+
+    def search(self, query, limit=None):
+        query = query.strip().upper()
+        if not query:
+            return self.all(limit)
+
+        ranked = {}
+        # Exact and prefix matches are a contiguous slice of the sorted keys.
+        pos = bisect_left(self.keys, query)
+        while pos < len(self.keys) and self.keys[pos].startswith(query):
+            ranked[pos] = RANK_EXACT if self.keys[pos] == query else RANK_PREFIX
+            pos += 1
+        for pos, (key, name, _, _) in enumerate(self.entries):
+            if pos in ranked:
+                continue
+            if query in key:
+                ranked[pos] = RANK_SUBSTRING
+            elif query in name:
+                ranked[pos] = RANK_NAME
+
+        order = sorted(ranked, key=lambda p: (ranked[p], len(self.keys[p]), self.keys[p]))
+        if limit is not None:
+            order = order[:limit]
+        return [{"symbol": self.entries[p][2], "name": self.entries[p][3]} for p in order]
+
+
+_indexes: dict[str, SymbolIndex] = {}
+
+
+async def _build(market_type):
+    cutoff = timezone.now() - RECENT_WINDOW
+    rows = Symbol.objects.filter(
+        market_type=market_type, last_seen_at__gte=cutoff
+    ).values_list("symbol", "name")
+    return SymbolIndex([row async for row in rows])
+
+
+async def aget_symbol_index(market_type: str) -> SymbolIndex:
+    """
+    Index for a market, rebuilt when the ingest publishes a new cycle.
+
+    The cycle id is looked up at most every CYCLE_CHECK_INTERVAL seconds;
+    without a published board the index is rebuilt on a fixed interval.
+    """
+    index = _indexes.get(market_type)
+    now = time.monotonic()
+    if index is not None and now - index.checked_at < CYCLE_CHECK_INTERVAL:
+        return index
+
+    cycle_id = await aget_cycle_id(market_type)
+    stale = (
+        index is None
+        or (cycle_id is not None and cycle_id != index.cycle_id)
+        or (cycle_id is None and now - index.built_at >= FALLBACK_REFRESH_INTERVAL)
+    )
+    if stale:
+        index = await _build(market_type)
+        index.cycle_id = cycle_id
+        index.built_at = now
+        _indexes[market_type] = index
+    index.checked_at = now
+    return index
@@ -1,22 +1,22 @@
-from django.core.paginator import Paginator
+from datetime import timedelta
+
+from django.db import connection
 from django.shortcuts import get_object_or_404, render
+from django.template.loader import render_to_string
+from django.utils import timezone, translation
+from django.utils.safestring import mark_safe
 from accounts.decorators import access_required
 
+from .board import get_board
+from .fragment_cache import fragment_key, get_fragment, set_fragment
 from .models import ScreenerSnapshot, Symbol
+from .pagination import paginate_keyset
 
 
-@access_required
-def screener_list(request):
-    """Main screener view showing the latest snapshot per symbol with filters and sorting."""
+PAGE_SIZE = 50
 
-    from django.db import connection
-    from django.utils import timezone
-    from datetime import timedelta
-    
-    market_type = request.GET.get("market_type", "spot").strip()
-    if market_type not in ["spot", "futures"]:
-        market_type = "spot"
-    
+
+def _latest_snapshot_ids(market_type):
     recent_cutoff = timezone.now() - timedelta(hours=2)
     
     with connection.cursor() as cursor:
@@ -29,7 +29,24 @@ def screener_list(request):
             ORDER BY s.symbol_id, s.ts DESC
         """, [recent_cutoff, market_type])
         
-        snapshot_ids = [row[0] for row in cursor.fetchall()]
+        return [row[0] for row in cursor.fetchall()]
+
+
+@access_required
+def screener_list(request):
+    """Main screener view showing the latest snapshot per symbol with filters and sorting."""
+
+    market_type = request.GET.get("market_type", "spot").strip()
+    if market_type not in ["spot", "futures"]:
+        market_type = "spot"
+    
+    # The latest board published by the ingest already knows the latest
+    # snapshot of every symbol; fall back to DISTINCT ON when it is cold.
+    board = get_board(market_type)
+    if board and board["snapshot_ids"]:
+        snapshot_ids = board["snapshot_ids"]
+    else:
+        snapshot_ids = _latest_snapshot_ids(market_type)
     
     if not snapshot_ids:
         snapshot_ids = [0]
@@ -127,17 +144,69 @@ def screener_list(request):
     }
 
     sort_field = allowed_sort_fields.get(sort, "oi_change_15m")
-    if order == "asc":
-        qs = qs.order_by(sort_field)
-    else:
-        qs = qs.order_by(f"-{sort_field}")
+    if order != "asc":
+        order = "desc"
+
+    filters_applied = any([
+        search, min_volume_15m, max_volume_15m, min_change_15m, max_change_15m,
+        min_oi_change_15m, min_open_interest, max_open_interest,
+        min_funding_rate, max_funding_rate,
+    ])
+    # Without filters the total is the board size - no COUNT(*) query.
+    # With filters it is unknown and the page shows only prev/next links.
+    total_count = None
+    if board and not filters_applied:
+        total_count = board["count"]
+
+    cursor = request.GET.get("cursor", "").strip()
+    query_params = request.GET.copy()
+    query_params.pop("cursor", None)
+    query_params.pop("page", None)
+    base_query = query_params.urlencode()
 
-    paginator = Paginator(qs, 50)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+    # The rendered table only changes when a new ingest cycle lands, so it is
+    # cached per (market, sort, filters, page, language, cycle).
+    cache_key = None
+    fragment = None
+    if board:
+        filter_params = {
+            k: v for k, v in query_params.items()
+            if k not in ("market_type", "sort", "order")
+        }
+        cache_key = fragment_key(
+            market_type, sort_field, order, filter_params, cursor,
+            translation.get_language(), board["cycle_id"],
+        )
+        fragment = get_fragment(cache_key)
+
+    cache_status = "hit" if fragment is not None else ("miss" if cache_key else "off")
+    if fragment is None:
+        page_obj = paginate_keyset(
+            qs,
+            sort_field,
+            order,
+            cursor,
+            per_page=PAGE_SIZE,
+            total_count=total_count,
+        )
+        fragment = {
+            "table_body": render_to_string(
+                "screener/_table_body.html",
+                {"page_obj": page_obj, "market_type": market_type},
+                request=request,
+            ),
+            "pagination": render_to_string(
+                "screener/_pagination.html",
+                {"page_obj": page_obj, "base_query": base_query},
+                request=request,
+            ),
+        }
+        if cache_key:
+            set_fragment(cache_key, fragment)
 
     context = {
-        "page_obj": page_obj,
+        "table_body_html": mark_safe(fragment["table_body"]),
+        "pagination_html": mark_safe(fragment["pagination"]),
         "search": search,
         "market_type": market_type,
         "min_volume_15m": min_volume_15m,
@@ -152,8 +221,11 @@ def screener_list(request):
         "sort": sort,
         "order": order,
         "allowed_sort_fields": allowed_sort_fields,
+        "base_query": base_query,
     }
-    return render(request, "screener/screener_list.html", context)
+    response = render(request, "screener/screener_list.html", context)
+    response["X-Fragment-Cache"] = cache_status
+    return response
 
 
 @access_required
@@ -0,0 +1,148 @@
+"""
+Benchmark the threshold index of alert rules (alerts/index.py).
+
+Generates K synthetic rules over the real metric and operator choices, builds
+a RuleIndex from them and times one evaluation cycle (one value per metric
+for every symbol) against the per-rule loop the cron checker runs, checking
+that both find the same rules. Also times incremental add/remove.
+
+No database is needed. Run from the project root:
+
+    python scripts/bench_alert_index.py --rules 1000000 --symbols 500
+    python scripts/bench_alert_index.py --rules 100000 --naive-rules 100000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import django
+
+
+def setup_django() -> None:
+    base_dir = Path(__file__).resolve().parent.parent
+    if str(base_dir) not in sys.path:
+        sys.path.insert(0, str(base_dir))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+    django.setup()
+
+
+def make_rules(count: int, symbols: int, seed: int):
+    from alerts.evaluation import ALERT_METRICS, OPERATORS
+
+    rnd = random.Random(seed)
+    ops = list(OPERATORS)
+    rules = []
+    for rule_id in range(1, count + 1):
+        op = rnd.choice(ops)
+        # Like real alerts: "above" thresholds sit above the usual values and
+        # "below" ones under them, so only a small share fires per cycle.
+        threshold = rnd.uniform(0.0, 100.0)
+        rules.append((
+            rule_id,
+            rnd.randrange(symbols),
+            rnd.choice(ALERT_METRICS),
+            op,
+            threshold if op.startswith(">") else -threshold,
+            rnd.randrange(1, 10_000),
+            0.0,
+        ))
+    return rules
+
+
+def make_values(symbols: int, seed: int):
+    from alerts.evaluation import ALERT_METRICS
+
+    rnd = random.Random(seed)
+    return {
+        symbol_id: {metric: rnd.gauss(0.0, 10.0) for metric in ALERT_METRICS}
+        for symbol_id in range(symbols)
+    }
+
+
+def naive_match(rules, values):
+    from alerts.evaluation import OPERATORS
+
+    fired = []
+    for rule_id, symbol_id, metric, op, threshold, _, _ in rules:
+        value = values.get(symbol_id, {}).get(metric)
+        if value is not None and OPERATORS[op](value, threshold):
+            fired.append(rule_id)
+    return fired
+
+
+def timed(func, repeat: int):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return result, samples
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Alert rule index benchmark")
+    parser.add_argument("--rules", type=int, default=1_000_000)
+    parser.add_argument("--symbols", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=20, help="Evaluation cycles to time")
+    parser.add_argument(
+        "--naive-rules", type=int, default=100_000,
+        help="Rules for the per-rule loop comparison (it is slow at 1M)",
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    setup_django()
+    from alerts.index import RuleIndex
+
+    rules = make_rules(args.rules, args.symbols, args.seed)
+
+    start = time.perf_counter()
+    index = RuleIndex.from_rows(rules)
+    build_ms = (time.perf_counter() - start) * 1000
+    groups = sum(len(by_op) for by_op in index.groups.values())
+    print(f"{len(index)} rules, {args.symbols} symbols, {groups} groups; build {build_ms:.0f} ms\n")
+
+    print(f"{'method':<14} {'rules':>9} {'fired':>9} {'p50 ms':>9} {'p95 ms':>9}")
+
+    def report(name, count, fired, samples):
+        samples.sort()
+        p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+        print(f"{name:<14} {count:>9} {len(fired):>9} {statistics.median(samples):>9.2f} {p95:>9.2f}")
+
+    cycles = [make_values(args.symbols, args.seed + i) for i in range(args.repeat)]
+    samples = []
+    for values in cycles:
+        start = time.perf_counter()
+        fired = index.match(values)
+        samples.append((time.perf_counter() - start) * 1000)
+    report("index", len(rules), fired, samples)
+
+    subset = rules[:args.naive_rules]
+    values = cycles[-1]
+    naive, samples = timed(lambda: naive_match(subset, values), max(1, min(args.repeat, 5)))
+    report("per-rule loop", len(subset), naive, samples)
+
+    small = RuleIndex.from_rows(subset)
+    if sorted(small.match(values)) != sorted(naive):
+        print("\nMISMATCH: the index and the per-rule loop disagree")
+        sys.exit(1)
+    print("\nindex and per-rule loop agree")
+
+    rnd = random.Random(args.seed)
+    edits = [rules[rnd.randrange(len(rules))] for _ in range(10_000)]
+    start = time.perf_counter()
+    for row in edits:
+        index.remove(*row[:5])
+        index.add(*row)
+    per_edit_us = (time.perf_counter() - start) * 1e6 / len(edits)
+    print(f"incremental remove+add: {per_edit_us:.1f} us per rule")
+
+
+if __name__ == "__main__":
+    main()
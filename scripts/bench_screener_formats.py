@@ -0,0 +1,123 @@
+"""
+Benchmark payload size and encode time of the screener API response formats.
+
+Builds synthetic ``values_list`` rows shaped like the ones screener_list_api
+reads and compares:
+
+- ``rows``      — the default list-of-objects JSON;
+- ``columnar``  — ``format=columnar`` JSON (one array per key);
+- ``msgpack``   — ``format=columnar`` with MessagePack encoding (if installed).
+
+No database is needed. Run from the project root:
+
+    python scripts/bench_screener_formats.py --symbols 500 --repeat 50
+    python scripts/bench_screener_formats.py --fields price,volume_15m,oi_change_15m
+"""
+
+import argparse
+import gzip
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+from pathlib import Path
+
+import django
+
+
+def setup_django() -> None:
+    base_dir = Path(__file__).resolve().parent.parent
+    if str(base_dir) not in sys.path:
+        sys.path.insert(0, str(base_dir))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+    django.setup()
+
+
+def make_rows(columns, count: int, seed: int = 42):
+    from api.serializers import SCREENER_COLUMNS
+
+    rnd = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    rows = []
+    for i in range(count):
+        row = []
+        for col in columns:
+            kind = SCREENER_COLUMNS[col][1]
+            if col in ("symbol", "name"):
+                row.append(f"SYM{i}USDT")
+            elif kind == "price":
+                row.append(Decimal(f"{rnd.uniform(0.0001, 70000):.8f}"))
+            elif kind == "ticks":
+                row.append(rnd.randint(0, 500_000))
+            elif kind == "ts":
+                row.append(now)
+            else:
+                row.append(rnd.uniform(-1e7, 1e7))
+        rows.append(tuple(row))
+    return rows
+
+
+def timed(func, repeat: int):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        samples.append((time.perf_counter() - start) * 1000.0)
+    return result, samples
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--symbols", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--fields", default="", help="comma-separated column whitelist")
+    args = parser.parse_args()
+
+    setup_django()
+
+    from django.core.serializers.json import DjangoJSONEncoder
+
+    from api.serializers import pack_msgpack, parse_fields, serialize_columns, serialize_rows
+
+    columns = parse_fields(args.fields)
+    rows = make_rows(columns, args.symbols)
+
+    def encode_rows():
+        return json.dumps(serialize_rows(rows, columns, "futures"), cls=DjangoJSONEncoder).encode()
+
+    def encode_columnar():
+        return json.dumps(serialize_columns(rows, columns, "futures"), cls=DjangoJSONEncoder).encode()
+
+    def encode_msgpack():
+        return pack_msgpack(serialize_columns(rows, columns, "futures"))
+
+    candidates = [("rows", encode_rows), ("columnar", encode_columnar)]
+    if pack_msgpack({}) is not None:
+        candidates.append(("msgpack", encode_msgpack))
+    else:
+        print("msgpack is not installed, skipping the MessagePack encoding")
+
+    print(f"{args.symbols} rows x {len(columns)} columns, {args.repeat} runs each\n")
+    print(f"{'format':<10} {'bytes':>10} {'gzip':>10} {'p50 ms':>9} {'p95 ms':>9}")
+    baseline = None
+    for name, func in candidates:
+        body, samples = timed(func, args.repeat)
+        samples.sort()
+        p50 = statistics.median(samples)
+        p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+        size = len(body)
+        if baseline is None:
+            baseline = size
+        print(
+            f"{name:<10} {size:>10} {len(gzip.compress(body)):>10} {p50:>9.2f} {p95:>9.2f}"
+            f"   ({size / baseline:.0%} of rows)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+"""
+Benchmark Telegram delivery (alerts/telegram.py) against a local fake Bot API.
+
+The fake server answers ``/bot<token>/sendMessage`` after ``--latency-ms`` and
+enforces Telegram's limits the way the real API does: more than 30 messages per
+second for the bot or one per second per chat gets a 429 with
+``parameters.retry_after``. ``--error-rate`` adds random 502s.
+
+Sends ``--messages`` alerts spread over ``--chats`` chats through
+TelegramSender and prints throughput, delivery latency (queueing for the rate
+limits included) and per-request latency percentiles, plus how many 429s the
+server had to answer. ``--baseline N`` also sends N messages one by one with
+blocking ``requests.post`` like the old checker did; ``--digest`` also sends
+the same alerts merged into per-chat digests (alerts/digest.py).
+
+No database is needed. Run from the project root:
+
+    python scripts/bench_telegram.py --messages 600 --chats 300 --latency-ms 80
+    python scripts/bench_telegram.py --messages 300 --chats 5 --error-rate 0.05 --baseline 100
+    python scripts/bench_telegram.py --messages 1000 --chats 20 --digest
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+from pathlib import Path
+
+import django
+import requests
+
+
+def setup_django() -> None:
+    base_dir = Path(__file__).resolve().parent.parent
+    if str(base_dir) not in sys.path:
+        sys.path.insert(0, str(base_dir))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+    django.setup()
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class _Limit:
+    """Server-side token bucket; ``slack`` tolerates network jitter."""
+
+    def __init__(self, rate, capacity, slack=0.1):
+        self.rate = rate
+        self.capacity = capacity
+        self.slack = slack
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def take(self):
+        """0 if allowed, else seconds until it would be."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1.0 - self.slack:
+            self.tokens -= 1.0
+            return 0.0
+        return (1.0 - self.tokens) / self.rate
+
+
+class FakeBotAPI:
+    """Minimal HTTP/1.1 keep-alive server in its own thread and event loop."""
+
+    def __init__(self, latency, error_rate, global_rate, chat_rate, seed):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.global_limit = _Limit(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_limits = {}
+        self.rng = random.Random(seed)
+        self.counts = {"requests": 0, "ok": 0, "429": 0, "502": 0}
+        self.loop = asyncio.new_event_loop()
+        self.port = None
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self):
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def _serve(self):
+        asyncio.set_event_loop(self.loop)
+        server = self.loop.run_until_complete(asyncio.start_server(self._handle, "127.0.0.1", 0))
+        self.port = server.sockets[0].getsockname()[1]
+        self._ready.set()
+        self.loop.run_forever()
+
+    def _answer(self, payload):
+        self.counts["requests"] += 1
+        if self.rng.random() < self.error_rate:
+            self.counts["502"] += 1
+            return 502, {"ok": False, "error_code": 502, "description": "Bad Gateway"}
+        chat_id = payload.get("chat_id")
+        chat = self.chat_limits.get(chat_id)
+        if chat is None:
+            chat = self.chat_limits[chat_id] = _Limit(self.chat_rate, 1.0)
+        wait = chat.take() or self.global_limit.take()
+        if wait:
+            self.counts["429"] += 1
+            retry_after = max(1, math.ceil(wait))
+            return 429, {
+                "ok": False,
+                "error_code": 429,
+                "description": f"Too Many Requests: retry after {retry_after}",
+                "parameters": {"retry_after": retry_after},
+            }
+        self.counts["ok"] += 1
+        return 200, {"ok": True, "result": {"message_id": self.counts["ok"], "chat": {"id": chat_id}}}
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                lines = head.decode("latin-1").split("\r\n")
+                headers = {}
+                for line in lines[1:]:
+                    if ":" in line:
+                        name, value = line.split(":", 1)
+                        headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                await asyncio.sleep(self.latency * self.rng.uniform(0.5, 1.5))
+
+                path = lines[0].split(" ")[1]
+                if path.startswith("/bot") and path.endswith("/sendMessage"):
+                    status, answer = self._answer(json.loads(body or b"{}"))
+                else:
+                    status, answer = 404, {"ok": False, "error_code": 404, "description": "Not Found"}
+                data = json.dumps(answer).encode()
+                writer.write(
+                    f"HTTP/1.1 {status} X\r\nContent-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+def make_messages(count, chats, seed):
+    """``(chat_id, text)`` with the real alert layout (alerts/messages.py)."""
+    from datetime import datetime, timezone
+
+    from alerts.messages import alert_message
+    from alerts.models import AlertRule
+    from screener.models import Symbol
+
+    rnd = random.Random(seed)
+    chat_ids = [100_000 + i for i in range(chats)]
+    now = datetime.now(timezone.utc)
+    messages = []
+    for i in range(count):
+        rule = AlertRule(
+            symbol=Symbol(symbol=f"SYM{i % 500}USDT", market_type="futures"),
+            metric="change_15m",
+            operator=">",
+            threshold=2.0,
+        )
+        messages.append((rnd.choice(chat_ids), alert_message(rule, rnd.uniform(2.0, 9.0), now)))
+    return messages
+
+
+def make_digests(messages):
+    """The messages merged per chat like scripts/telegram_sender.py does."""
+    from types import SimpleNamespace
+
+    from alerts.digest import build_digests
+
+    items = [
+        SimpleNamespace(chat_id=chat_id, text=text, created_at=i)
+        for i, (chat_id, text) in enumerate(messages)
+    ]
+    return [(d.chat_id, d.text) for d in build_digests(items)]
+
+
+async def run_sender(url, messages, args):
+    from alerts.telegram import TelegramSender
+
+    request_latencies = []
+
+    class TimedSender(TelegramSender):
+        async def _post(self, payload):
+            start = time.perf_counter()
+            try:
+                return await super()._post(payload)
+            finally:
+                request_latencies.append(time.perf_counter() - start)
+
+    async with TimedSender("bench", api_base=url, concurrency=args.concurrency) as sender:
+        start = time.perf_counter()
+        results = await sender.send_many(messages)
+        elapsed = time.perf_counter() - start
+    return results, elapsed, request_latencies
+
+
+def run_baseline(url, messages):
+    """One blocking requests.post per message, like the old check_alerts.py."""
+    latencies, ok = [], 0
+    start = time.perf_counter()
+    for chat_id, text in messages:
+        t0 = time.perf_counter()
+        try:
+            resp = requests.post(
+                f"{url}/botbench/sendMessage",
+                json={"chat_id": chat_id, "text": text, "parse_mode": "HTML"},
+                timeout=10,
+            )
+            resp.raise_for_status()
+            ok += 1
+        except requests.RequestException:
+            pass
+        latencies.append(time.perf_counter() - t0)
+    return ok, time.perf_counter() - start, latencies
+
+
+def print_row(name, sent, ok, elapsed, delivery, requests_):
+    delivery = sorted(delivery)
+    requests_ = sorted(requests_)
+    print(
+        f"{name:<10} {sent:>6} {ok:>6} {elapsed:>8.2f} {ok / elapsed if elapsed else 0:>8.1f}  "
+        f"{_percentile(delivery, 50) * 1000:>8.0f} {_percentile(delivery, 99) * 1000:>8.0f}  "
+        f"{_percentile(requests_, 50) * 1000:>7.1f} {_percentile(requests_, 99) * 1000:>7.1f}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Telegram delivery benchmark against a fake Bot API")
+    parser.add_argument("--messages", type=int, default=600)
+    parser.add_argument("--chats", type=int, default=300)
+    parser.add_argument("--latency-ms", type=float, default=80.0, help="Mean fake API latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of random 502 answers")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--baseline", type=int, default=0, help="Also send N messages sequentially")
+    parser.add_argument("--digest", action="store_true", help="Also send the alerts as per-chat digests")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    setup_django()
+    from alerts.telegram import CHAT_RATE, GLOBAL_RATE
+
+    fake = FakeBotAPI(args.latency_ms / 1000.0, args.error_rate, GLOBAL_RATE, CHAT_RATE, args.seed).start()
+    messages = make_messages(args.messages, args.chats, args.seed)
+    per_chat = max((sum(1 for c, _ in messages if c == chat) for chat, _ in messages), default=0)
+    floor = max(len(messages) / GLOBAL_RATE, (per_chat - 1) / CHAT_RATE)
+    print(
+        f"{len(messages)} messages to {args.chats} chats, fake API {args.latency_ms:.0f} ms, "
+        f"limits {GLOBAL_RATE:.0f}/s global and {CHAT_RATE:.0f}/s per chat "
+        f"(at least {floor:.1f}s)\n"
+    )
+    print(
+        f"{'method':<10} {'sent':>6} {'ok':>6} {'seconds':>8} {'msg/s':>8}  "
+        f"{'p50 ms':>8} {'p99 ms':>8}  {'req p50':>7} {'req p99':>7}"
+    )
+
+    results, elapsed, request_latencies = asyncio.run(run_sender(fake.url, messages, args))
+    print_row(
+        "async", len(messages), sum(r.ok for r in results), elapsed,
+        [r.latency for r in results], request_latencies,
+    )
+    sender_counts = dict(fake.counts)
+
+    if args.digest:
+        digests = make_digests(messages)
+        results, elapsed, request_latencies = asyncio.run(run_sender(fake.url, digests, args))
+        print_row(
+            "digest", len(digests), sum(r.ok for r in results), elapsed,
+            [r.latency for r in results], request_latencies,
+        )
+        print(f"  {len(messages)} alerts in {len(digests)} digest messages")
+
+    if args.baseline:
+        subset = messages[:args.baseline]
+        before = fake.counts["429"]
+        ok, seconds, latencies = run_baseline(fake.url, subset)
+        # Sequential: delivery latency of message i is everything sent before it.
+        delivery = [sum(latencies[:i + 1]) for i in range(len(latencies))]
+        print_row("blocking", len(subset), ok, seconds, delivery, latencies)
+        print(f"\nblocking sends answered with 429: {fake.counts['429'] - before}")
+
+    print(
+        f"\nfake API (async run): {sender_counts['requests']} requests, "
+        f"{sender_counts['429']} answered 429, {sender_counts['502']} answered 502"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -70,13 +70,20 @@ def fetch_funding_rate(symbol: str) -> float:
         return 0.0
 
 
-def ingest_snapshot() -> int:
-    """Ingest one snapshot of all symbols. Returns count of symbols processed."""
+def ingest_snapshot(alerts=None) -> int:
+    """
+    Ingest one snapshot of all symbols. Returns count of symbols processed.
+
+    ``alerts`` (alerts.inline.InlineEvaluator) gets the published cycle.
+    """
+    from screener.board import board_row, publish_board
     from screener.models import ScreenerSnapshot, Symbol
 
     tickers = fetch_tickers()
     now = datetime.now(timezone.utc)
     processed = 0
+    cycle_rows = []
+    seen_symbol_ids = []
 
     for t in tickers:
         try:
@@ -181,7 +188,7 @@ def ingest_snapshot() -> int:
                 oi_change_8h = oi_change_pct / 3.0
                 oi_change_1d = oi_change_pct
 
-            ScreenerSnapshot.objects.create(
+            snapshot = ScreenerSnapshot.objects.create(
                 symbol=symbol_obj,
                 ts=now,
                 price=last_price,
@@ -214,26 +221,45 @@ def ingest_snapshot() -> int:
                 volume_8h=volume_8h,
                 volume_1d=volume_1d,
             )
+            cycle_rows.append(board_row(symbol_code, snapshot))
+            seen_symbol_ids.append(symbol_obj.id)
             processed += 1
         except Exception as e:
             print(f"Error processing {t.get('symbol', 'unknown')}: {e}")
             continue
 
+    # Publish the cycle: last-seen marks for the symbol search index and the
+    # latest board (colors vs previous cycle etc.)
+    try:
+        if cycle_rows:
+            Symbol.objects.filter(id__in=seen_symbol_ids).update(last_seen_at=now)
+            board = publish_board("futures", now, cycle_rows)
+            if alerts is not None:
+                alerts.submit(now, seen_symbol_ids, cycle_rows, board)
+    except Exception as e:
+        print(f"Error publishing cycle: {e}")
+
     return processed
 
 
 def main() -> None:
     setup_django()
+    from alerts.inline import start_inline_alerts
+    from config.metrics import INGEST_CYCLE_DURATION, INGEST_CYCLE_ROWS, INGEST_ROWS
     
     print("Starting Binance ingest loop (updates every 1 second)...")
     print("Press Ctrl+C to stop.")
+    alerts = start_inline_alerts("futures")
     
     try:
         while True:
             start_time = time.time()
-            count = ingest_snapshot()
+            count = ingest_snapshot(alerts)
             elapsed = time.time() - start_time
             print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Ingested {count} symbols in {elapsed:.2f}s")
+            INGEST_CYCLE_DURATION.labels(market="futures").observe(elapsed)
+            INGEST_CYCLE_ROWS.labels(market="futures").set(count)
+            INGEST_ROWS.labels(market="futures").inc(count)
             
             # Sleep to make it approximately 1 second between updates
             sleep_time = max(0, 5.0 - elapsed)
@@ -0,0 +1,323 @@
+"""
+Polling load generator: N simulated browser tabs against a running server.
+
+Every client is a logged-in, approved user that polls like the real pages do:
+
+- ``/api/screener/`` every 3s (screener table refresh) with a mix of sorts,
+  filters, ``fields=`` and ``format=columnar``;
+- ``/api/symbol/<symbol>/`` every 5s, either like the trading terminal
+  (``latest_only=1&after_ts=...``) or like the symbol page (``after_ts=...``).
+
+Polls fire at a fixed rate like ``setInterval`` (a slow response does not
+delay the next poll), with at most 6 connections per client as in a browser.
+Prints throughput, latency percentiles and error/timeout rates per endpoint
+every ``--report-interval`` seconds and a summary at the end.
+
+Users (``loadtest_NNN``) are created directly in the database of this
+checkout, so the server must use the same database. Run from the project root:
+
+    python scripts/load_poll.py --base-url http://127.0.0.1:8000 --clients 50 --duration 120
+    python scripts/load_poll.py --clients 200 --json logs/load-200.json
+    python scripts/load_poll.py --delete-users
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+
+import django
+import httpx
+
+
+def setup_django() -> None:
+    base_dir = Path(__file__).resolve().parent.parent
+    if str(base_dir) not in sys.path:
+        sys.path.insert(0, str(base_dir))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+    django.setup()
+
+
+USERNAME_PREFIX = "loadtest_"
+
+# Query mixes: (weight, params). Market type is added per client.
+SCREENER_MIX = [
+    (40, {}),
+    (20, {"fields": "price,change_15m,volume_15m,oi_change_15m,funding_rate"}),
+    (15, {"sort": "change_15m", "order": "desc"}),
+    (10, {"min_volume_15m": "1000000", "sort": "volume_15m"}),
+    (10, {"format": "columnar"}),
+    (5, {"sort": "funding_rate", "order": "asc", "max_funding_rate": "0"}),
+]
+MARKET_MIX = [(70, "futures"), (30, "spot")]
+# Share of clients that behave like the trading terminal (latest_only).
+TERMINAL_SHARE = 0.7
+
+
+def _weighted(rng, mix):
+    total = sum(weight for weight, _ in mix)
+    point = rng.uniform(0, total)
+    for weight, value in mix:
+        point -= weight
+        if point <= 0:
+            return value
+    return mix[-1][1]
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def ensure_users(count: int, password: str) -> list[str]:
+    """Create (or re-approve) ``count`` load test users, return their names."""
+    from django.contrib.auth.hashers import make_password
+    from django.contrib.auth.models import User
+
+    from accounts.models import Profile
+
+    names = [f"{USERNAME_PREFIX}{i:03d}" for i in range(count)]
+    existing = set(User.objects.filter(username__in=names).values_list("username", flat=True))
+    # One hash for all users: hashing is deliberately slow.
+    password_hash = make_password(password)
+    for name in names:
+        if name not in existing:
+            User.objects.create(username=name, email=f"{name}@example.invalid", password=password_hash)
+    User.objects.filter(username__in=names).update(password=password_hash, is_active=True)
+    Profile.objects.filter(user__username__in=names).update(email_verified=True, admin_approved=True)
+    return names
+
+
+def delete_users() -> int:
+    from django.contrib.auth.models import User
+
+    return User.objects.filter(username__startswith=USERNAME_PREFIX).delete()[0]
+
+
+def symbols_by_market() -> dict[str, list[str]]:
+    from datetime import timedelta
+
+    from django.utils import timezone
+
+    from screener.models import Symbol
+
+    cutoff = timezone.now() - timedelta(hours=2)
+    result = {}
+    for market in ("spot", "futures"):
+        result[market] = list(
+            Symbol.objects.filter(market_type=market, last_seen_at__gte=cutoff)
+            .values_list("symbol", flat=True)[:500]
+        )
+    return result
+
+
+class Stats:
+    """Latencies and outcomes per endpoint, for the current window and overall."""
+
+    def __init__(self):
+        self.window = defaultdict(list)
+        self.total = defaultdict(list)
+        self.window_started = time.monotonic()
+        self.started = self.window_started
+        self.windows = []
+
+    def record(self, endpoint: str, latency: float, outcome: str) -> None:
+        item = (latency, outcome)
+        self.window[endpoint].append(item)
+        self.total[endpoint].append(item)
+
+    @staticmethod
+    def summarize(items, seconds):
+        latencies = sorted(latency for latency, _ in items)
+        ok = sum(1 for _, outcome in items if outcome == "ok")
+        timeouts = sum(1 for _, outcome in items if outcome == "timeout")
+        errors = len(items) - ok - timeouts
+        return {
+            "requests": len(items),
+            "rps": round(len(items) / seconds, 2) if seconds else 0.0,
+            "p50_ms": round(_percentile(latencies, 50) * 1000, 1),
+            "p95_ms": round(_percentile(latencies, 95) * 1000, 1),
+            "p99_ms": round(_percentile(latencies, 99) * 1000, 1),
+            "error_rate": round(errors / len(items), 4) if items else 0.0,
+            "timeout_rate": round(timeouts / len(items), 4) if items else 0.0,
+        }
+
+    def flush_window(self):
+        now = time.monotonic()
+        seconds = now - self.window_started
+        summary = {
+            "t": round(now - self.started, 1),
+            "endpoints": {name: self.summarize(items, seconds) for name, items in self.window.items()},
+        }
+        self.windows.append(summary)
+        self.window = defaultdict(list)
+        self.window_started = now
+        return summary
+
+    def overall(self):
+        seconds = time.monotonic() - self.started
+        return {name: self.summarize(items, seconds) for name, items in self.total.items()}
+
+
+def print_summary(title: str, endpoints: dict) -> None:
+    print(title)
+    for name, s in sorted(endpoints.items()):
+        print(
+            f"  {name:<10} {s['requests']:>7} req {s['rps']:>8.1f} rps  "
+            f"p50 {s['p50_ms']:>7.1f}  p95 {s['p95_ms']:>7.1f}  p99 {s['p99_ms']:>7.1f} ms  "
+            f"err {s['error_rate'] * 100:5.1f}%  timeout {s['timeout_rate'] * 100:5.1f}%"
+        )
+
+
+async def login(client: httpx.AsyncClient, username: str, password: str) -> None:
+    resp = await client.get("/accounts/login/")
+    resp.raise_for_status()
+    token = client.cookies.get("csrftoken")
+    resp = await client.post(
+        "/accounts/login/",
+        data={"username": username, "password": password, "csrfmiddlewaretoken": token},
+        headers={"Referer": str(client.base_url) + "/accounts/login/"},
+    )
+    if resp.status_code != 302:
+        raise RuntimeError(f"Login failed for {username}: HTTP {resp.status_code}")
+
+
+async def timed_get(client, stats, endpoint, url, params):
+    start = time.perf_counter()
+    try:
+        resp = await client.get(url, params=params)
+        outcome = "ok" if resp.status_code < 400 else f"http_{resp.status_code}"
+        data = resp.json() if outcome == "ok" and endpoint == "symbol" else None
+    except httpx.TimeoutException:
+        outcome, data = "timeout", None
+    except (httpx.HTTPError, ValueError):
+        outcome, data = "error", None
+    stats.record(endpoint, time.perf_counter() - start, outcome)
+    return data
+
+
+async def poll_every(interval, stop_at, make_request):
+    """Fire ``make_request()`` every ``interval`` seconds like setInterval."""
+    await asyncio.sleep(random.uniform(0, interval))
+    tasks = set()
+    next_at = time.monotonic()
+    while next_at < stop_at:
+        task = asyncio.create_task(make_request())
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        next_at += interval
+        await asyncio.sleep(max(0.0, next_at - time.monotonic()))
+    if tasks:
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def run_client(index, args, username, symbols, stats, stop_at):
+    rng = random.Random(args.seed + index)
+    market = _weighted(rng, MARKET_MIX)
+    screener_params = {"market_type": market, **_weighted(rng, SCREENER_MIX)}
+    candidates = symbols.get(market) or ["BTCUSDT"]
+    symbol = rng.choice(candidates)
+    terminal = rng.random() < TERMINAL_SHARE
+    last_ts = None
+
+    limits = httpx.Limits(max_connections=6, max_keepalive_connections=6)
+    timeout = httpx.Timeout(args.timeout)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=timeout) as client:
+        try:
+            await login(client, username, args.password)
+        except (httpx.HTTPError, RuntimeError) as exc:
+            print(f"[client {index}] {exc}")
+            stats.record("login", 0.0, "error")
+            return
+
+        async def screener_poll():
+            await timed_get(client, stats, "screener", "/api/screener/", screener_params)
+
+        async def symbol_poll():
+            nonlocal last_ts
+            params = {"market_type": market}
+            if terminal:
+                params["latest_only"] = "1"
+            if last_ts:
+                params["after_ts"] = last_ts
+            data = await timed_get(client, stats, "symbol", f"/api/symbol/{symbol}/", params)
+            if data and data.get("latest"):
+                last_ts = data["latest"]["ts"]
+
+        await asyncio.gather(
+            poll_every(args.screener_interval, stop_at, screener_poll),
+            poll_every(args.symbol_interval, stop_at, symbol_poll),
+        )
+
+
+async def reporter(stats, interval, stop_at):
+    while time.monotonic() < stop_at:
+        await asyncio.sleep(min(interval, max(0.0, stop_at - time.monotonic())))
+        summary = stats.flush_window()
+        print_summary(f"[{datetime.now().strftime('%H:%M:%S')}] t={summary['t']}s", summary["endpoints"])
+
+
+async def run(args, usernames, symbols):
+    stats = Stats()
+    stop_at = time.monotonic() + args.duration
+    clients = [
+        run_client(i, args, usernames[i % len(usernames)], symbols, stats, stop_at)
+        for i in range(args.clients)
+    ]
+    await asyncio.gather(reporter(stats, args.report_interval, stop_at), *clients)
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Concurrent polling load generator")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--clients", type=int, default=50, help="Simulated browser tabs")
+    parser.add_argument("--users", type=int, default=0, help="Distinct users (default: one per client)")
+    parser.add_argument("--duration", type=float, default=60.0, help="Seconds to run")
+    parser.add_argument("--screener-interval", type=float, default=3.0)
+    parser.add_argument("--symbol-interval", type=float, default=5.0)
+    parser.add_argument("--timeout", type=float, default=10.0, help="Request timeout, seconds")
+    parser.add_argument("--report-interval", type=float, default=10.0)
+    parser.add_argument("--password", default="load-test-password")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", default="", help="Write per-window and overall stats to this file")
+    parser.add_argument("--delete-users", action="store_true", help="Delete the load test users and exit")
+    args = parser.parse_args()
+
+    setup_django()
+
+    if args.delete_users:
+        print(f"Deleted {delete_users()} objects.")
+        return
+
+    usernames = ensure_users(args.users or args.clients, args.password)
+    symbols = symbols_by_market()
+    print(
+        f"{args.clients} clients ({len(usernames)} users) against {args.base_url} "
+        f"for {args.duration:.0f}s: screener every {args.screener_interval}s, "
+        f"symbol every {args.symbol_interval}s"
+    )
+
+    stats = asyncio.run(run(args, usernames, symbols))
+    overall = stats.overall()
+    print_summary("\nOverall", overall)
+
+    if args.json:
+        Path(args.json).write_text(json.dumps({
+            "config": vars(args),
+            "windows": stats.windows,
+            "overall": overall,
+        }, indent=2))
+        print(f"Stats written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
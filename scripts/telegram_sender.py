@@ -0,0 +1,140 @@
+"""
+Telegram sender worker: delivers the notification outbox (alerts/outbox.py).
+
+Claims due notifications in batches with ``SELECT ... FOR UPDATE SKIP LOCKED``,
+merges the alerts of each chat into digests (alerts/digest.py), sends them
+through TelegramSender (pooled connection, Telegram rate limits,
+``retry_after``) and stores the outcome: sent, retried later with backoff, or
+dead-lettered. Several workers can run side by side, on one host or several;
+each claims its own rows. The rate limits are per process, so with N workers
+pass ``--global-rate 30/N``.
+
+A batch is capped at what the worker's rate can send in a fraction of the
+claim lease, and is sent in chunks: before every chunk the lease of the rows
+not sent yet is extended, and rows another worker took over are dropped, so a
+batch stalled by rate limiting is not sent twice.
+
+Run from the project root:
+
+    TELEGRAM_BOT_TOKEN=... python scripts/telegram_sender.py
+    TELEGRAM_BOT_TOKEN=... python scripts/telegram_sender.py --batch 200 --global-rate 15
+    TELEGRAM_BOT_TOKEN=... python scripts/telegram_sender.py --once
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import django
+
+
+def setup_django() -> None:
+    base_dir = Path(__file__).resolve().parent.parent
+    if str(base_dir) not in sys.path:
+        sys.path.insert(0, str(base_dir))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+    django.setup()
+
+
+PURGE_INTERVAL = 60 * 60
+
+# Share of the claim lease a whole batch takes at the worker's rate, and
+# seconds of sending between two lease renewals.
+LEASE_SHARE = 0.25
+RENEW_INTERVAL = 30.0
+
+
+def batch_limits(batch: int, rate: float) -> tuple:
+    """``(claim limit, messages per chunk)`` for a worker sending ``rate`` msg/s."""
+    from alerts.outbox import LEASE
+
+    capacity = max(1, int(rate * LEASE.total_seconds() * LEASE_SHARE))
+    return min(batch, capacity), max(1, int(rate * RENEW_INTERVAL))
+
+
+def run_batch(worker, batch: int, rate: float) -> dict:
+    from alerts.digest import build_digests
+    from alerts.outbox import claim, record_results, renew
+
+    limit, chunk = batch_limits(batch, rate)
+    notifications = claim(limit, datetime.now(timezone.utc))
+    if not notifications:
+        return {}
+    # Alerts of one chat go out as one digest message.
+    digests = build_digests(notifications)
+    counts = {"messages": 0, "sent": 0, "retry": 0, "dead": 0}
+    while digests:
+        if counts["messages"]:
+            # Still ours? Extend the lease, regroup what is left.
+            held = renew([n for d in digests for n in d.items], datetime.now(timezone.utc))
+            digests = build_digests(held)
+            if not digests:
+                break
+        part, digests = digests[:chunk], digests[chunk:]
+        results = worker.send_many([(d.chat_id, d.text) for d in part])
+        for outcome, count in record_results(part, results, datetime.now(timezone.utc)).items():
+            counts[outcome] += count
+        counts["messages"] += len(part)
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Deliver queued Telegram notifications")
+    parser.add_argument("--batch", type=int, default=100, help="Notifications claimed at once")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds between polls when idle")
+    parser.add_argument("--global-rate", type=float, default=None, help="Messages/s for this worker")
+    parser.add_argument("--keep-days", type=int, default=7, help="Delete sent notifications older than this")
+    parser.add_argument("--once", action="store_true", help="Deliver what is due and exit")
+    args = parser.parse_args()
+
+    token = os.getenv("TELEGRAM_BOT_TOKEN")
+    if not token:
+        raise SystemExit("TELEGRAM_BOT_TOKEN env var is required")
+
+    setup_django()
+    from django.db import close_old_connections
+
+    from alerts.outbox import purge_sent
+    from alerts.telegram import GLOBAL_RATE, DeliveryWorker
+
+    worker = DeliveryWorker(token, global_rate=args.global_rate or GLOBAL_RATE).start()
+    print(f"Telegram sender started (batch {args.batch}, {args.global_rate or GLOBAL_RATE:g} msg/s).")
+    print("Press Ctrl+C to stop.")
+
+    purged_at = 0.0
+    try:
+        while True:
+            close_old_connections()
+            if time.monotonic() - purged_at >= PURGE_INTERVAL:
+                purged = purge_sent(datetime.now(timezone.utc) - timedelta(days=args.keep_days))
+                if purged:
+                    print(f"Purged {purged} sent notifications.")
+                purged_at = time.monotonic()
+
+            try:
+                counts = run_batch(worker, args.batch, args.global_rate or GLOBAL_RATE)
+            except Exception as exc:
+                # Database hiccup: the claimed rows come back after their lease.
+                print(f"Sender batch failed: {exc}")
+                counts = {}
+            if counts:
+                print(
+                    f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] "
+                    f"{counts['messages']} messages: sent {counts['sent']}, "
+                    f"retry {counts['retry']}, dead {counts['dead']}"
+                )
+            elif args.once:
+                break
+            else:
+                time.sleep(args.poll_interval)
+    except KeyboardInterrupt:
+        print("\nStopped by user.")
+    finally:
+        worker.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -453,7 +453,10 @@ document.addEventListener("DOMContentLoaded", () => {
                 ? `/${pathParts[0]}/api/screener/`
                 : `/api/screener/`;
             
-            const url = apiPath + query.replace(/^\?/, "?");
+            // Ask only for the visible columns - the API skips the rest
+            const params = new URLSearchParams(query.replace(/^\?/, ""));
+            params.set("fields", Array.from(visibleColumns).join(","));
+            const url = apiPath + "?" + params.toString();
             
             const resp = await fetch(url);
             if (!resp.ok) {
@@ -683,11 +686,13 @@ document.addEventListener("DOMContentLoaded", () => {
 
             screenerTableBody.appendChild(tr);
             
-            // Store current values as previous for next update - ensure they are numbers
-            // Only update if we have valid numeric values
+            // Store current values as previous for next update - ensure they are numbers.
+            // Columns not fetched (fields=) stay undefined, so they get no up/down
+            // color when they first arrive.
             const storeValue = (val) => {
+                if (val === undefined || val === null || val === "") return undefined;
                 const num = Number(val);
-                return (!isNaN(num) && num !== null && num !== undefined) ? num : 0;
+                return !isNaN(num) ? num : undefined;
             };
             
             // Store ALL values for proper comparison
@@ -871,13 +876,13 @@ document.addEventListener("DOMContentLoaded", () => {
             // Store values for next update
             const getValue = (col) => {
                 const cell = tr.querySelector(`td[data-column="${col}"]`);
-                if (!cell) return 0;
+                if (!cell) return undefined;
                 return parseFormattedValue(cell.textContent);
             };
             
             const getVdeltaValue = (col) => {
                 const cell = tr.querySelector(`td[data-column="${col}"]`);
-                if (!cell) return 0;
+                if (!cell) return undefined;
                 let text = cell.textContent.trim();
                 
                 if (text.endsWith('K')) {
@@ -987,6 +992,8 @@ document.addEventListener("DOMContentLoaded", () => {
     if (symbolContainer) {
         const symbol = symbolContainer.getAttribute("data-symbol");
         const symbolIntervalMs = 5000; // 5s for symbol detail
+        const SYMBOL_HISTORY_ROWS = 50; // same as the API default
+        let symbolSnapshots = [];
 
         async function fetchSymbolData() {
             if (!symbol) return;
@@ -995,10 +1002,18 @@ document.addEventListener("DOMContentLoaded", () => {
                 const currentPath = window.location.pathname;
                 const langPrefix = currentPath.match(/^\/(ru|en|es|he)\//)?.[1];
                 const apiPath = langPrefix ? `/${langPrefix}/api/symbol/` : "/api/symbol/";
-                const resp = await fetch(`${apiPath}${encodeURIComponent(symbol)}/`);
+                const params = new URLSearchParams();
+                const marketType = new URLSearchParams(window.location.search).get("market_type");
+                if (marketType) params.set("market_type", marketType);
+                // After the first load only ask for rows newer than the last one shown
+                if (symbolSnapshots.length) params.set("after_ts", symbolSnapshots[0].ts);
+                const resp = await fetch(`${apiPath}${encodeURIComponent(symbol)}/?${params}`);
                 if (!resp.ok) return;
                 const data = await resp.json();
-                renderSymbolDetail(data);
+                const fresh = data.snapshots || [];
+                if (!fresh.length && symbolSnapshots.length) return;
+                symbolSnapshots = fresh.concat(symbolSnapshots).slice(0, SYMBOL_HISTORY_ROWS);
+                renderSymbolDetail({ ...data, latest: symbolSnapshots[0] || null, snapshots: symbolSnapshots });
             } catch (e) {
                 // Silently fail - will retry on next interval
             }